@@ -0,0 +1,421 @@
+"""
+Dataset Analytics
+In-memory snapshot of the reference dataset statistics, rebuilt only when the
+dataset file actually changes
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# ==================== DATASET SNAPSHOT ====================
+
+class DatasetSnapshot:
+    """
+    Precomputed /api/analytics statistics for the reference dataset.
+    
+    The file is stat()ed at most once per `check_interval` seconds; the
+    statistics are recomputed only if its mtime/size changed AND its content
+    hash differs from the one the snapshot was built from.
+    """
+    
+    def __init__(self, filepath, check_interval=1.0):
+        self.filepath = filepath
+        self.check_interval = check_interval
+        self.logger = logging.getLogger('cardio_analytics')
+        
+        self.stats = None
+        self.cube = None  # DatasetCube for /api/query
+        self.body = None  # stats pre-serialized as JSON
+        self.version = None  # content hash of the dataset file
+        self.build_seconds = None
+        self.built_at = None
+        
+        self._current = (None, None, None)  # swapped as one tuple for readers
+        self._file_signature = None  # (mtime, size)
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def file_hash(filepath):
+        """SHA-256 of the file content, read in 1MB chunks"""
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def compute_stats(df):
+        """Dataset statistics, all vectorized"""
+        age_decades = (df['age'].to_numpy() // 365 // 10) * 10
+        decades, counts = np.unique(age_decades, return_counts=True)
+        age_buckets = {f"{d}-{d + 10}": int(c) for d, c in zip(decades, counts)}
+        
+        cardio = df['cardio'].to_numpy()
+        return {
+            'total_records': len(df),
+            'disease_count': int(cardio.sum()),
+            'healthy_count': int((cardio == 0).sum()),
+            'disease_percentage': float(cardio.mean() * 100),
+            'age_stats': {
+                'min': int(df['age'].min()),
+                'max': int(df['age'].max()),
+                'mean': float(df['age'].mean())
+            },
+            'weight_stats': {
+                'min': float(df['weight'].min()),
+                'max': float(df['weight'].max()),
+                'mean': float(df['weight'].mean())
+            },
+            'height_stats': {
+                'min': float(df['height'].min()),
+                'max': float(df['height'].max()),
+                'mean': float(df['height'].mean())
+            },
+            'age_distribution': age_buckets,
+            'high_bp_count': int((df['ap_hi'] > 140).sum()),
+            'high_cholesterol_count': int((df['cholesterol'] >= 2).sum()),
+            'smokers_count': int((df['smoke'] == 1).sum())
+        }
+    
+    def refresh(self, force=False):
+        """Rebuild the snapshot if the dataset file changed"""
+        stat = os.stat(self.filepath)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if not force and signature == self._file_signature:
+            return False
+        
+        with self._lock:
+            if not force and signature == self._file_signature:
+                return False
+            
+            content_hash = self.file_hash(self.filepath)
+            if not force and content_hash == self.version:
+                # Touched but unchanged (e.g. re-deployed copy)
+                self._file_signature = signature
+                return False
+            
+            start = time.perf_counter()
+            df = pd.read_csv(self.filepath, sep=';')
+            stats = self.compute_stats(df)
+            self.cube = DatasetCube(df)
+            
+            self.stats, self.body, self.version = stats, json.dumps(stats), content_hash
+            self._current = (self.stats, self.body, self.version)
+            self._file_signature = signature
+            self.build_seconds = time.perf_counter() - start
+            self.built_at = time.time()
+            self.logger.info(f"Dataset snapshot built in {self.build_seconds:.2f}s ({len(df)} rows)")
+            return True
+    
+    def get(self):
+        """
+        Current snapshot
+        
+        Returns:
+            (stats, body, version) tuple
+        """
+        now = time.monotonic()
+        if self.stats is None or now - self._last_check >= self.check_interval:
+            self._last_check = now
+            self.refresh()
+        return self._current
+    
+    def get_cube(self):
+        """Columnar query engine for the current snapshot"""
+        self.get()
+        return self.cube
+
+# ==================== COLUMNAR QUERY ENGINE ====================
+
+class DatasetCube:
+    """
+    Columnar copy of the reference dataset for ad-hoc filter/group/aggregate
+    queries.
+    
+    Categorical columns are stored as small integer codes and pre-aggregated
+    into a dense cube (count, disease count, and sum / sum of squares of each
+    numeric column for every combination of categories). Queries that only
+    filter and group on categoricals and ask for count/rate/mean/std are
+    answered by slicing and summing the cube; anything else (numeric range
+    filters, min/max/percentiles) falls back to a vectorized scan of the
+    column arrays. Neither path touches pandas.
+    """
+    
+    CATEGORICAL = ('gender', 'cholesterol', 'gluc', 'smoke', 'alco', 'active', 'cardio', 'age_bucket')
+    NUMERIC = ('age_years', 'height', 'weight', 'ap_hi', 'ap_lo', 'bmi')
+    
+    CUBE_AGGREGATES = ('sum', 'mean', 'std')
+    SCAN_AGGREGATES = ('min', 'max', 'median', 'p<0-100>')
+    ORDER_STATISTICS = {'min': 0, 'max': 100, 'median': 50}
+    
+    def __init__(self, df):
+        self.row_count = len(df)
+        self.levels = {}
+        self.codes = {}
+        self.numeric = {}
+        
+        age_years = df['age'].to_numpy() // 365
+        height_m = df['height'].to_numpy() / 100
+        self.numeric = {
+            'age_years': age_years.astype(np.float64),
+            'height': df['height'].to_numpy(dtype=np.float64),
+            'weight': df['weight'].to_numpy(dtype=np.float64),
+            'ap_hi': df['ap_hi'].to_numpy(dtype=np.float64),
+            'ap_lo': df['ap_lo'].to_numpy(dtype=np.float64),
+            'bmi': df['weight'].to_numpy() / (height_m ** 2)
+        }
+        
+        raw_categories = {col: df[col].to_numpy() for col in self.CATEGORICAL if col != 'age_bucket'}
+        raw_categories['age_bucket'] = (age_years // 10) * 10
+        for col in self.CATEGORICAL:
+            values, codes = np.unique(raw_categories[col], return_inverse=True)
+            self.codes[col] = codes.astype(np.int16)
+            if col == 'age_bucket':
+                self.levels[col] = [f"{int(v)}-{int(v) + 10}" for v in values]
+            else:
+                self.levels[col] = [int(v) for v in values]
+        
+        self.cardio_level = self.levels['cardio'].index(1) if 1 in self.levels['cardio'] else None
+        self.build_cube()
+    
+    def build_cube(self):
+        """Pre-aggregate count, disease count and numeric sums over all categorical combinations"""
+        self.shape = tuple(len(self.levels[col]) for col in self.CATEGORICAL)
+        flat = np.ravel_multi_index([self.codes[col] for col in self.CATEGORICAL], self.shape)
+        size = int(np.prod(self.shape))
+        
+        is_disease = self.codes['cardio'] == self.cardio_level if self.cardio_level is not None else np.zeros(self.row_count)
+        self.cube = {
+            'count': np.bincount(flat, minlength=size).reshape(self.shape).astype(np.float64),
+            'disease': np.bincount(flat, weights=is_disease, minlength=size).reshape(self.shape)
+        }
+        for col, values in self.numeric.items():
+            self.cube[f'sum:{col}'] = np.bincount(flat, weights=values, minlength=size).reshape(self.shape)
+            self.cube[f'sumsq:{col}'] = np.bincount(flat, weights=values * values, minlength=size).reshape(self.shape)
+    
+    def schema(self):
+        """Columns, category levels and supported metrics"""
+        return {
+            'row_count': self.row_count,
+            'categorical': {col: self.levels[col] for col in self.CATEGORICAL},
+            'numeric': list(self.NUMERIC),
+            'metrics': ['count', 'disease_count', 'disease_rate'] +
+                       [f'{agg}:<numeric column>' for agg in self.CUBE_AGGREGATES + self.SCAN_AGGREGATES]
+        }
+    
+    # ---------- query parsing ----------
+    
+    def parse_metric(self, metric):
+        """Split 'agg:column' and validate it"""
+        if metric in ('count', 'disease_count', 'disease_rate'):
+            return None, None
+        agg, _, col = metric.partition(':')
+        if col not in self.NUMERIC:
+            raise ValueError(f"Unknown numeric column in metric '{metric}'")
+        if agg in self.CUBE_AGGREGATES or agg in self.ORDER_STATISTICS:
+            return agg, col
+        if agg.startswith('p') and agg[1:].isdigit() and 0 <= int(agg[1:]) <= 100:
+            return agg, col
+        raise ValueError(f"Unknown aggregate in metric '{metric}'")
+    
+    def category_mask(self, col, condition):
+        """Boolean mask over the levels of a categorical column"""
+        allowed = condition if isinstance(condition, list) else [condition]
+        levels = self.levels[col]
+        mask = np.array([level in allowed or str(level) in map(str, allowed) for level in levels])
+        if not mask.any():
+            raise ValueError(f"Filter on '{col}' matches no category (levels: {levels})")
+        return mask
+    
+    def numeric_mask(self, col, condition):
+        """Boolean row mask for a numeric column filter"""
+        values = self.numeric[col]
+        if isinstance(condition, dict):
+            unknown = set(condition) - {'min', 'max'}
+            if unknown:
+                raise ValueError(f"Range filter on '{col}' only supports min/max")
+            mask = np.ones(self.row_count, dtype=bool)
+            if condition.get('min') is not None:
+                mask &= values >= float(condition['min'])
+            if condition.get('max') is not None:
+                mask &= values <= float(condition['max'])
+            return mask
+        allowed = condition if isinstance(condition, list) else [condition]
+        return np.isin(values, np.asarray(allowed, dtype=np.float64))
+    
+    # ---------- execution ----------
+    
+    def query(self, filters=None, group_by=None, metrics=None):
+        """
+        Run a filter/group/aggregate query
+        
+        Args:
+            filters (dict): {column: value | [values] | {"min": x, "max": y}}
+            group_by (list): Categorical columns to group by
+            metrics (list): e.g. ["count", "disease_rate", "mean:ap_hi", "p90:bmi"]
+        
+        Returns:
+            dict: {groups: [...], source: 'cube' | 'scan'}
+        """
+        filters = filters or {}
+        group_by = group_by or []
+        metrics = metrics or ['count', 'disease_rate']
+        
+        for col in group_by:
+            if col not in self.CATEGORICAL:
+                raise ValueError(f"Can only group by categorical columns: {list(self.CATEGORICAL)}")
+        for col in filters:
+            if col not in self.CATEGORICAL and col not in self.NUMERIC:
+                raise ValueError(f"Unknown filter column '{col}'")
+        parsed = [(metric,) + self.parse_metric(metric) for metric in metrics]
+        
+        cube_answerable = (
+            all(col in self.CATEGORICAL and not isinstance(cond, dict) for col, cond in filters.items()) and
+            all(agg is None or agg in self.CUBE_AGGREGATES for _, agg, _ in parsed)
+        )
+        if cube_answerable:
+            return {'groups': self._query_cube(filters, group_by, parsed), 'source': 'cube'}
+        return {'groups': self._query_scan(filters, group_by, parsed), 'source': 'scan'}
+    
+    def _query_cube(self, filters, group_by, parsed):
+        """Slice the pre-aggregated cube and sum over the dimensions not grouped on"""
+        selectors = []
+        for col in self.CATEGORICAL:
+            if col in filters:
+                selectors.append(np.flatnonzero(self.category_mask(col, filters[col])))
+            else:
+                selectors.append(np.arange(len(self.levels[col])))
+        index = np.ix_(*selectors)
+        
+        dims = list(self.CATEGORICAL)
+        reduce_axes = tuple(i for i, col in enumerate(dims) if col not in group_by)
+        kept = [col for col in dims if col in group_by]
+        order = [kept.index(col) for col in group_by]
+        
+        def reduce(name):
+            return self.cube[name][index].sum(axis=reduce_axes).transpose(order) if kept else \
+                np.asarray(self.cube[name][index].sum())
+        
+        counts = reduce('count')
+        disease = reduce('disease')
+        
+        columns = {}
+        for metric, agg, col in parsed:
+            if metric == 'count':
+                columns[metric] = counts
+            elif metric == 'disease_count':
+                columns[metric] = disease
+            elif metric == 'disease_rate':
+                columns[metric] = self._safe_divide(disease * 100, counts)
+            elif agg == 'sum':
+                columns[metric] = reduce(f'sum:{col}')
+            elif agg == 'mean':
+                columns[metric] = self._safe_divide(reduce(f'sum:{col}'), counts)
+            elif agg == 'std':
+                columns[metric] = self._sample_std(reduce(f'sum:{col}'), reduce(f'sumsq:{col}'), counts)
+        
+        # Cube axes were sliced down to the selected levels; map positions back
+        selections = [selectors[dims.index(col)] for col in group_by]
+        return self._to_groups(group_by, counts, columns, selections)
+    
+    def _query_scan(self, filters, group_by, parsed):
+        """Vectorized scan over the column arrays"""
+        mask = np.ones(self.row_count, dtype=bool)
+        for col, condition in filters.items():
+            if col in self.CATEGORICAL:
+                level_mask = self.category_mask(col, condition)
+                mask &= level_mask[self.codes[col]]
+            else:
+                mask &= self.numeric_mask(col, condition)
+        rows = np.flatnonzero(mask)
+        
+        group_shape = tuple(len(self.levels[col]) for col in group_by)
+        if group_by:
+            keys = np.ravel_multi_index([self.codes[col][rows] for col in group_by], group_shape)
+        else:
+            keys = np.zeros(len(rows), dtype=np.int64)
+        n_groups = int(np.prod(group_shape)) if group_by else 1
+        
+        counts = np.bincount(keys, minlength=n_groups).astype(np.float64)
+        if self.cardio_level is not None:
+            is_disease = self.codes['cardio'][rows] == self.cardio_level
+        else:
+            is_disease = np.zeros(len(rows), dtype=bool)
+        disease = np.bincount(keys, weights=is_disease, minlength=n_groups)
+        
+        # Rows sorted by group once, for order statistics
+        sort_order = np.argsort(keys, kind='stable')
+        boundaries = np.searchsorted(keys[sort_order], np.arange(n_groups + 1))
+        
+        columns = {}
+        for metric, agg, col in parsed:
+            if metric == 'count':
+                columns[metric] = counts
+            elif metric == 'disease_count':
+                columns[metric] = disease
+            elif metric == 'disease_rate':
+                columns[metric] = self._safe_divide(disease * 100, counts)
+            else:
+                values = self.numeric[col][rows]
+                if agg in ('sum', 'mean', 'std'):
+                    sums = np.bincount(keys, weights=values, minlength=n_groups)
+                    if agg == 'sum':
+                        columns[metric] = sums
+                    elif agg == 'mean':
+                        columns[metric] = self._safe_divide(sums, counts)
+                    else:
+                        sumsq = np.bincount(keys, weights=values * values, minlength=n_groups)
+                        columns[metric] = self._sample_std(sums, sumsq, counts)
+                else:
+                    q = self.ORDER_STATISTICS[agg] if agg in self.ORDER_STATISTICS else int(agg[1:])
+                    sorted_values = values[sort_order]
+                    result = np.full(n_groups, np.nan)
+                    for g in range(n_groups):
+                        segment = sorted_values[boundaries[g]:boundaries[g + 1]]
+                        if len(segment):
+                            result[g] = np.percentile(segment, q)
+                    columns[metric] = result
+        
+        shape = group_shape if group_by else ()
+        counts = counts.reshape(shape)
+        columns = {name: values.reshape(shape) for name, values in columns.items()}
+        selections = [np.arange(n_levels) for n_levels in group_shape]
+        return self._to_groups(group_by, counts, columns, selections)
+    
+    @staticmethod
+    def _sample_std(sums, sumsq, counts):
+        """Sample standard deviation (ddof=1) from running sums"""
+        variance = DatasetCube._safe_divide(sumsq - sums * DatasetCube._safe_divide(sums, counts), counts - 1)
+        return np.sqrt(np.maximum(variance, 0))
+    
+    @staticmethod
+    def _safe_divide(numerator, denominator):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1), np.nan)
+    
+    def _to_groups(self, group_by, counts, columns, selections):
+        """Turn dense result arrays into a list of non-empty group rows"""
+        counts = np.asarray(counts)
+        groups = []
+        for position in np.ndindex(counts.shape):
+            if counts[position] == 0:
+                continue
+            row = {}
+            for dim, col in enumerate(group_by):
+                row[col] = self.levels[col][selections[dim][position[dim]]]
+            for name, values in columns.items():
+                value = float(np.asarray(values)[position])
+                if name in ('count', 'disease_count'):
+                    row[name] = int(value)
+                else:
+                    row[name] = None if np.isnan(value) else round(value, 4)
+            groups.append(row)
+        return groups
@@ -3,22 +3,37 @@ Cardiovascular Disease Prediction - Flask Backend API v2.0
 Enhanced production-ready API with logging, validation, and monitoring
 """
 
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory
 from flask_cors import CORS
 import pickle
-import pandas as pd
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
-import uuid
+import json
+import time
 import logging
+import atexit
+import threading
 
 # Import custom modules
 from config import app_config
 from logger import setup_logging, log_prediction, log_api_call, log_error
 from validators import PredictionValidator
 from models import PredictionRecord, StatisticsRecord
-from utils import AgeConverter, RiskAssessor, BMICalculator, DataPreprocessor, ResponseFormatter, HealthCheck, DateUtils
+from utils import AgeConverter, RiskAssessor, BMICalculator, DataPreprocessor, ResponseFormatter, HealthCheck, DateUtils, DistilledModel
+from retrain_worker import RetrainingService
+from analytics import DatasetSnapshot
+from metrics import PredictionMetrics
+from live_stream import StatsBroadcaster
+from cache import GenerationCounter, SectionCache, conditional_get, make_etag, set_boot_id
+from compression import CompressionMiddleware
+from history_store import SortableIdGenerator, create_history_store, encode_cursor, decode_cursor
+from prediction_db import PredictionDatabase, sqlite_path_from_uri
+from history_export import EXPORT_FIELDS, FORMATS, available_formats, id_bound, iter_database, iter_history, select_fields
+from search_index import PredictionSearchIndex, parse_criteria
+from shared_state import SharedState, SharedStatisticsRecord, SharedGenerationCounter, SharedHistoryStore
+from snapshots import PredictionSnapshot, Snapshotter, catch_up
+from prediction_state import PredictionState
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
 
@@ -31,54 +46,303 @@ CORS(app)
 # Setup logging with the custom config class
 setup_logging(app, app_config)
 
+# Compress responses per Accept-Encoding
+if app.config.get('COMPRESSION_ENABLED', True):
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        encodings=app.config.get('JSON_ACCEPT_ENCODING', 'gzip'),
+        min_size=app.config.get('COMPRESSION_MIN_SIZE', 1024),
+        gzip_level=app.config.get('COMPRESSION_GZIP_LEVEL', 6),
+        brotli_quality=app.config.get('COMPRESSION_BROTLI_QUALITY', 4),
+        stream=app.config.get('COMPRESSION_STREAMING', True)
+    )
+
 # ==================== GLOBAL STATE ====================
 
 # Prediction history storage
-prediction_history = {}
+# Prediction history (bounded by size and age) and lifetime aggregates
+prediction_history = create_history_store(
+    app.config.get('HISTORY_BACKEND', 'columnar'),
+    max_size=app.config.get('MAX_PREDICTIONS_IN_MEMORY', 10000),
+    retention_hours=app.config.get('PREDICTION_RETENTION_HOURS', 24),
+    index=PredictionSearchIndex() if app.config.get('SEARCH_INDEX_ENABLED', True) else None,
+    change_log_size=app.config.get('HISTORY_CHANGE_LOG_SIZE', 10000)
+)
 prediction_stats = StatisticsRecord()
+stats_generation = GenerationCounter()  # bumped on every insert or clear, versions ETags
+prediction_ids = SortableIdGenerator()  # time-ordered IDs, so the history index needs no sort
 
 # Model and scaler
 model = None
 scaler = None
 feature_names = None
+model_metadata = {}
+student_model = None
 model_loaded = False
 
+# Version of the loaded artifacts (mtime of the metadata file, written last by
+# the pipeline) and when we last checked the disk for a newer one
+model_version = None
+last_model_check = 0.0
+
+# Reference dataset statistics, computed once and refreshed when the file changes
+dataset_snapshot = DatasetSnapshot(
+    app.config.get('DATASET_FILE', 'cardio_train (1).csv'),
+    check_interval=app.config.get('DATASET_CHECK_SECONDS', 1.0)
+)
+try:
+    dataset_snapshot.get()
+except Exception as e:
+    app.logger.warning(f"⚠ Dataset snapshot not built at startup: {e}")
+
+# Serving-side inference latency and how often the student answered
+inference_stats = {'count': 0, 'total_ms': 0.0, 'student_served': 0, 'teacher_fallbacks': 0}
+inference_stats_lock = threading.Lock()
+
+# Per-second/minute/hour prediction counters in fixed-size ring buffers
+prediction_metrics = PredictionMetrics(app.config.get('METRICS_WINDOW_SLOTS'))
+
+# Server-Sent Events fan-out of coalesced stat deltas to open dashboards
+stats_broadcaster = StatsBroadcaster(
+    lambda: prediction_state.stats_snapshot().get_summary(),
+    max_rate_hz=app.config.get('STREAM_MAX_RATE_HZ', 2.0),
+    heartbeat_seconds=app.config.get('STREAM_HEARTBEAT_SECONDS', 15),
+    backlog=app.config.get('STREAM_BACKLOG_FRAMES', 64),
+    max_subscribers=app.config.get('STREAM_MAX_SUBSCRIBERS', 200),
+    max_predictions_per_frame=app.config.get('STREAM_MAX_PREDICTIONS_PER_FRAME', 50)
+)
+
+# ==================== PERSISTENCE ====================
+
+def init_prediction_db():
+    """Open the SQLite prediction store, or None when persistence is off"""
+    db_path = sqlite_path_from_uri(app.config.get('SQLALCHEMY_DATABASE_URI'))
+    if not app.config.get('PREDICTION_DB_ENABLED', True) or db_path is None:
+        return None
+    try:
+        database = PredictionDatabase(
+            db_path,
+            batch_size=app.config.get('PREDICTION_DB_BATCH_SIZE', 500),
+            flush_interval=app.config.get('PREDICTION_DB_FLUSH_INTERVAL', 0.2),
+            queue_size=app.config.get('PREDICTION_DB_QUEUE_SIZE', 10000),
+            commit_retries=app.config.get('PREDICTION_DB_COMMIT_RETRIES', 3),
+            retry_backoff=app.config.get('PREDICTION_DB_RETRY_BACKOFF', 0.1)
+        )
+    except Exception as e:
+        app.logger.warning(f"⚠ Prediction database unavailable, history is memory-only: {e}")
+        return None
+    # Commit whatever is still queued when the worker exits
+    atexit.register(database.flush, 5.0)
+    return database
+
+def restore_from_db():
+    """
+    Rebuild the stats and the retained history from the database
+    
+    Starts from the latest snapshot (if any) and replays only the predictions
+    committed after it, then leaves a Snapshotter running to keep it current.
+    """
+    global snapshotter
+    start = time.perf_counter()
+    history_size = app.config.get('MAX_PREDICTIONS_IN_MEMORY', 10000)
+    snapshot_path = None
+    snapshot = None
+    if app.config.get('SNAPSHOT_ENABLED', True):
+        snapshot_path = app.config.get('SNAPSHOT_PATH') or f'{prediction_db.path}-snapshot'
+        snapshot = PredictionSnapshot.load(snapshot_path, history_size)
+    snapshot, replayed = catch_up(snapshot or PredictionSnapshot(history_size), prediction_db)
+    
+    retention_hours = app.config.get('PREDICTION_RETENTION_HOURS', 24)
+    cutoff = (datetime.now() - timedelta(hours=retention_hours)).isoformat() if retention_hours else None
+    records = snapshot.records(cutoff)
+    prediction_stats.merge(snapshot.stats)
+    restored = prediction_history.add_batch(records)
+    skipped = len(records['id']) - restored  # IDs from before sortable IDs, or out of order
+    stats_generation.bump()
+    
+    if snapshot_path is not None:
+        snapshotter = Snapshotter(prediction_db, snapshot_path, snapshot,
+                                  interval=app.config.get('SNAPSHOT_INTERVAL_SECONDS', 60)).start()
+        atexit.register(snapshotter.stop)
+    app.logger.info(f"[OK] Restored {prediction_stats.total_predictions} predictions from the database "
+                    f"in {time.perf_counter() - start:.2f}s ({replayed} replayed after the snapshot, "
+                    f"{restored} in history, {skipped} skipped)")
+
+def init_shared_state():
+    """Switch the prediction globals to the cross-worker store (None if not configured)"""
+    global prediction_history, prediction_stats, stats_generation
+    if not app.config.get('SHARED_STATE_ENABLED', False):
+        return None
+    if prediction_db is None:
+        app.logger.warning("⚠ SHARED_STATE needs the prediction database; each worker keeps its own state")
+        return None
+    try:
+        state = SharedState(app.config.get('SHARED_STATE_PATH') or f'{prediction_db.path}-stats')
+        state.attach(prediction_db)
+    except Exception as e:
+        app.logger.warning(f"⚠ Shared state unavailable, each worker keeps its own state: {e}")
+        return None
+    
+    prediction_history = SharedHistoryStore(
+        prediction_db, state,
+        max_size=app.config.get('MAX_PREDICTIONS_IN_MEMORY', 10000),
+        retention_hours=app.config.get('PREDICTION_RETENTION_HOURS', 24)
+    )
+    prediction_stats = SharedStatisticsRecord(state)
+    stats_generation = SharedGenerationCounter(state, 'stats_generation')
+    prediction_ids.node = state.allocate_node()
+    # Same ETags from every worker, so a 304 does not depend on who answers
+    set_boot_id(state.epoch)
+    app.logger.info(f"[OK] Shared prediction state at {state.path} "
+                    f"({prediction_stats.total_predictions} predictions, worker node {prediction_ids.node})")
+    return state
+
+prediction_db = init_prediction_db()
+shared_state = init_shared_state()
+snapshotter = None
+# Writers go through prediction_state.write(); readers use the store's page reads or stats_snapshot()
+prediction_state = PredictionState(prediction_history, prediction_stats, stats_generation)
+if shared_state is None and prediction_db is not None and app.config.get('PREDICTION_DB_RESTORE', True):
+    try:
+        restore_from_db()
+    except Exception as e:
+        app.logger.warning(f"⚠ Could not restore predictions from the database: {e}")
+
 # ==================== MODEL INITIALIZATION ====================
 
+def get_metadata_mtime():
+    """Modification time of the model metadata file, or None if missing"""
+    try:
+        return os.path.getmtime(app.config.get('MODEL_METADATA_FILE', 'model_metadata.json'))
+    except OSError:
+        return None
+
 def load_model():
     """Load ML model and scaler"""
-    global model, scaler, feature_names, model_loaded
+    global model, scaler, feature_names, model_metadata, student_model, model_loaded, model_version
     
     try:
         model_file = app.config.get('MODEL_FILE', 'cardio_model.pkl')
         scaler_file = app.config.get('SCALER_FILE', 'scaler.pkl')
         features_file = app.config.get('FEATURES_FILE', 'feature_names.pkl')
+        metadata_file = app.config.get('MODEL_METADATA_FILE', 'model_metadata.json')
+        version = get_metadata_mtime()
         
+        # Load everything first, then swap, so requests never mix old and new artifacts
         with open(model_file, 'rb') as f:
-            model = pickle.load(f)
+            new_model = pickle.load(f)
         
         with open(scaler_file, 'rb') as f:
-            scaler = pickle.load(f)
+            new_scaler = pickle.load(f)
         
         with open(features_file, 'rb') as f:
-            feature_names = pickle.load(f)
+            new_feature_names = pickle.load(f)
+        
+        # Training metadata is optional (older artifacts don't have it)
+        try:
+            with open(metadata_file, 'r') as f:
+                new_metadata = json.load(f)
+        except (FileNotFoundError, ValueError):
+            new_metadata = {}
+        
+        new_student = load_student_model()
         
+        model, scaler, feature_names = new_model, new_scaler, new_feature_names
+        model_metadata, student_model, model_version = new_metadata, new_student, version
         model_loaded = True
         app.logger.info("[OK] ML Model loaded successfully!")
         app.logger.info(f"  - Model type: {type(model).__name__}")
         app.logger.info(f"  - Features: {len(feature_names)}")
-        
+    
     except FileNotFoundError as e:
+        if model_loaded:
+            app.logger.error(f"⚠ Model reload failed, keeping current model: {e}")
+            return
         model_loaded = False
         app.logger.error(f"⚠ Model files not found: {e}")
         app.logger.error("  Run: python train_model.py")
     except Exception as e:
+        if model_loaded:
+            app.logger.error(f"⚠ Model reload failed, keeping current model: {e}")
+            return
         model_loaded = False
         app.logger.error(f"⚠ Error loading model: {e}")
 
+def load_student_model():
+    """Load the distilled student model if enabled and available"""
+    if not app.config.get('STUDENT_FAST_PATH', False):
+        return None
+    
+    student_file = app.config.get('STUDENT_MODEL_FILE', 'student_model.pkl')
+    try:
+        with open(student_file, 'rb') as f:
+            student = DistilledModel(pickle.load(f))
+        app.logger.info(f"  - Student fast path enabled ({len(student.value)} nodes)")
+        return student
+    except FileNotFoundError:
+        app.logger.info("  - No student model found, serving teacher only")
+    except Exception as e:
+        app.logger.warning(f"⚠ Error loading student model: {e}")
+    return None
+
 # Load model on startup
 load_model()
 
+# Background retraining (triggered via API, or scheduled by RETRAIN_INTERVAL_HOURS)
+retraining_service = RetrainingService(app.config, on_complete=load_model)
+retraining_service.start_scheduler()
+
+# ==================== RESPONSE VERSIONS ====================
+
+def history_etag():
+    """Changes whenever a prediction is stored, evicted or the history is cleared"""
+    return make_etag('history', prediction_history.generation)
+
+def prediction_stats_etag():
+    """Changes whenever a prediction is counted or the stats are reset"""
+    return make_etag('prediction-stats', stats_generation.value)
+
+def model_info_etag():
+    """Changes when a new model is loaded"""
+    return make_etag('model', model_version, model_loaded)
+
+def model_stats_etag():
+    """Changes with every prediction the model serves"""
+    return make_etag('model-stats', model_version, inference_stats['count'])
+
+def analytics_etag():
+    """Content hash of the reference dataset"""
+    return make_etag('analytics', dataset_snapshot.get()[2])
+
+def prediction_status_etag():
+    """Changes with the stats or the recent records"""
+    return make_etag('prediction-status', stats_generation.value, prediction_history.generation)
+
+def health_etag():
+    return make_etag('health', model_loaded, app.config.get('API_VERSION', '2.0.0'))
+
+# ==================== RESPONSE SHAPES ====================
+
+LIST_FORMATS = ('rows', 'columnar')
+
+def list_shape(available=EXPORT_FIELDS):
+    """
+    (fields, columnar) for a list endpoint from ?fields= and ?format=
+    
+    fields is None when not given (the endpoint's full record); columnar is
+    True for format=columnar, one array per field instead of one object per
+    record. Raises ValueError for an unknown field or format.
+    """
+    list_format = request.args.get('format', 'rows').lower()
+    if list_format not in LIST_FORMATS:
+        raise ValueError(f"Unknown format '{list_format}'. Use one of: {', '.join(LIST_FORMATS)}")
+    fields = select_fields(request.args['fields'], available) if request.args.get('fields') else None
+    return fields, list_format == 'columnar'
+
+def record_count(records, columnar):
+    """Number of records in a rows or columnar list"""
+    return len(next(iter(records.values()), ())) if columnar else len(records)
+
 # ==================== FRONTEND ROUTES ====================
 
 @app.route('/')
@@ -160,6 +424,21 @@ def feedback_page():
 #     """Log all requests (uncomment for debugging)"""
 #     app.logger.debug(f"{request.method} {request.path}")
 
+@app.before_request
+def check_model_update():
+    """Reload the model when a retraining (in any process) has published a new one"""
+    global last_model_check
+    
+    now = time.monotonic()
+    if now - last_model_check < app.config.get('MODEL_RELOAD_CHECK_SECONDS', 5):
+        return
+    last_model_check = now
+    
+    version = get_metadata_mtime()
+    if version is not None and version != model_version:
+        app.logger.info("New model artifacts detected, reloading")
+        load_model()
+
 @app.route('/api/predict', methods=['POST'])
 def predict():
     """
@@ -229,56 +508,92 @@ def predict():
             app.logger.error(f"Feature array creation error: {str(e)}, Data types: {[(k, type(v)) for k, v in data.items()]}")
             raise
         
-        # Scale features
-        features_scaled = scaler.transform(features)
+        inference_start = time.perf_counter()
+        served_by = 'teacher'
         
-        # Make prediction
-        prediction = model.predict(features_scaled)
-        probability = model.predict_proba(features_scaled)
+        # Fast path: the student answers unless it is close to a risk threshold
+        if student_model is not None:
+            student_prob = student_model.predict_disease_probability(features[0].tolist())
+            if not RiskAssessor.is_near_threshold(student_prob, app.config.get('STUDENT_CONFIDENCE_MARGIN', 5.0)):
+                served_by = 'student'
+                prob_disease = float(student_prob)
+                prob_healthy = 1.0 - prob_disease
+                pred_value = int(prob_disease >= 0.5)
         
-        # Extract scalar values - ensure they are Python scalars, not numpy arrays
-        pred_value = int(np.asarray(prediction).flatten()[0])
-        prob_array = np.asarray(probability).flatten()
-        prob_healthy = float(prob_array[0])
-        prob_disease = float(prob_array[1])
+        if served_by == 'teacher':
+            # Scale features
+            features_scaled = scaler.transform(features)
+            
+            # Make prediction (class derived from the probabilities, one model call)
+            probability = model.predict_proba(features_scaled)
+            prediction = model.classes_[np.argmax(probability, axis=1)]
+            
+            # Extract scalar values - ensure they are Python scalars, not numpy arrays
+            pred_value = int(np.asarray(prediction).flatten()[0])
+            prob_array = np.asarray(probability).flatten()
+            prob_healthy = float(prob_array[0])
+            prob_disease = float(prob_array[1])
+        
+        inference_ms = (time.perf_counter() - inference_start) * 1000
+        with inference_stats_lock:
+            inference_stats['count'] += 1
+            inference_stats['total_ms'] += inference_ms
+            if served_by == 'student':
+                inference_stats['student_served'] += 1
+            elif student_model is not None:
+                inference_stats['teacher_fallbacks'] += 1
         
         # Get risk assessment
         risk_info = RiskAssessor.get_risk_level(prob_disease)
         
-        # Generate unique prediction ID
-        prediction_id = str(uuid.uuid4())[:8]
-        
-        # Create prediction record
-        pred_record = PredictionRecord(
-            prediction_id=prediction_id,
-            prediction=pred_value,
-            probability=[prob_healthy, prob_disease],
-            risk_percentage=risk_info['percentage'],
-            risk_level=risk_info['level'],
-            color=risk_info['color'],
-            age_days=age_in_days,
-            age_years=age_in_years,
-            gender=data['gender'],
-            height=data['height'],
-            weight=data['weight'],
-            ap_hi=data['ap_hi'],
-            ap_lo=data['ap_lo'],
-            cholesterol=data['cholesterol'],
-            gluc=data['gluc'],
-            smoke=data['smoke'],
-            alco=data['alco'],
-            active=data['active'],
-            patient_name=data.get('patientName'),
-            father_name=data.get('fatherName'),
-            blood_group=data.get('bloodGroup'),
-            phone_number=data.get('phoneNumber'),
-            alt_phone_number=data.get('altPhoneNumber'),
-            doctor_name=data.get('doctorName')
-        )
+        # ID, record and store in one write section, so IDs reach the history in order
+        with prediction_state.write():
+            prediction_id = prediction_ids.next_id()
+            
+            # Create prediction record
+            pred_record = PredictionRecord(
+                prediction_id=prediction_id,
+                prediction=pred_value,
+                probability=[prob_healthy, prob_disease],
+                risk_percentage=risk_info['percentage'],
+                risk_level=risk_info['level'],
+                color=risk_info['color'],
+                age_days=age_in_days,
+                age_years=age_in_years,
+                gender=data['gender'],
+                height=data['height'],
+                weight=data['weight'],
+                ap_hi=data['ap_hi'],
+                ap_lo=data['ap_lo'],
+                cholesterol=data['cholesterol'],
+                gluc=data['gluc'],
+                smoke=data['smoke'],
+                alco=data['alco'],
+                active=data['active'],
+                patient_name=data.get('patientName'),
+                father_name=data.get('fatherName'),
+                blood_group=data.get('bloodGroup'),
+                phone_number=data.get('phoneNumber'),
+                alt_phone_number=data.get('altPhoneNumber'),
+                doctor_name=data.get('doctorName')
+            )
+            
+            # Store prediction
+            record = pred_record.to_dict()
+            prediction_history.add(prediction_id, record)
+            prediction_stats.add_prediction(pred_record)
+            if prediction_db is not None and shared_state is None:
+                prediction_db.enqueue(record)  # non-blocking put, written behind
         
-        # Store prediction
-        prediction_history[prediction_id] = pred_record.to_dict()
-        prediction_stats.add_prediction(pred_record)
+        prediction_metrics.record(risk_info['level'], pred_value == 1, inference_ms)
+        stats_broadcaster.publish_prediction({
+            'prediction_id': prediction_id,
+            'has_disease': bool(pred_value),
+            'risk_percentage': risk_info['percentage'],
+            'risk_level': risk_info['level'],
+            'color': risk_info['color'],
+            'timestamp': pred_record.timestamp
+        })
         
         # Log prediction
         log_prediction(app, prediction_id, data, risk_info)
@@ -293,6 +608,7 @@ def predict():
             'risk_percentage': risk_info['percentage'],
             'risk_level': risk_info['level'],
             'color': risk_info['color'],
+            'served_by': served_by,
             'timestamp': DateUtils.get_timestamp()
         }), 200
     
@@ -305,11 +621,14 @@ def predict():
 def get_prediction(prediction_id):
     """Get specific prediction by ID"""
     try:
-        if prediction_id not in prediction_history:
+        prediction = prediction_history.get(prediction_id)
+        if prediction is None and prediction_db is not None:
+            # Evicted from memory but still on disk
+            prediction = prediction_db.get(prediction_id)
+        if prediction is None:
             response, status = ResponseFormatter.error('Prediction not found', 404, 'NOT_FOUND')
             return jsonify(response), status
         
-        prediction = prediction_history[prediction_id]
         return jsonify({
             'status': 'success',
             'data': prediction,
@@ -321,10 +640,70 @@ def get_prediction(prediction_id):
         response, status = ResponseFormatter.error(str(e), 400)
         return jsonify(response), status
 
+BATCH_RESULT_FIELDS = ('prediction_id', 'prediction', 'risk_percentage', 'risk_level')
+
+def batch_columns(rows, predictions, probability, risk_infos):
+    """Column arrays for a batch of predictions, shaped like PredictionRecord.to_dict() fields"""
+    data = [row[1] for row in rows]
+    
+    def field(name, dtype=None):
+        values = [item.get(name) for item in data]
+        return np.array(values, dtype=dtype) if dtype is not None else values
+    
+    return {
+        'prediction': predictions,
+        'disease_probability': probability[:, 1],
+        'healthy_probability': probability[:, 0],
+        'risk_percentage': np.array([info['percentage'] for info in risk_infos], dtype=np.float64),
+        'risk_level': [info['level'] for info in risk_infos],
+        'color': [info['color'] for info in risk_infos],
+        'age_days': np.array([row[2] for row in rows], dtype=np.int64),
+        'age_years': field('age', np.int64),
+        'gender': field('gender', np.int64),
+        'height': field('height', np.float64),
+        'weight': field('weight', np.float64),
+        'bp_systolic': field('ap_hi', np.float64),
+        'bp_diastolic': field('ap_lo', np.float64),
+        'cholesterol': field('cholesterol', np.int64),
+        'gluc': field('gluc', np.int64),
+        'smoke': field('smoke', np.int64),
+        'alco': field('alco', np.int64),
+        'active': field('active', np.int64),
+        'patient_name': field('patientName'),
+        'father_name': field('fatherName'),
+        'blood_group': field('bloodGroup'),
+        'phone_number': field('phoneNumber'),
+        'alt_phone_number': field('altPhoneNumber'),
+        'doctor_name': field('doctorName'),
+        'timestamp': [datetime.now().isoformat()] * len(rows),
+        'status': ['completed'] * len(rows)
+    }
+
+def batch_results(columns, fields):
+    """{field: [values]} of a stored batch for the response; prediction_id is the record ID"""
+    results = {}
+    for name in fields:
+        if name == 'prediction_id':
+            values = columns['id']
+        elif name == 'has_disease':
+            values = [bool(value) for value in columns['prediction'].tolist()]
+        else:
+            values = columns[name]
+            values = values.tolist() if isinstance(values, np.ndarray) else values
+        results[name] = values
+    return results
+
 @app.route('/api/batch-predict', methods=['POST'])
 def batch_predict():
-    """Process multiple predictions at once"""
+    """Process multiple predictions at once (?fields= and ?format=columnar shape the results)"""
     try:
+        try:
+            fields, columnar = list_shape(('prediction_id',) + EXPORT_FIELDS[1:])
+        except ValueError as e:
+            response, status = ResponseFormatter.error(str(e), 400, 'INVALID_FIELDS')
+            return jsonify(response), status
+        fields = fields or list(BATCH_RESULT_FIELDS)
+        
         data = request.get_json()
         
         if 'predictions' not in data:
@@ -335,8 +714,9 @@ def batch_predict():
         if not is_valid:
             return jsonify(ResponseFormatter.error(error_msg, 400)[0]), 400
         
-        results = []
+        results = {name: [] for name in fields}
         failed = []
+        rows = []  # (index, request data, age in days, feature row) of the records to predict
         
         for idx, pred_data in enumerate(data['predictions']):
             try:
@@ -346,38 +726,61 @@ def batch_predict():
                     failed.append({'index': idx, 'error': error})
                     continue
                 
-                # Process prediction
                 age_in_years = int(pred_data['age'])
                 age_in_days = AgeConverter.years_to_days(age_in_years)
                 bmi = BMICalculator.calculate_bmi(pred_data['height'], pred_data['weight'])
-                
-                features = np.array([[
+                rows.append((idx, pred_data, age_in_days, [
                     age_in_days, pred_data['gender'], pred_data['height'], pred_data['weight'],
                     pred_data['ap_hi'], pred_data['ap_lo'], pred_data['cholesterol'],
                     pred_data['gluc'], pred_data['smoke'], pred_data['alco'], pred_data['active'], bmi
-                ]])
-                
-                features_scaled = scaler.transform(features)
-                prediction = model.predict(features_scaled)[0]
-                probability = model.predict_proba(features_scaled)[0]
-                
-                risk_info = RiskAssessor.get_risk_level(probability[1])
-                prediction_id = str(uuid.uuid4())[:8]
-                
-                results.append({
-                    'prediction_id': prediction_id,
-                    'prediction': int(prediction),
-                    'risk_percentage': risk_info['percentage'],
-                    'risk_level': risk_info['level']
-                })
+                ]))
             
             except Exception as e:
                 failed.append({'index': idx, 'error': str(e)})
         
+        if rows:
+            try:
+                # One model call for the whole batch
+                inference_start = time.perf_counter()
+                probability = model.predict_proba(scaler.transform(np.array([row[3] for row in rows], dtype=np.float64)))
+                predictions = model.classes_[np.argmax(probability, axis=1)].astype(np.int64)
+                row_inference_ms = (time.perf_counter() - inference_start) * 1000 / len(rows)
+            except Exception as e:
+                failed.extend({'index': row[0], 'error': str(e)} for row in rows)
+                rows = []
+        
+        if rows:
+            risk_infos = [RiskAssessor.get_risk_level(prob) for prob in probability[:, 1].tolist()]
+            columns = batch_columns(rows, predictions, probability, risk_infos)
+            
+            # IDs, history and stats for the whole batch in one write section
+            with prediction_state.write():
+                columns['id'] = prediction_ids.next_ids(len(rows))
+                prediction_history.add_batch(columns)
+                prediction_stats.add_batch(columns)
+                if prediction_db is not None and shared_state is None:
+                    prediction_db.enqueue_batch(columns)
+            
+            for prediction_id, prediction, risk_info in zip(columns['id'], predictions.tolist(), risk_infos):
+                prediction_metrics.record(risk_info['level'], prediction == 1, row_inference_ms)
+                stats_broadcaster.publish_prediction({
+                    'prediction_id': prediction_id,
+                    'has_disease': bool(prediction),
+                    'risk_percentage': risk_info['percentage'],
+                    'risk_level': risk_info['level'],
+                    'color': risk_info['color'],
+                    'timestamp': columns['timestamp'][0]
+                })
+            results = batch_results(columns, fields)
+        
+        if not columnar:
+            results = [dict(zip(fields, row)) for row in zip(*results.values())]
+        
         return jsonify({
             'status': 'success',
+            'format': 'columnar' if columnar else 'rows',
             'results': results,
-            'success_count': len(results),
+            'success_count': len(rows),
             'failed_count': len(failed),
             'failed': failed if failed else None,
             'timestamp': DateUtils.get_timestamp()
@@ -388,20 +791,23 @@ def batch_predict():
         response, status = ResponseFormatter.error(str(e), 400)
         return jsonify(response), status
 
+def prediction_status_payload():
+    """Body of /api/prediction-status, without the timestamp"""
+    summary = prediction_state.stats_snapshot().get_summary()
+    return {
+        'status': 'active',
+        'total_predictions': summary['total_predictions'],
+        'risk_distribution': summary['risk_distribution'],
+        'disease_rate': summary['disease_rate'],
+        'recent_predictions': prediction_history.recent(10),
+        'history_store': prediction_history.get_stats()
+    }
+
 @app.route('/api/prediction-status', methods=['GET'])
 def prediction_status():
     """Get overall prediction status"""
     try:
-        summary = prediction_stats.get_summary()
-        
-        return jsonify({
-            'status': 'active',
-            'total_predictions': summary['total_predictions'],
-            'risk_distribution': summary['risk_distribution'],
-            'disease_rate': summary['disease_rate'],
-            'recent_predictions': list(prediction_history.values())[-10:],
-            'timestamp': DateUtils.get_timestamp()
-        }), 200
+        return jsonify(dict(prediction_status_payload(), timestamp=DateUtils.get_timestamp())), 200
     
     except Exception as e:
         log_error(app, "StatusError", str(e))
@@ -409,29 +815,71 @@ def prediction_status():
         return jsonify(response), status
 
 @app.route('/api/prediction-history', methods=['GET'])
+@conditional_get(history_etag, 'CACHE_CONTROL_PREDICTIONS')
 def prediction_history_endpoint():
-    """Get prediction history with pagination"""
+    """Get prediction history (newest first) with offset or cursor pagination, or the changes since a sync cursor"""
     try:
         limit = request.args.get('limit', 100, type=int)
         offset = request.args.get('offset', 0, type=int)
         
         # Validate pagination params
-        limit = min(limit, 1000)  # Max 1000 per request
+        limit = max(1, min(limit, 1000))  # Max 1000 per request
         offset = max(0, offset)
         
-        history_list = list(prediction_history.values())
-        history_list.sort(key=lambda x: x['timestamp'], reverse=True)
+        # Only the requested fields are built and serialized
+        try:
+            fields, columnar = list_shape()
+        except ValueError as e:
+            response, status = ResponseFormatter.error(str(e), 400, 'INVALID_FIELDS')
+            return jsonify(response), status
+        
+        # Delta sync: records stored and IDs evicted after a sync cursor
+        if 'since' in request.args:
+            try:
+                since = decode_cursor(request.args['since']) if request.args['since'] else None
+            except ValueError as e:
+                response, status = ResponseFormatter.error(str(e), 400, 'INVALID_CURSOR')
+                return jsonify(response), status
+            delta = prediction_history.changes(since, limit, fields=fields, columnar=columnar)
+            return jsonify({
+                'status': 'success',
+                'format': 'columnar' if columnar else 'rows',
+                # True: the cursor is too old (or from before a restart or clear); reload the pages
+                'reset': delta['reset'],
+                'returned': record_count(delta['records'], columnar),
+                'has_more': delta['has_more'],
+                'cursor': encode_cursor(delta['cursor']),
+                'predictions': delta['records'],
+                'removed': delta['removed'],
+                'timestamp': DateUtils.get_timestamp()
+            }), 200
+        
+        # Cursors stay stable while new predictions arrive; offsets shift
+        try:
+            before = decode_cursor(request.args['before']) if request.args.get('before') else None
+            after = decode_cursor(request.args['after']) if request.args.get('after') else None
+            page = prediction_history.page(limit, offset=offset, before=before, after=after,
+                                           fields=fields, columnar=columnar)
+        except ValueError as e:
+            response, status = ResponseFormatter.error(str(e), 400, 'INVALID_CURSOR')
+            return jsonify(response), status
         
-        total = len(history_list)
-        paginated = history_list[offset:offset+limit]
+        paginated = page['records']
+        returned = record_count(paginated, columnar)
         
         response_data = {
             'status': 'success',
-            'total_records': total,
-            'returned': len(paginated),
+            'format': 'columnar' if columnar else 'rows',
+            'total_records': page['total'],
+            'returned': returned,
             'limit': limit,
-            'offset': offset,
-            'has_more': offset + limit < total,
+            'offset': offset if before is None and after is None else None,
+            'has_more': page['has_more'],
+            # Pass as ?before= for the next (older) page, ?after= to fetch newer records
+            'next_cursor': encode_cursor(page['oldest_id']) if page['oldest_id'] else request.args.get('before'),
+            'prev_cursor': encode_cursor(page['newest_id']) if page['newest_id'] else request.args.get('after'),
+            # Pass as ?since= to get only what changed after this page was read
+            'sync_cursor': encode_cursor(page['sync_cursor']),
             'predictions': paginated,
             'timestamp': DateUtils.get_timestamp()
         }
@@ -443,59 +891,209 @@ def prediction_history_endpoint():
         response, status = ResponseFormatter.error(str(e), 400)
         return jsonify(response), status
 
+@app.route('/api/prediction-search', methods=['GET'])
+@conditional_get(history_etag, 'CACHE_CONTROL_PREDICTIONS')
+def prediction_search():
+    """Search the prediction history by patient, doctor, phone, blood group or risk level"""
+    try:
+        limit = max(1, min(request.args.get('limit', 50, type=int), 1000))
+        offset = max(0, request.args.get('offset', 0, type=int))
+        
+        try:
+            criteria = parse_criteria(request.args)
+        except ValueError as e:
+            response, status = ResponseFormatter.error(str(e), 400, 'INVALID_QUERY')
+            return jsonify(response), status
+        try:
+            fields, columnar = list_shape()
+        except ValueError as e:
+            response, status = ResponseFormatter.error(str(e), 400, 'INVALID_FIELDS')
+            return jsonify(response), status
+        
+        start = time.perf_counter()
+        try:
+            result = prediction_history.search(criteria, limit, offset, fields=fields, columnar=columnar)
+        except RuntimeError as e:
+            response, status = ResponseFormatter.error(str(e), 503, 'SEARCH_DISABLED')
+            return jsonify(response), status
+        took_ms = (time.perf_counter() - start) * 1000
+        returned = record_count(result['records'], columnar)
+        
+        return jsonify({
+            'status': 'success',
+            'format': 'columnar' if columnar else 'rows',
+            'query': criteria,
+            'total_matches': result['total'],
+            'returned': returned,
+            'limit': limit,
+            'offset': offset,
+            'has_more': offset + returned < result['total'],
+            'took_ms': round(took_ms, 3),
+            'predictions': result['records'],
+            'timestamp': DateUtils.get_timestamp()
+        }), 200
+    
+    except Exception as e:
+        log_error(app, "SearchError", str(e))
+        response, status = ResponseFormatter.error(str(e), 400)
+        return jsonify(response), status
+
+@app.route('/api/prediction-export', methods=['GET'])
+def prediction_export():
+    """Stream every stored prediction as CSV, NDJSON or Parquet (without the database: the in-memory window)"""
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in FORMATS:
+        response, status = ResponseFormatter.error(
+            f"Unknown format '{export_format}'. Use one of: {', '.join(FORMATS)}", 400, 'INVALID_FORMAT')
+        return jsonify(response), status
+    if export_format not in available_formats():
+        response, status = ResponseFormatter.error(
+            f'{export_format} export needs pyarrow (pip install pyarrow)', 501, 'FORMAT_UNAVAILABLE')
+        return jsonify(response), status
+    
+    try:
+        fields = select_fields(request.args.get('fields'))
+    except ValueError as e:
+        response, status = ResponseFormatter.error(str(e), 400, 'INVALID_FIELDS')
+        return jsonify(response), status
+    
+    # Time range (ISO timestamps, inclusive) as prediction-ID bounds
+    try:
+        after = id_bound(request.args['since']) if request.args.get('since') else None
+        last = id_bound(request.args['until'], upper=True) if request.args.get('until') else None
+    except ValueError as e:
+        response, status = ResponseFormatter.error(str(e), 400, 'INVALID_TIMESTAMP')
+        return jsonify(response), status
+    
+    mimetype, extension, stream = FORMATS[export_format]
+    chunk_size = app.config.get('EXPORT_CHUNK_SIZE', 1000)
+    if prediction_db is not None:
+        # The database holds every prediction; the in-memory history only the newest
+        prediction_db.flush(timeout=app.config.get('EXPORT_FLUSH_TIMEOUT', 2.0))
+        chunks = iter_database(prediction_db, chunk_size, after, last, fields)
+    else:
+        chunks = iter_history(prediction_history, chunk_size, after, last, fields)
+    filename = f"predictions-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{extension}"
+    app.logger.info(f"History export started: {export_format}, {len(fields)} fields")
+    
+    return Response(stream(chunks, fields), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Cache-Control': 'no-store',
+        'X-Accel-Buffering': 'no'
+    })
+
+def prediction_stats_payload(stats, percentiles=(25, 50, 75, 90, 95, 99), include_histograms=False):
+    """Body of /api/prediction-stats for one StatsSnapshot, without the timestamp"""
+    if stats.total_predictions == 0:
+        return {
+            'status': 'no_data',
+            'total_predictions': 0,
+            'message': 'No predictions made yet'
+        }
+    
+    # Served from running aggregates: cost does not grow with the history
+    summary = stats.get_summary()
+    metrics = stats.get_metric_summaries(percentiles, include_histograms)
+    return {
+        'status': 'success',
+        'total_predictions': summary['total_predictions'],
+        'risk_distribution': summary['risk_distribution'],
+        'disease_rate': summary['disease_rate'],
+        'risk_percentage_stats': metrics['risk_percentage'],
+        'age_stats': metrics['age_years'],
+        'weight_stats': metrics['weight'],
+        'bp_stats': {
+            'systolic': metrics['bp_systolic'],
+            'diastolic': metrics['bp_diastolic']
+        }
+    }
+
 @app.route('/api/prediction-stats', methods=['GET'])
+@conditional_get(prediction_stats_etag, 'CACHE_CONTROL_PREDICTIONS')
 def prediction_stats_endpoint():
     """Get detailed prediction statistics"""
     try:
-        if not prediction_history:
-            return jsonify({
-                'status': 'no_data',
-                'total_predictions': 0,
-                'message': 'No predictions made yet'
-            }), 200
+        stats = prediction_state.stats_snapshot()  # one consistent view for the whole response
+        if stats.total_predictions == 0:
+            return jsonify(prediction_stats_payload(stats)), 200
         
-        predictions_list = list(prediction_history.values())
+        # Optional ?percentiles=50,90,99 and ?histograms=true
+        percentiles = (25, 50, 75, 90, 95, 99)
+        if request.args.get('percentiles'):
+            try:
+                percentiles = tuple(float(p) for p in request.args['percentiles'].split(','))
+            except ValueError:
+                percentiles = ()
+            if not percentiles or any(p < 0 or p > 100 for p in percentiles):
+                response, status = ResponseFormatter.error('percentiles must be numbers between 0 and 100', 400, 'INVALID_PERCENTILES')
+                return jsonify(response), status
+        include_histograms = request.args.get('histograms', 'false').lower() == 'true'
         
-        risk_percentages = [p['risk_percentage'] for p in predictions_list]
-        ages_days = [p['age_days'] for p in predictions_list]
-        ages_years = [p['age_years'] for p in predictions_list]
-        weights = [p['weight'] for p in predictions_list]
+        payload = prediction_stats_payload(stats, percentiles, include_histograms)
+        return jsonify(dict(payload, timestamp=DateUtils.get_timestamp())), 200
+    
+    except Exception as e:
+        log_error(app, "StatsError", str(e))
+        response, status = ResponseFormatter.error(str(e), 400)
+        return jsonify(response), status
+
+@app.route('/api/prediction-timeseries', methods=['GET'])
+def prediction_timeseries():
+    """Prediction volume, risk mix and latency over the last N time windows"""
+    try:
+        resolution = request.args.get('resolution', 'minute')
+        windows = request.args.get('windows', 60, type=int)
         
-        disease_count = sum(1 for p in predictions_list if p['has_disease'])
+        try:
+            series = prediction_metrics.get_series(resolution, windows)
+        except ValueError as e:
+            response, status = ResponseFormatter.error(str(e), 400, 'INVALID_RESOLUTION')
+            return jsonify(response), status
         
         return jsonify({
             'status': 'success',
-            'total_predictions': len(predictions_list),
-            'risk_distribution': prediction_stats.get_summary()['risk_distribution'],
-            'disease_rate': prediction_stats.get_summary()['disease_rate'],
-            'risk_percentage_stats': {
-                'min': round(min(risk_percentages), 2),
-                'max': round(max(risk_percentages), 2),
-                'average': round(sum(risk_percentages) / len(risk_percentages), 2)
-            },
-            'age_stats': {
-                'min': min(ages_years),
-                'max': max(ages_years),
-                'average': round(sum(ages_years) / len(ages_years), 2)
-            },
-            'weight_stats': {
-                'min': round(min(weights), 2),
-                'max': round(max(weights), 2),
-                'average': round(sum(weights) / len(weights), 2)
-            },
+            **series,
             'timestamp': DateUtils.get_timestamp()
         }), 200
     
     except Exception as e:
-        log_error(app, "StatsError", str(e))
+        log_error(app, "TimeseriesError", str(e))
         response, status = ResponseFormatter.error(str(e), 400)
         return jsonify(response), status
 
+@app.route('/api/stream', methods=['GET'])
+def stats_stream():
+    """Server-Sent Events stream of prediction stat deltas"""
+    stream = stats_broadcaster.subscribe(request.headers.get('Last-Event-ID'))
+    if stream is None:
+        response, status = ResponseFormatter.error('Too many live subscribers, poll /api/prediction-status instead', 503, 'STREAM_FULL')
+        return jsonify(response), status
+    
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # let nginx pass frames through unbuffered
+    })
+
+@app.route('/api/stream-status', methods=['GET'])
+def stream_status():
+    """Live stream subscriber count and frame counters"""
+    return jsonify({
+        'status': 'success',
+        'stream': stats_broadcaster.get_stats(),
+        'timestamp': DateUtils.get_timestamp()
+    }), 200
+
 @app.route('/api/prediction-health', methods=['GET'])
 def prediction_health():
     """Check prediction service health"""
     try:
-        health_status = HealthCheck.get_system_status(model_loaded, len(prediction_history))
+        health_status = HealthCheck.get_system_status(model_loaded, prediction_stats.total_predictions)
+        health_status['history_store'] = prediction_history.get_stats()
+        health_status['state'] = prediction_state.get_stats()
+        health_status['dashboard_sections'] = dashboard_sections.get_stats()
+        health_status['persistence'] = prediction_db.get_stats() if prediction_db is not None else {'enabled': False}
+        if snapshotter is not None:
+            health_status['persistence']['snapshot'] = snapshotter.get_stats()
         return jsonify(health_status), 200
     
     except Exception as e:
@@ -503,34 +1101,73 @@ def prediction_health():
         response, status = ResponseFormatter.error(str(e), 400)
         return jsonify(response), status
 
+def model_info_payload():
+    """Body of /api/model-info, without the timestamp (fixed until another model is loaded)"""
+    return {
+        'status': 'success',
+        'model_type': type(model).__name__ if model_loaded else 'Not Loaded',
+        'model_loaded': model_loaded,
+        'features': list(feature_names) if feature_names is not None else [],
+        'feature_count': len(feature_names) if feature_names is not None else 0,
+        'model_name': model_metadata.get('model_name'),
+        'trained_at': model_metadata.get('trained_at'),
+        'training_metrics': model_metadata.get('metrics', {}),
+        'student': {
+            'enabled': student_model is not None,
+            'distillation_metrics': student_model.metrics if student_model is not None else {}
+        },
+        'version': app.config.get('API_VERSION', '2.0.0')
+    }
+
+def model_stats_payload():
+    """Body of /api/model-stats, without the timestamp"""
+    with inference_stats_lock:
+        inference = dict(inference_stats)
+    return {
+        'status': 'success',
+        'model_version': model_version,
+        'predictions_served': inference['count'],
+        'serving_latency_ms': round(inference['total_ms'] / inference['count'], 3) if inference['count'] else None,
+        'student_served': inference['student_served'],
+        'teacher_fallbacks': inference['teacher_fallbacks']
+    }
+
 @app.route('/api/model-info', methods=['GET'])
+@conditional_get(model_info_etag, 'CACHE_CONTROL_MODEL_INFO')
 def model_info():
     """Get model information"""
     try:
-        return jsonify({
-            'status': 'success',
-            'model_type': type(model).__name__ if model_loaded else 'Not Loaded',
-            'model_loaded': model_loaded,
-            'features': list(feature_names) if feature_names is not None else [],
-            'feature_count': len(feature_names) if feature_names is not None else 0,
-            'version': app.config.get('API_VERSION', '2.0.0'),
-            'timestamp': DateUtils.get_timestamp()
-        }), 200
+        return jsonify(dict(model_info_payload(), timestamp=DateUtils.get_timestamp())), 200
     
     except Exception as e:
         log_error(app, "ModelInfoError", str(e))
         response, status = ResponseFormatter.error(str(e), 400)
         return jsonify(response), status
 
+@app.route('/api/model-stats', methods=['GET'])
+@conditional_get(model_stats_etag, 'CACHE_CONTROL_PREDICTIONS')
+def model_stats():
+    """Serving counters of the loaded model (single predictions: latency, student vs teacher)"""
+    try:
+        return jsonify(dict(model_stats_payload(), timestamp=DateUtils.get_timestamp())), 200
+    
+    except Exception as e:
+        log_error(app, "ModelStatsError", str(e))
+        response, status = ResponseFormatter.error(str(e), 400)
+        return jsonify(response), status
+
+def health_payload():
+    """Body of /api/health, without the timestamp"""
+    return {
+        'status': 'healthy' if model_loaded else 'degraded',
+        'message': 'API is running' if model_loaded else 'API running but model not loaded',
+        'version': app.config.get('API_VERSION', '2.0.0')
+    }
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """API health check"""
-    return jsonify({
-        'status': 'healthy' if model_loaded else 'degraded',
-        'message': 'API is running' if model_loaded else 'API running but model not loaded',
-        'version': app.config.get('API_VERSION', '2.0.0'),
-        'timestamp': DateUtils.get_timestamp()
-    }), 200
+    return jsonify(dict(health_payload(), timestamp=DateUtils.get_timestamp())), 200
 
 @app.route('/api/test-prediction', methods=['GET'])
 def test_prediction():
@@ -587,65 +1224,181 @@ def test_prediction():
         return jsonify({'error': str(e), 'model_working': False}), 500
 
 @app.route('/api/analytics', methods=['GET'])
+@conditional_get(analytics_etag, 'CACHE_CONTROL_ANALYTICS')
 def analytics_data():
-    """Get analytics data for dashboard"""
+    """Get analytics data for dashboard (served from the precomputed snapshot)"""
     try:
-        df = pd.read_csv('cardio_train (1).csv', sep=';')
-        
-        # Calculate age distribution
-        age_buckets = {}
-        for age_days in df['age']:
-            age_years = age_days // 365
-            bucket = f"{(age_years // 10) * 10}-{(age_years // 10) * 10 + 10}"
-            age_buckets[bucket] = age_buckets.get(bucket, 0) + 1
-        
-        stats = {
-            'total_records': len(df),
-            'disease_count': int(df['cardio'].sum()),
-            'healthy_count': int((df['cardio'] == 0).sum()),
-            'disease_percentage': float(df['cardio'].mean() * 100),
-            'age_stats': {
-                'min': int(df['age'].min()),
-                'max': int(df['age'].max()),
-                'mean': float(df['age'].mean())
-            },
-            'weight_stats': {
-                'min': float(df['weight'].min()),
-                'max': float(df['weight'].max()),
-                'mean': float(df['weight'].mean())
-            },
-            'height_stats': {
-                'min': float(df['height'].min()),
-                'max': float(df['height'].max()),
-                'mean': float(df['height'].mean())
-            },
-            'age_distribution': age_buckets,
-            'high_bp_count': int((df['ap_hi'] > 140).sum()),
-            'high_cholesterol_count': int((df['cholesterol'] >= 2).sum()),
-            'smokers_count': int((df['smoke'] == 1).sum())
-        }
-        
-        return jsonify(stats), 200
+        _, body, _ = dataset_snapshot.get()
+        return Response(body, status=200, mimetype='application/json')
     
     except Exception as e:
         log_error(app, "AnalyticsError", str(e))
         response, status = ResponseFormatter.error(str(e), 400)
         return jsonify(response), status
 
+@app.route('/api/query', methods=['GET', 'POST'])
+def dataset_query():
+    """
+    Ad-hoc aggregate query over the reference dataset
+    
+    GET returns the schema (columns, category levels, metrics).
+    POST body:
+    {
+        "filters": {"smoke": 1, "cholesterol": [2, 3], "ap_hi": {"min": 140}},
+        "group_by": ["age_bucket", "gender"],
+        "metrics": ["count", "disease_rate", "mean:ap_hi", "p90:ap_hi"]
+    }
+    """
+    try:
+        cube = dataset_snapshot.get_cube()
+        if request.method == 'GET':
+            return jsonify({'status': 'success', 'schema': cube.schema()}), 200
+        
+        query = request.get_json(silent=True) or {}
+        start = time.perf_counter()
+        result = cube.query(
+            filters=query.get('filters'),
+            group_by=query.get('group_by'),
+            metrics=query.get('metrics')
+        )
+        
+        return jsonify({
+            'status': 'success',
+            'groups': result['groups'],
+            'group_count': len(result['groups']),
+            'source': result['source'],
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 3),
+            'timestamp': DateUtils.get_timestamp()
+        }), 200
+    
+    except (ValueError, TypeError) as e:
+        response, status = ResponseFormatter.error(f'Invalid query: {str(e)}', 400, 'INVALID_QUERY')
+        return jsonify(response), status
+    except Exception as e:
+        log_error(app, "QueryError", str(e))
+        response, status = ResponseFormatter.error(str(e), 400)
+        return jsonify(response), status
+
 @app.route('/api/statistics', methods=['GET'])
 def statistics():
     """Get dataset statistics (legacy endpoint - calls /api/analytics)"""
     return analytics_data()
 
+# ==================== DASHBOARD ====================
+
+# Section JSON, re-encoded only when the section's ETag moves
+dashboard_sections = SectionCache(dumps=lambda data: app.json.dumps(data, separators=(',', ':')))
+
+def dashboard_history(limit):
+    """First page of the history table, with the cursors to page back or delta-sync"""
+    page = prediction_history.page(limit)
+    return {
+        'total_records': page['total'],
+        'has_more': page['has_more'],
+        'next_cursor': encode_cursor(page['oldest_id']) if page['oldest_id'] else None,
+        'sync_cursor': encode_cursor(page['sync_cursor']),
+        'predictions': page['records']
+    }
+
+def dashboard_sources(history_limit):
+    """Section name -> (ETag function, builder) for /api/dashboard"""
+    return {
+        'analytics': (analytics_etag, lambda: dataset_snapshot.get()[1]),
+        'model_info': (model_info_etag, model_info_payload),
+        'model_stats': (model_stats_etag, model_stats_payload),
+        'health': (health_etag, health_payload),
+        'prediction_status': (prediction_status_etag, prediction_status_payload),
+        'prediction_stats': (prediction_stats_etag, lambda: prediction_stats_payload(prediction_state.stats_snapshot())),
+        'prediction_history': (lambda: make_etag('history', prediction_history.generation, history_limit),
+                               lambda: dashboard_history(history_limit))
+    }
+
+@app.route('/api/dashboard', methods=['GET'])
+def dashboard_data():
+    """
+    Everything the dashboard loads (analytics, model info and serving stats,
+    health, prediction status, stats and history) in one response
+    
+    Every section carries its own ETag. Send the ones already held in
+    If-None-Match and those sections are left out (listed under 'unchanged');
+    ?sections= picks a subset, ?history_limit= sizes the history page.
+    """
+    try:
+        history_limit = max(1, min(request.args.get('history_limit', 10, type=int), 1000))
+        sources = dashboard_sources(history_limit)
+        names = list(sources)
+        if request.args.get('sections'):
+            names = [name.strip() for name in request.args['sections'].split(',') if name.strip()]
+            unknown = [name for name in names if name not in sources]
+            if unknown or not names:
+                response, status = ResponseFormatter.error(
+                    f"Unknown section(s): {', '.join(unknown) or '(none)'}. Available: {', '.join(sources)}",
+                    400, 'INVALID_SECTIONS')
+                return jsonify(response), status
+        
+        etags = {name: sources[name][0]() for name in names}
+        etag = make_etag('dashboard', tuple(etags.items()))
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            # Sections are spliced in as cached JSON text, not re-encoded
+            sections, unchanged = dashboard_sections.compose(
+                {name: sources[name][1] for name in names}, etags, request.if_none_match.contains)
+            response = Response(
+                '{"status":"success","sections":' + sections + ',"unchanged":' + json.dumps(unchanged)
+                + ',"timestamp":' + json.dumps(DateUtils.get_timestamp()) + '}',
+                status=200, mimetype='application/json')
+        
+        response.set_etag(etag)
+        cache_control = app.config.get('CACHE_CONTROL_PREDICTIONS')
+        if cache_control:
+            response.headers['Cache-Control'] = cache_control
+        return response
+    
+    except Exception as e:
+        log_error(app, "DashboardError", str(e))
+        response, status = ResponseFormatter.error(str(e), 400)
+        return jsonify(response), status
+
+@app.route('/api/retrain', methods=['POST'])
+def retrain():
+    """Start a background retraining run (admin function)"""
+    try:
+        started, message = retraining_service.trigger(reason='api')
+        status_code = 202 if started else 409
+        return jsonify({
+            'status': 'started' if started else 'rejected',
+            'message': message,
+            'retraining': retraining_service.get_status(),
+            'timestamp': DateUtils.get_timestamp()
+        }), status_code
+    
+    except Exception as e:
+        log_error(app, "RetrainError", str(e))
+        response, status = ResponseFormatter.error(str(e), 400)
+        return jsonify(response), status
+
+@app.route('/api/retrain-status', methods=['GET'])
+def retrain_status():
+    """Progress and resource usage of the current or last retraining run"""
+    return jsonify({
+        'status': 'success',
+        'retraining': retraining_service.get_status(),
+        'model_version': model_version,
+        'model_trained_at': model_metadata.get('trained_at'),
+        'timestamp': DateUtils.get_timestamp()
+    }), 200
+
 @app.route('/api/clear-history', methods=['POST'])
 def clear_history():
     """Clear prediction history (admin function)"""
     try:
-        global prediction_history, prediction_stats
-        
-        cleared_count = len(prediction_history)
-        prediction_history = {}
-        prediction_stats = StatisticsRecord()
+        with prediction_state.write():
+            cleared_count = prediction_history.clear()
+            if prediction_db is not None and shared_state is None:
+                prediction_db.enqueue_clear()
+            prediction_stats.reset()
+        stats_broadcaster.publish_reset()
         
         app.logger.warning(f"Prediction history cleared - {cleared_count} records removed")
         
@@ -704,4 +1457,3 @@ if __name__ == '__main__':
         port=5000,
         threaded=True
     )
-
@@ -0,0 +1,98 @@
+"""
+Batch Ingest Throughput
+Stores /api/batch-predict sized batches in the history and stats, once a
+record at a time through the single-prediction path and once through the
+column-wise add_batch() path, and checks both end with the same stats
+
+Usage (from the project root):
+    python benchmarks/bench_batch_ingest.py [batch size] [batches]
+"""
+
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from history_store import SortableIdGenerator, create_history_store
+from models import StatisticsRecord
+from prediction_db import COLUMN_NAMES
+from search_index import PredictionSearchIndex
+
+def make_batch(size, rng):
+    """Column arrays for one batch (IDs are filled in when it is stored)"""
+    risk = np.round(np.array([rng.random() * 100 for _ in range(size)]), 2)
+    return {
+        'prediction': (risk >= 50).astype(np.int64),
+        'disease_probability': risk / 100,
+        'healthy_probability': 1 - risk / 100,
+        'risk_percentage': risk,
+        'risk_level': ['Low Risk' if r < 30 else ('Moderate Risk' if r < 60 else 'High Risk') for r in risk.tolist()],
+        'color': ['green'] * size,
+        'age_days': np.full(size, 18250),
+        'age_years': np.array([rng.randrange(30, 80) for _ in range(size)]),
+        'gender': np.ones(size, dtype=np.int64),
+        'height': np.full(size, 170.0),
+        'weight': np.array([rng.randrange(50, 110) + rng.choice((0, 0.5)) for _ in range(size)]),
+        'bp_systolic': np.array([float(rng.randrange(100, 180)) for _ in range(size)]),
+        'bp_diastolic': np.array([float(rng.randrange(60, 110)) for _ in range(size)]),
+        'cholesterol': np.ones(size, dtype=np.int64), 'gluc': np.ones(size, dtype=np.int64),
+        'smoke': np.zeros(size, dtype=np.int64), 'alco': np.zeros(size, dtype=np.int64),
+        'active': np.ones(size, dtype=np.int64),
+        'patient_name': [f'Patient {rng.randrange(10 ** 6)}' for _ in range(size)],
+        'father_name': [None] * size, 'blood_group': ['O+'] * size,
+        'phone_number': [None] * size, 'alt_phone_number': [None] * size,
+        'doctor_name': ['Dr. Batch'] * size,
+        'timestamp': ['2026-01-01T00:00:00'] * size, 'status': ['completed'] * size
+    }
+
+def one_at_a_time(store, stats, ids, batch):
+    names = [name for name in COLUMN_NAMES if name != 'id']
+    values = [column.tolist() if hasattr(column, 'tolist') else column for column in (batch[name] for name in names)]
+    for row in zip(*values):
+        record = dict(zip(names, row), id=ids.next_id())
+        record['has_disease'] = bool(record['prediction'])
+        store.add(record['id'], record)
+        stats.add_prediction(SimpleNamespace(**record))
+
+def bulk(store, stats, ids, batch):
+    batch = dict(batch, id=ids.next_ids(len(batch['prediction'])))
+    store.add_batch(batch)
+    stats.add_batch(batch)
+
+def main():
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    n_batches = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rng = random.Random(7)
+    batches = [make_batch(batch_size, rng) for _ in range(n_batches)]
+    
+    print(f"\n{n_batches} batches of {batch_size}, columnar history\n")
+    print(f"{'path':<16}{'search index':<14}{'ms/batch':>10}{'us/record':>11}{'records/s':>12}")
+    print('-' * 63)
+    finals = {}
+    for label, store_batch, indexed in (('one at a time', one_at_a_time, False), ('add_batch', bulk, False),
+                                        ('one at a time', one_at_a_time, True), ('add_batch', bulk, True)):
+        index = PredictionSearchIndex() if indexed else None
+        store = create_history_store('columnar', max_size=10000, retention_hours=None, index=index)
+        stats = StatisticsRecord()
+        ids = SortableIdGenerator()
+        start = time.perf_counter()
+        for batch in batches:
+            store_batch(store, stats, ids, batch)
+        elapsed = time.perf_counter() - start
+        total = batch_size * n_batches
+        print(f"{label:<16}{'yes' if indexed else 'no':<14}{elapsed / n_batches * 1000:>10.2f}{elapsed / total * 1e6:>11.2f}{total / elapsed:>12.0f}")
+        finals[label, indexed] = (stats.get_summary(), stats.get_metric_summaries(), len(store))
+    
+    same = len({repr(final) for final in finals.values()}) == 1
+    print(f"\n{'PASS' if same else 'FAIL'}  same stats and history size from both paths")
+    return 0 if same else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Response Compression: Bytes Saved vs CPU Cost
+Fetches the large read endpoints uncompressed, then measures how much each
+encoding/level shrinks them and how long compressing one response takes
+
+Usage (from the project root, with trained model artifacts present):
+    python benchmarks/bench_compression.py [history_records]
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import app as cardio_app
+from compression import available_encodings, compress_body
+
+PATIENT = {
+    'age': 50, 'gender': 2, 'height': 170, 'weight': 80, 'ap_hi': 130, 'ap_lo': 85,
+    'cholesterol': 1, 'gluc': 1, 'smoke': 0, 'alco': 0, 'active': 1,
+    'patientName': 'Benchmark Patient', 'doctorName': 'Dr. Bench'
+}
+
+SETTINGS = [('gzip', 1), ('gzip', 6), ('gzip', 9), ('br', 1), ('br', 4), ('br', 11)]
+
+def populate(client, n_records):
+    """Fill the prediction history so history/stats responses are realistic"""
+    for i in range(n_records):
+        patient = dict(PATIENT, weight=60 + i % 50, ap_hi=110 + i % 60, age=30 + i % 40)
+        client.post('/api/predict', json=patient)
+
+def fetch_bodies(client):
+    """Uncompressed body of each endpoint under test"""
+    batch = {'predictions': [dict(PATIENT, weight=60 + i % 40) for i in range(100)]}
+    requests_ = {
+        'prediction-history (1000)': lambda: client.get('/api/prediction-history?limit=1000'),
+        'batch-predict (100)': lambda: client.post('/api/batch-predict', json=batch),
+        'prediction-stats + histograms': lambda: client.get('/api/prediction-stats?histograms=true'),
+        'analytics': lambda: client.get('/api/analytics'),
+        'model-info': lambda: client.get('/api/model-info')
+    }
+    return {name: fetch().get_data() for name, fetch in requests_.items()}
+
+def time_compression(data, encoding, level, repeats):
+    """Median milliseconds to compress `data` once"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        compressed = compress_body(data, encoding, gzip_level=level, brotli_quality=level)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return len(compressed), samples[len(samples) // 2]
+
+def main():
+    n_records = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    client = cardio_app.app.test_client()
+    populate(client, n_records)
+    bodies = fetch_bodies(client)
+    
+    encodings = set(available_encodings('br,gzip'))
+    settings = [(enc, level) for enc, level in SETTINGS if enc in encodings]
+    if 'br' not in encodings:
+        print("brotli not installed: only gzip is measured (pip install brotli)")
+    
+    print(f"\n{'endpoint':<32}{'raw KB':>9}  {'encoding':<9}{'KB':>8}{'saved':>8}{'ms':>8}{'MB/s':>8}")
+    print('-' * 84)
+    for name, data in bodies.items():
+        repeats = 50 if len(data) < 100_000 else 10
+        for i, (encoding, level) in enumerate(settings):
+            size, ms = time_compression(data, encoding, level, repeats)
+            saved = (1 - size / len(data)) * 100 if data else 0
+            throughput = len(data) / 1e6 / (ms / 1000) if ms else float('inf')
+            label = name if i == 0 else ''
+            raw = f"{len(data) / 1024:.1f}" if i == 0 else ''
+            print(f"{label:<32}{raw:>9}  {encoding + '-' + str(level):<9}{size / 1024:>8.1f}{saved:>7.1f}%{ms:>8.3f}{throughput:>8.1f}")
+        print()
+    
+    min_size = cardio_app.app.config.get('COMPRESSION_MIN_SIZE', 1024)
+    print(f"Responses under {min_size} bytes are sent uncompressed (COMPRESSION_MIN_SIZE)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Dashboard Load: Separate Calls vs /api/dashboard
+Times one dashboard page view through the Flask test client, as separate
+calls to the seven endpoints it covers, as one composite request,
+and as a composite refresh that sends the section ETags it already holds
+(with and without a prediction in between)
+
+Usage (from the project root, with trained model artifacts present):
+    python benchmarks/bench_dashboard.py [history_records] [views]
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import app as cardio_app
+
+PATIENT = {
+    'age': 50, 'gender': 2, 'height': 170, 'weight': 80, 'ap_hi': 130, 'ap_lo': 85,
+    'cholesterol': 1, 'gluc': 1, 'smoke': 0, 'alco': 0, 'active': 1,
+    'patientName': 'Benchmark Patient', 'doctorName': 'Dr. Bench'
+}
+
+SEPARATE = ['/api/analytics', '/api/model-info', '/api/model-stats', '/api/health', '/api/prediction-status',
+            '/api/prediction-history?limit=10', '/api/prediction-stats']
+
+def populate(client, n_records):
+    for i in range(n_records):
+        client.post('/api/predict', json=dict(PATIENT, weight=60 + i % 50, ap_hi=110 + i % 60, age=30 + i % 40))
+
+def view(client, urls, headers=None):
+    """(requests, bytes) of one page view"""
+    size = 0
+    for url in urls:
+        size += len(client.get(url, headers=headers or {}).get_data())
+    return len(urls), size
+
+def measure(label, views, run, between=None):
+    elapsed = 0.0
+    for _ in range(views):
+        if between is not None:
+            between()
+        start = time.perf_counter()
+        requests_, size = run()
+        elapsed += time.perf_counter() - start
+    print(f"{label:<34}{requests_:>10}{size / 1024:>10.1f}{elapsed / views * 1000:>12.2f}")
+
+def main():
+    n_records = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    views = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    client = cardio_app.app.test_client()
+    populate(client, n_records)
+    
+    first = client.get('/api/dashboard').get_json()
+    known = {'If-None-Match': ', '.join(f'"{section["etag"]}"' for section in first['sections'].values())}
+    predict = lambda: client.post('/api/predict', json=PATIENT)
+    
+    print(f"\n{n_records} predictions in the history, {views} page views each\n")
+    print(f"{'page view':<34}{'requests':>10}{'KB':>10}{'ms/view':>12}")
+    print('-' * 66)
+    measure('separate endpoints', views, lambda: view(client, SEPARATE))
+    measure('/api/dashboard', views, lambda: view(client, ['/api/dashboard']))
+    measure('/api/dashboard, ETags held', views, lambda: view(client, ['/api/dashboard'], known))
+    measure('separate, after a prediction', views, lambda: view(client, SEPARATE), predict)
+    measure('/api/dashboard, after a prediction', views, lambda: view(client, ['/api/dashboard'], known), predict)
+    print(f"\nsection cache: {cardio_app.dashboard_sections.get_stats()}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
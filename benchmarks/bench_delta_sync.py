@@ -0,0 +1,99 @@
+"""
+Delta Sync vs Full Reload
+A dashboard keeps a copy of the whole history; after each batch of new
+predictions (which evict as many old ones) it refreshes either by reloading
+every page or by asking for the changes since its sync cursor. Reports bytes
+and server time per refresh and checks the delta copy matches the server
+
+Usage (from the project root):
+    python benchmarks/bench_delta_sync.py [history size] [new per refresh] [refreshes]
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from history_store import SortableIdGenerator, create_history_store
+from bench_list_payloads import make_record
+
+PAGE_SIZE = 1000
+
+def serialize(payload):
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+def full_reload(store):
+    """Every page, newest first; returns (records by ID, sync cursor, bytes)"""
+    page = store.page(PAGE_SIZE)
+    cursor, size, records = page['sync_cursor'], 0, {}
+    while True:
+        size += len(serialize(page['records']))
+        records.update((record['id'], record) for record in page['records'])
+        if not page['has_more']:
+            return records, cursor, size
+        page = store.page(PAGE_SIZE, before=page['oldest_id'])
+
+def delta_sync(store, records, cursor):
+    """Apply the changes since `cursor` to `records`; returns (cursor, bytes)"""
+    size = 0
+    while True:
+        delta = store.changes(cursor, PAGE_SIZE)
+        if delta['reset']:
+            fresh, cursor, reload_size = full_reload(store)
+            records.clear()
+            records.update(fresh)
+            return cursor, size + reload_size
+        size += len(serialize({'predictions': delta['records'], 'removed': delta['removed']}))
+        for prediction_id in delta['removed']:
+            records.pop(prediction_id, None)
+        records.update((record['id'], record) for record in delta['records'])
+        cursor = delta['cursor']
+        if not delta['has_more']:
+            return cursor, size
+
+def main():
+    history_size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    per_refresh = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    refreshes = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    rng = random.Random(7)
+    ids = SortableIdGenerator()
+    
+    print(f"\n{history_size}-record history, {per_refresh} new predictions per refresh, {refreshes} refreshes\n")
+    print(f"{'backend':<10}{'mode':<14}{'KB/refresh':>12}{'ms/refresh':>12}")
+    print('-' * 48)
+    passed = True
+    for backend in ('columnar', 'dict'):
+        store = create_history_store(backend, max_size=history_size, retention_hours=None)
+        for _ in range(history_size):
+            record = make_record(ids.next_id(), rng)
+            store.add(record['id'], record)
+        local, cursor, _ = full_reload(store)
+        
+        totals = {'full reload': [0, 0.0], 'delta': [0, 0.0]}
+        for _ in range(refreshes):
+            for _ in range(per_refresh):
+                record = make_record(ids.next_id(), rng)
+                store.add(record['id'], record)
+            start = time.perf_counter()
+            _, _, size = full_reload(store)
+            totals['full reload'][0] += size
+            totals['full reload'][1] += time.perf_counter() - start
+            start = time.perf_counter()
+            cursor, size = delta_sync(store, local, cursor)
+            totals['delta'][0] += size
+            totals['delta'][1] += time.perf_counter() - start
+        
+        for mode, (size, seconds) in totals.items():
+            print(f"{backend:<10}{mode:<14}{size / refreshes / 1024:>12.1f}{seconds / refreshes * 1000:>12.2f}")
+        same = local == full_reload(store)[0]
+        passed &= same
+        print(f"{'':<10}{'PASS' if same else 'FAIL'}  delta copy matches the server ({len(local)} records)")
+    return 0 if passed else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
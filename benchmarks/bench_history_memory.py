@@ -0,0 +1,88 @@
+"""
+Prediction History Memory per Record
+Compares the dict-of-dicts history backend with the columnar one: retained
+bytes per record (tracemalloc) and the cost of serving one history page
+
+Usage (from the project root):
+    python benchmarks/bench_history_memory.py [records]
+"""
+
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from history_store import SortableIdGenerator, create_history_store
+from models import PredictionRecord
+
+DOCTORS = [f'Dr. {name}' for name in ('Sharma', 'Patel', 'Iyer', 'Khan', 'Das', 'Rao', 'Singh', 'Gupta')]
+BLOOD_GROUPS = ['O+', 'O-', 'A+', 'A-', 'B+', 'B-', 'AB+', 'AB-']
+
+def make_record(prediction_id, rng, with_patient):
+    """One history record as the API stores it (fresh strings, like parsed JSON)"""
+    probability = rng.random()
+    percentage = round(probability * 100, 2)
+    level = 'Low Risk' if percentage < 30 else ('Moderate Risk' if percentage < 60 else 'High Risk')
+    extra = {}
+    if with_patient:
+        extra = {
+            'patient_name': f'Patient {rng.randrange(10 ** 6)}',
+            'father_name': f'Father {rng.randrange(10 ** 6)}',
+            'blood_group': ''.join(rng.choice(BLOOD_GROUPS)),
+            'phone_number': f'98{rng.randrange(10 ** 8):08d}',
+            'doctor_name': ''.join(rng.choice(DOCTORS))
+        }
+    return PredictionRecord(
+        prediction_id, int(probability >= 0.5), [1 - probability, probability], percentage, level,
+        {'Low Risk': 'green', 'Moderate Risk': 'orange', 'High Risk': 'red'}[level],
+        rng.randrange(30, 65) * 365, rng.randrange(30, 65), rng.choice([1, 2]),
+        rng.randrange(150, 195), rng.randrange(50, 110), rng.randrange(100, 180), rng.randrange(60, 100),
+        rng.choice([1, 2, 3]), rng.choice([1, 2, 3]), rng.choice([0, 1]), rng.choice([0, 1]), rng.choice([0, 1]),
+        **extra
+    ).to_dict()
+
+def measure(backend, n_records, with_patient):
+    """Retained bytes per record and page-serving time for one backend"""
+    rng = random.Random(42)
+    ids = SortableIdGenerator()
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    
+    store = create_history_store(backend, max_size=n_records, retention_hours=None)
+    for _ in range(n_records):
+        prediction_id = ids.next_id()
+        store.add(prediction_id, make_record(prediction_id, rng, with_patient))
+    
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    
+    start = time.perf_counter()
+    for _ in range(200):
+        json.dumps(store.page(100)['records'])
+    page_ms = (time.perf_counter() - start) / 200 * 1000
+    return retained / n_records, page_ms
+
+def main():
+    n_records = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    print(f"\n{n_records} records per store\n")
+    print(f"{'scenario':<28}{'backend':<10}{'bytes/record':>14}{'page(100) ms':>14}{'reduction':>11}")
+    print('-' * 77)
+    for label, with_patient in (('clinical fields only', False), ('with patient details', True)):
+        dict_bytes, dict_ms = measure('dict', n_records, with_patient)
+        col_bytes, col_ms = measure('columnar', n_records, with_patient)
+        print(f"{label:<28}{'dict':<10}{dict_bytes:>14.0f}{dict_ms:>14.3f}")
+        print(f"{'':<28}{'columnar':<10}{col_bytes:>14.0f}{col_ms:>14.3f}{dict_bytes / col_bytes:>10.1f}x")
+    print("\nPatient names and phone numbers are unique per record and stay as Python strings;")
+    print("doctor names, blood groups and risk labels are interned.")
+
+if __name__ == '__main__':
+    main()
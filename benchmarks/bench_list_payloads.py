@@ -0,0 +1,76 @@
+"""
+List Response Payloads
+Builds and serializes one /api/prediction-history sized page as full record
+dicts, projected to the columns a history table shows, and in the columnar
+format, and reports payload size (raw and gzipped) and time per page
+
+Usage (from the project root):
+    python benchmarks/bench_list_payloads.py [page size] [repeats]
+"""
+
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from history_store import SortableIdGenerator, create_history_store
+
+TABLE_FIELDS = ['id', 'timestamp', 'age_years', 'gender', 'risk_percentage', 'risk_level', 'color', 'status']
+LAST_NAMES = ['Sharma', 'Patel', 'Iyer', 'Khan', 'Das', 'Rao', 'Singh', 'Gupta', 'Kumar', 'Reddy']
+
+def make_record(prediction_id, rng):
+    percentage = round(rng.random() * 100, 2)
+    return {
+        'id': prediction_id, 'prediction': int(percentage >= 50), 'has_disease': percentage >= 50,
+        'disease_probability': percentage / 100, 'healthy_probability': 1 - percentage / 100,
+        'risk_percentage': percentage,
+        'risk_level': 'Low Risk' if percentage < 30 else ('Moderate Risk' if percentage < 60 else 'High Risk'),
+        'color': 'green', 'age_days': 18250, 'age_years': rng.randrange(30, 80), 'gender': rng.choice((1, 2)),
+        'height': rng.randrange(150, 195), 'weight': rng.randrange(50, 110) + rng.choice((0, 0, 0, 0.5)),
+        'bp_systolic': rng.randrange(100, 180), 'bp_diastolic': rng.randrange(60, 110),
+        'cholesterol': 1, 'gluc': 1, 'smoke': 0, 'alco': 0, 'active': 1,
+        'patient_name': f'Patient {rng.randrange(10 ** 6)}', 'father_name': f'{rng.choice(LAST_NAMES)} Senior',
+        'blood_group': 'O+', 'phone_number': f'+91 {rng.randrange(10 ** 9, 10 ** 10)}', 'alt_phone_number': None,
+        'doctor_name': f'Dr. {rng.choice(LAST_NAMES)}', 'timestamp': '2026-01-01T00:00:00', 'status': 'completed'
+    }
+
+def main():
+    page_size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rng = random.Random(7)
+    ids = SortableIdGenerator()
+    records = [make_record(ids.next_id(), rng) for _ in range(page_size * 2)]
+    
+    shapes = (
+        ('full rows', None, False),
+        ('table fields', TABLE_FIELDS, False),
+        ('columnar', None, True),
+        ('columnar+table', TABLE_FIELDS, True)
+    )
+    for backend in ('columnar', 'dict'):
+        store = create_history_store(backend, max_size=len(records), retention_hours=None)
+        for record in records:
+            store.add(record['id'], record)
+        
+        print(f"\n{backend} history, {page_size}-record page, {repeats} repeats\n")
+        print(f"{'shape':<16}{'bytes':>10}{'gzipped':>10}{'ms/page':>10}{'vs full':>10}")
+        print('-' * 56)
+        baseline = None
+        for label, fields, columnar in shapes:
+            start = time.perf_counter()
+            for _ in range(repeats):
+                body = json.dumps(store.page(page_size, fields=fields, columnar=columnar)['records'],
+                                  separators=(',', ':')).encode()
+            ms = (time.perf_counter() - start) / repeats * 1000
+            baseline = baseline or ms
+            print(f"{label:<16}{len(body):>10}{len(gzip.compress(body)):>10}{ms:>10.2f}{baseline / ms:>9.1f}x")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+Serving Latency During Retraining
+Measures /api/predict p50/p99 while idle and while a background retraining
+run is in progress, to check that the retraining process leaves serving alone
+
+Usage (from the project root, with trained model artifacts present):
+    python benchmarks/bench_predict_during_retrain.py [requests_per_phase]
+"""
+
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import app as cardio_app
+
+PATIENT = {
+    'age': 50, 'gender': 2, 'height': 170, 'weight': 80, 'ap_hi': 130, 'ap_lo': 85,
+    'cholesterol': 1, 'gluc': 1, 'smoke': 0, 'alco': 0, 'active': 1
+}
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def measure(client, n_requests, stop_when_idle=False):
+    """Time n_requests predictions (or until retraining finishes)"""
+    latencies = []
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        client.post('/api/predict', json=PATIENT)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if stop_when_idle and cardio_app.retraining_service.state != 'running':
+            break
+    return latencies
+
+def report(label, latencies):
+    print(f"{label:<22} n={len(latencies):<6} p50={percentile(latencies, 50):7.2f}ms "
+          f"p99={percentile(latencies, 99):7.2f}ms max={max(latencies):7.2f}ms")
+
+if __name__ == '__main__':
+    n_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    client = cardio_app.app.test_client()
+    
+    report('idle', measure(client, n_requests))
+    
+    started, message = cardio_app.retraining_service.trigger(reason='benchmark')
+    if not started:
+        sys.exit(f"Could not start retraining: {message}")
+    time.sleep(1)  # let the pipeline get past start-up
+    report('during retraining', measure(client, n_requests, stop_when_idle=True))
+    
+    while cardio_app.retraining_service.state == 'running':
+        time.sleep(1)
+    status = cardio_app.retraining_service.get_status()
+    print(f"\nRetraining {status['state']} - cpu {status['resource_usage'].get('cpu_seconds')}s, "
+          f"peak rss {status['resource_usage'].get('peak_rss_mb')}MB, budget {status['core_budget']} core(s)")
@@ -0,0 +1,46 @@
+"""
+Preprocessing Memory Benchmark
+Compares peak memory of the standard and memory-lean DataPreprocessor modes
+
+Usage (from the project root):
+    python benchmarks/bench_preprocessing_memory.py
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from complete_ml_pipeline import Config, DataPreprocessor
+
+def run(lean):
+    """Run phase 1 once and return (raw_bytes, peak_bytes, processed_bytes, seconds)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    
+    preprocessor = DataPreprocessor(Config.DATA_FILE, lean=lean)
+    (preprocessor
+     .load_data()
+     .check_missing_values()
+     .remove_duplicates()
+     .detect_and_remove_outliers()
+     .feature_scaling()
+    )
+    df_processed = preprocessor.get_processed_data()
+    
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    processed = int(df_processed.memory_usage(index=True).sum())
+    return preprocessor.raw_bytes, peak, processed, elapsed
+
+if __name__ == '__main__':
+    print(f"\n{'Mode':<10} {'Raw MB':>8} {'Peak MB':>9} {'Peak/Raw':>9} {'Output MB':>10} {'Time s':>7}")
+    print("-" * 58)
+    for label, lean in (('standard', False), ('lean', True)):
+        raw, peak, processed, elapsed = run(lean)
+        print(f"{label:<10} {raw / 1e6:>8.2f} {peak / 1e6:>9.2f} {peak / raw:>8.1f}x "
+              f"{processed / 1e6:>10.2f} {elapsed:>7.2f}")
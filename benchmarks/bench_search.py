@@ -0,0 +1,81 @@
+"""
+Prediction Search Latency and Index Memory
+Fills a columnar history with an index attached, then times typical
+/api/prediction-search queries and reports what the index costs per record
+
+Usage (from the project root):
+    python benchmarks/bench_search.py [records]
+"""
+
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from history_store import SortableIdGenerator, create_history_store
+from search_index import PredictionSearchIndex, parse_criteria
+
+FIRST_NAMES = ['Ravi', 'Anita', 'Suresh', 'Priya', 'Amit', 'Kavya', 'Rahul', 'Sneha', 'Arjun', 'Meera']
+LAST_NAMES = ['Sharma', 'Patel', 'Iyer', 'Khan', 'Das', 'Rao', 'Singh', 'Gupta', 'Kumar', 'Reddy']
+BLOOD_GROUPS = ['O+', 'O-', 'A+', 'A-', 'B+', 'B-', 'AB+', 'AB-']
+
+QUERIES = [
+    {'patient': 'sharma'},
+    {'patient': 'ravi kumar 12'},
+    {'patient': 'ra'},
+    {'risk_level': 'high'},
+    {'doctor': 'patel', 'risk_level': 'high', 'blood_group': 'O+'},
+    {'phone': '9123456789'}
+]
+
+def make_record(prediction_id, rng):
+    percentage = round(rng.random() * 100, 2)
+    return {
+        'id': prediction_id, 'prediction': int(percentage >= 50),
+        'disease_probability': percentage / 100, 'healthy_probability': 1 - percentage / 100,
+        'risk_percentage': percentage,
+        'risk_level': 'Low Risk' if percentage < 30 else ('Moderate Risk' if percentage < 60 else 'High Risk'),
+        'color': 'green', 'age_days': 18250, 'age_years': 50, 'gender': 1, 'height': 170, 'weight': 70,
+        'bp_systolic': 120, 'bp_diastolic': 80, 'cholesterol': 1, 'gluc': 1, 'smoke': 0, 'alco': 0, 'active': 1,
+        'patient_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.randrange(1000)}',
+        'father_name': None, 'blood_group': rng.choice(BLOOD_GROUPS),
+        'phone_number': f'+91 {rng.randrange(10 ** 9, 10 ** 10)}', 'alt_phone_number': None,
+        'doctor_name': f'Dr. {rng.choice(LAST_NAMES)}', 'timestamp': '2026-01-01T00:00:00', 'status': 'completed'
+    }
+
+def main():
+    n_records = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    rng = random.Random(7)
+    ids = SortableIdGenerator()
+    records = [make_record(ids.next_id(), rng) for _ in range(n_records)]
+    
+    timings = {}
+    for label, index in (('no index', None), ('with index', PredictionSearchIndex())):
+        store = create_history_store('columnar', max_size=n_records, retention_hours=None, index=index)
+        start = time.perf_counter()
+        for record in records:
+            store.add(record['id'], record)
+        timings[label] = (time.perf_counter() - start) / n_records * 1e6
+    print(f"\n{n_records} records: insert {timings['no index']:.1f} us without index, "
+          f"{timings['with index']:.1f} us with index")
+    
+    stats = store.get_stats()['search_index']
+    print(f"index: {stats['terms']} terms, {stats['posting_entries']} posting entries, "
+          f"{stats['memory_bytes'] / 2 ** 20:.1f} MB ({stats['bytes_per_record']} bytes/record)\n")
+    
+    print(f"{'query':<62}{'matches':>9}{'ms':>9}")
+    print('-' * 80)
+    for query in QUERIES:
+        criteria = parse_criteria(query)
+        start = time.perf_counter()
+        for _ in range(20):
+            result = store.search(criteria, 50)
+        elapsed_ms = (time.perf_counter() - start) / 20 * 1000
+        print(f"{str(query):<62}{result['total']:>9}{elapsed_ms:>9.2f}")
+
+if __name__ == '__main__':
+    main()
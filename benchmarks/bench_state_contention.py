@@ -0,0 +1,157 @@
+"""
+Prediction State Contention
+Writer threads store predictions while reader threads serve stats and
+history pages, the way /api/predict and the dashboard endpoints overlap
+under threaded=True. Compares the old unsynchronized access, readers that
+take the writer lock, and PredictionState snapshot reads; counts torn reads
+(counters that do not add up) and failed inserts
+
+Usage (from the project root):
+    python benchmarks/bench_state_contention.py [writers] [readers] [seconds] [inference ms] [reader pause ms]
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from cache import GenerationCounter
+from history_store import SortableIdGenerator, create_history_store
+from models import StatisticsRecord
+from prediction_state import PredictionState
+
+def make_record(prediction_id, rng):
+    percentage = round(rng.random() * 100, 2)
+    return {
+        'id': prediction_id, 'prediction': int(percentage >= 50), 'has_disease': percentage >= 50,
+        'disease_probability': percentage / 100, 'healthy_probability': 1 - percentage / 100,
+        'risk_percentage': percentage,
+        'risk_level': 'Low Risk' if percentage < 30 else ('Moderate Risk' if percentage < 60 else 'High Risk'),
+        'color': 'green', 'age_days': 18250, 'age_years': rng.randrange(30, 80), 'gender': 1, 'height': 170,
+        'weight': rng.randrange(50, 110), 'bp_systolic': rng.randrange(100, 180), 'bp_diastolic': rng.randrange(60, 110),
+        'cholesterol': 1, 'gluc': 1, 'smoke': 0, 'alco': 0, 'active': 1, 'patient_name': 'Stress Test',
+        'father_name': None, 'blood_group': 'O+', 'phone_number': None, 'alt_phone_number': None,
+        'doctor_name': 'Dr. Load', 'timestamp': '2026-01-01T00:00:00', 'status': 'completed'
+    }
+
+def consistent(stats):
+    """Do the counters of one stats view add up?"""
+    summary = stats.get_summary()
+    total = summary['total_predictions']
+    risk = summary['risk_distribution']
+    metric = stats.metrics['risk_percentage']
+    return (risk['low_risk'] + risk['moderate_risk'] + risk['high_risk'] == total
+            and summary['disease_rate']['with_disease'] + summary['disease_rate']['without_disease'] == total
+            and metric.count == total and sum(metric.bins) == total)
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] * 1e6 if values else 0.0
+
+def run(mode, n_writers, n_readers, seconds, inference_ms, pause_ms):
+    state = PredictionState(create_history_store('columnar', max_size=10000, retention_hours=None),
+                            StatisticsRecord(), GenerationCounter())
+    ids = SortableIdGenerator()
+    stop = threading.Event()
+    results = {'writes': 0, 'reads': 0, 'torn': 0, 'errors': 0, 'read_times': [], 'write_times': []}
+    results_lock = threading.Lock()
+    
+    def store(rng):
+        if mode == 'unsynchronized':
+            record = make_record(ids.next_id(), rng)
+            state.history.add(record['id'], record)
+            state.stats.add_prediction(SimpleNamespace(**record))
+            state.generation.bump()
+        else:
+            with state.write():
+                record = make_record(ids.next_id(), rng)
+                state.history.add(record['id'], record)
+                state.stats.add_prediction(SimpleNamespace(**record))
+    
+    def read_stats():
+        if mode == 'unsynchronized':
+            return state.stats
+        if mode == 'locked reads':
+            with state._write_lock:
+                return state.stats.copy()
+        return state.stats_snapshot()
+    
+    def writer(seed):
+        rng = random.Random(seed)
+        writes = errors = 0
+        times = []
+        while not stop.is_set():
+            time.sleep(inference_ms / 1000)  # model call, GIL released
+            start = time.perf_counter()
+            try:
+                store(rng)
+                writes += 1
+            except ValueError:
+                errors += 1  # out-of-order ID rejected by the history
+            times.append(time.perf_counter() - start)
+        with results_lock:
+            results['writes'] += writes
+            results['errors'] += errors
+            results['write_times'] += times
+    
+    def reader():
+        reads = torn = 0
+        times = []
+        while not stop.is_set():
+            time.sleep(pause_ms / 1000)  # request parsing, network
+            start = time.perf_counter()
+            stats = read_stats()
+            ok = consistent(stats)
+            stats.get_metric_summaries()
+            state.history.page(20)
+            times.append(time.perf_counter() - start)
+            reads += 1
+            torn += not ok
+        with results_lock:
+            results['reads'] += reads
+            results['torn'] += torn
+            results['read_times'] += times
+    
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(n_writers)]
+    threads += [threading.Thread(target=reader) for _ in range(n_readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    
+    final_ok = consistent(state.stats) and state.stats.total_predictions == results['writes']
+    print(f"{mode:<16}{results['writes'] / seconds:>10.0f}{results['reads'] / seconds:>10.0f}"
+          f"{percentile(results['write_times'], 0.99):>11.0f}{percentile(results['read_times'], 0.5):>10.0f}"
+          f"{percentile(results['read_times'], 0.99):>10.0f}{results['torn']:>8}{results['errors']:>8}"
+          f"{'yes' if final_ok else 'NO':>8}")
+    return results['torn'] == 0 and results['errors'] == 0 and final_ok
+
+def main():
+    n_writers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    n_readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 3.0
+    inference_ms = float(sys.argv[4]) if len(sys.argv) > 4 else 1.0
+    pause_ms = float(sys.argv[5]) if len(sys.argv) > 5 else 1.0
+    # Switch threads far more often than the default 5 ms, so races show up quickly
+    sys.setswitchinterval(1e-5)
+    
+    print(f"\n{n_writers} writers ({inference_ms:g} ms inference each), {n_readers} readers "
+          f"({pause_ms:g} ms between reads), {seconds:g}s per mode\n")
+    print(f"{'mode':<16}{'writes/s':>10}{'reads/s':>10}{'w p99 us':>11}{'r p50 us':>10}"
+          f"{'r p99 us':>10}{'torn':>8}{'errors':>8}{'final':>8}")
+    print('-' * 91)
+    passed = {mode: run(mode, n_writers, n_readers, seconds, inference_ms, pause_ms)
+              for mode in ('unsynchronized', 'locked reads', 'PredictionState')}
+    print('\nPredictionState: ' + ('no torn reads, no failed inserts' if passed['PredictionState'] else 'FAILED'))
+    return 0 if passed['PredictionState'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
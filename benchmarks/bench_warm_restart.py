@@ -0,0 +1,94 @@
+"""
+Warm Restart Time
+Fills a prediction database, then compares what startup costs when it
+replays the whole log (cold) against loading the snapshot and replaying only
+the tail written after it (warm), and checks both end in the same state
+
+Usage (from the project root):
+    python benchmarks/bench_warm_restart.py [records] [history size] [tail]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from history_store import SortableIdGenerator, create_history_store
+from prediction_db import COLUMN_NAMES, INSERT_SQL, PredictionDatabase
+from snapshots import PredictionSnapshot, catch_up
+
+LAST_NAMES = ['Sharma', 'Patel', 'Iyer', 'Khan', 'Das', 'Rao', 'Singh', 'Gupta', 'Kumar', 'Reddy']
+BLOOD_GROUPS = ['O+', 'O-', 'A+', 'A-', 'B+', 'B-', 'AB+', 'AB-']
+
+def make_row(prediction_id, rng):
+    percentage = round(rng.random() * 100, 2)
+    record = {
+        'id': prediction_id, 'prediction': int(percentage >= 50),
+        'disease_probability': percentage / 100, 'healthy_probability': 1 - percentage / 100,
+        'risk_percentage': percentage,
+        'risk_level': 'Low Risk' if percentage < 30 else ('Moderate Risk' if percentage < 60 else 'High Risk'),
+        'color': 'green', 'age_days': 18250, 'age_years': rng.randrange(30, 80), 'gender': 1,
+        'height': 170, 'weight': rng.randrange(50, 110) + rng.choice((0, 0, 0, 0.5)),
+        'bp_systolic': rng.randrange(100, 180), 'bp_diastolic': rng.randrange(60, 110),
+        'cholesterol': 1, 'gluc': 1, 'smoke': 0, 'alco': 0, 'active': 1,
+        'patient_name': f'Patient {rng.randrange(10 ** 6)}', 'father_name': None,
+        'blood_group': rng.choice(BLOOD_GROUPS), 'phone_number': f'+91 {rng.randrange(10 ** 9, 10 ** 10)}',
+        'alt_phone_number': None, 'doctor_name': f'Dr. {rng.choice(LAST_NAMES)}',
+        'timestamp': '2026-01-01T00:00:00', 'status': 'completed'
+    }
+    return tuple(record[name] for name in COLUMN_NAMES)
+
+def fill(database, n_rows, rng, ids):
+    with database._connect() as connection:
+        for start in range(0, n_rows, 50000):
+            connection.executemany(INSERT_SQL, [make_row(ids.next_id(), rng) for _ in range(min(50000, n_rows - start))])
+
+def restart(database, snapshot_path, history_size):
+    """Startup as restore_from_db does it; returns (seconds, replayed, stats, history store)"""
+    start = time.perf_counter()
+    snapshot = PredictionSnapshot.load(snapshot_path, history_size) if snapshot_path else None
+    snapshot, replayed = catch_up(snapshot or PredictionSnapshot(history_size), database)
+    store = create_history_store('columnar', max_size=history_size, retention_hours=None)
+    store.add_batch(snapshot.records())
+    return time.perf_counter() - start, replayed, snapshot, store
+
+def main():
+    n_records = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    history_size = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    n_tail = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+    rng = random.Random(7)
+    ids = SortableIdGenerator()
+    workdir = tempfile.mkdtemp(prefix='cardio-restart-')
+    try:
+        database = PredictionDatabase(os.path.join(workdir, 'predictions.db'))
+        snapshot_path = os.path.join(workdir, 'predictions.db-snapshot')
+        fill(database, n_records, rng, ids)
+        
+        start = time.perf_counter()
+        snapshot, _ = catch_up(PredictionSnapshot(history_size), database)
+        snapshot.save(snapshot_path)
+        print(f"\n{n_records} records, history of {history_size}: first snapshot built in "
+              f"{time.perf_counter() - start:.2f}s, {os.path.getsize(snapshot_path) / 2 ** 20:.1f} MB")
+        
+        fill(database, n_tail, rng, ids)
+        cold_seconds, cold_replayed, cold, cold_store = restart(database, None, history_size)
+        warm_seconds, warm_replayed, warm, warm_store = restart(database, snapshot_path, history_size)
+        print(f"cold start (replay everything):  {cold_seconds:7.2f}s, {cold_replayed} rows replayed")
+        print(f"warm start (snapshot + tail):    {warm_seconds:7.2f}s, {warm_replayed} rows replayed")
+        
+        same_stats = cold.stats.to_state() == warm.stats.to_state()
+        same_history = cold_store.page(history_size) == warm_store.page(history_size)
+        print(f"\n{'PASS' if same_stats else 'FAIL'}  stats identical ({warm.stats.total_predictions} predictions)")
+        print(f"{'PASS' if same_history else 'FAIL'}  history identical ({len(warm_store)} records)")
+        return 0 if same_stats and same_history else 1
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    sys.exit(main())
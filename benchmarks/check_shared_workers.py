@@ -0,0 +1,111 @@
+"""
+Multi-Worker Consistency Check
+Starts gunicorn with several workers in shared-state mode, sends predictions
+from concurrent clients, then checks that every worker reports the same
+stats, history and ETags, including right after /api/clear-history
+
+Usage (from the project root, with trained model artifacts and gunicorn installed):
+    python benchmarks/check_shared_workers.py [workers] [predictions]
+"""
+
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+
+PATIENT = {
+    'age': 50, 'gender': 2, 'height': 170, 'weight': 80, 'ap_hi': 130, 'ap_lo': 85,
+    'cholesterol': 1, 'gluc': 1, 'smoke': 0, 'alco': 0, 'active': 1,
+    'patientName': 'Shared Check', 'doctorName': 'Dr. Workers'
+}
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def call(base, path, payload=None, method=None):
+    """One request on a fresh connection, so the kernel may hand it to any worker"""
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(base + path, data=data, method=method or ('POST' if data else 'GET'),
+                                     headers={'Content-Type': 'application/json', 'Connection': 'close'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.headers.get('ETag'), json.loads(response.read())
+
+def start_server(workers, port, workdir):
+    env = dict(os.environ, SHARED_STATE='true', DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'shared.db')}")
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}', 'app:app'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base = f'http://127.0.0.1:{port}'
+    for _ in range(600):
+        try:
+            call(base, '/api/health')
+            return server, base
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    sys.exit('gunicorn did not come up')
+
+def observe(base, samples):
+    """(total_predictions, history total, ETags) as seen by `samples` requests"""
+    views = set()
+    for _ in range(samples):
+        stats_etag, stats = call(base, '/api/prediction-stats')
+        history_etag, history = call(base, '/api/prediction-history?limit=5')
+        views.add((stats['total_predictions'], history['total_records'], stats_etag, history_etag))
+    return views
+
+def check(label, views, expected_total):
+    totals = {(stats, history) for stats, history, _, _ in views}
+    etags = {(stats_etag, history_etag) for _, _, stats_etag, history_etag in views}
+    ok = totals == {(expected_total, expected_total)} and len(etags) == 1
+    print(f"{'PASS' if ok else 'FAIL'}  {label:<28} totals seen={sorted(totals)} distinct etags={len(etags)}")
+    return ok
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    n_predictions = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    workdir = tempfile.mkdtemp(prefix='cardio-shared-')
+    server, base = start_server(workers, free_port(), workdir)
+    try:
+        call(base, '/api/clear-history', method='POST')
+        
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers * 4) as pool:
+            results = list(pool.map(lambda i: call(base, '/api/predict', dict(PATIENT, weight=60 + i % 50))[1],
+                                    range(n_predictions)))
+        elapsed = time.perf_counter() - start
+        ids = {result['prediction_id'] for result in results}
+        print(f"\n{workers} workers, {n_predictions} predictions in {elapsed:.2f}s "
+              f"({n_predictions / elapsed:.0f}/s), {len(ids)} distinct IDs\n")
+        
+        passed = len(ids) == n_predictions
+        passed &= check('after concurrent predicts', observe(base, workers * 5), n_predictions)
+        
+        # Every ID must be readable from whichever worker answers
+        missing = sum(call(base, f'/api/prediction/{pid}')[1].get('status') != 'success' for pid in list(ids)[:50])
+        print(f"{'PASS' if not missing else 'FAIL'}  {'get by id from any worker':<28} missing={missing}")
+        passed &= not missing
+        
+        call(base, '/api/clear-history', method='POST')
+        passed &= check('after clear-history', observe(base, workers * 5), 0)
+        print('\nall checks passed' if passed else '\nSOME CHECKS FAILED')
+        return 0 if passed else 1
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,9 +4,14 @@ Improves performance by caching prediction results and statistics
 """
 
 from datetime import datetime, timedelta
+from functools import wraps
 import hashlib
 import json
 import logging
+import threading
+import uuid
+
+from flask import Response, current_app, make_response, request
 
 # ==================== CACHE MANAGER ====================
 
@@ -272,6 +277,120 @@ class CacheManager:
         # Clear history caches
         history_cache.invalidate_history()
 
+# ==================== HTTP VALIDATORS ====================
+
+# Counters restart with the process, so ETags also carry a per-process id
+BOOT_ID = uuid.uuid4().hex[:8]
+
+def set_boot_id(boot_id):
+    """Share one ETag namespace between worker processes serving the same state"""
+    global BOOT_ID
+    BOOT_ID = boot_id
+
+class GenerationCounter:
+    """Monotonic version number for in-memory state (bumped on every change)"""
+    
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+    
+    def bump(self):
+        with self._lock:
+            self.value += 1
+            return self.value
+
+def make_etag(*parts):
+    """Strong ETag value from the versions a response depends on"""
+    digest = hashlib.sha1(repr((BOOT_ID,) + parts).encode()).hexdigest()
+    return digest[:20]
+
+def conditional_get(etag_fn, cache_control_key=None):
+    """
+    Decorator for read endpoints: answer If-None-Match with 304 before the
+    view runs, otherwise tag the fresh response with its ETag
+    
+    Args:
+        etag_fn: cheap callable returning the current ETag (or None to skip)
+        cache_control_key: app.config key holding the Cache-Control value
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            etag = etag_fn()
+            if etag is not None and request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            
+            if etag is not None:
+                response.set_etag(etag)
+            cache_control = current_app.config.get(cache_control_key) if cache_control_key else None
+            if cache_control:
+                response.headers['Cache-Control'] = cache_control
+            return response
+        return wrapper
+    return decorator
+
+class SectionCache:
+    """
+    Serialized JSON of the named sections of a composite response
+    
+    A section is rebuilt (and re-encoded) only when its ETag changes; until
+    then every request reuses the same JSON text.
+    """
+    
+    def __init__(self, dumps=json.dumps):
+        self.dumps = dumps
+        self._sections = {}  # name -> (etag, JSON text)
+        self.hits = 0
+        self.builds = 0
+    
+    def get(self, name, etag, build):
+        """
+        JSON text of a section as of `etag`
+        
+        Args:
+            build: callable returning the section data (or its JSON as str/bytes)
+        """
+        cached = self._sections.get(name)
+        if cached is not None and cached[0] == etag:
+            self.hits += 1
+            return cached[1]
+        data = build()
+        if isinstance(data, bytes):
+            data = data.decode()
+        text = data if isinstance(data, str) else self.dumps(data)
+        self._sections[name] = (etag, text)
+        self.builds += 1
+        return text
+    
+    def compose(self, builders, etags, known=lambda etag: False):
+        """
+        JSON object text {name: {"etag": ..., "data": ...}} spliced from the cached sections
+        
+        Args:
+            builders: section name -> build callable, in response order
+            etags: section name -> current ETag
+            known: predicate for ETags the client already holds; those sections are left out
+        
+        Returns:
+            tuple: (JSON text, names of the sections left out)
+        """
+        parts = []
+        unchanged = []
+        for name, build in builders.items():
+            if known(etags[name]):
+                unchanged.append(name)
+                continue
+            body = self.get(name, etags[name], build)
+            parts.append(f'{json.dumps(name)}:{{"etag":{json.dumps(etags[name])},"data":{body}}}')
+        return '{' + ','.join(parts) + '}', unchanged
+    
+    def get_stats(self):
+        return {'sections': sorted(self._sections), 'hits': self.hits, 'builds': self.builds}
+
 # ==================== WARMUP ====================
 
 def warmup_cache(app, prediction_stats):
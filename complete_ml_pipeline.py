@@ -8,8 +8,9 @@ This script implements a complete machine learning pipeline including:
 1. Data Preprocessing (cleaning, scaling, outlier detection)
 2. Visualization & Insights (histograms, count plots, box plots)
 3. Correlation Analysis
-4. Model Training (5 algorithms)
+4. Model Training (6 algorithms)
 5. Model Comparison & Selection
+6. Distillation of the served model into a small student tree
 """
 
 import pandas as pd
@@ -20,22 +21,30 @@ import pickle
 import warnings
 from datetime import datetime
 import os
+import json
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 from pathlib import Path
 
 # Machine Learning Libraries
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
 from sklearn.linear_model import LogisticRegression
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.svm import SVC
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
 
 # Metrics
 from sklearn.metrics import (accuracy_score, precision_score, recall_score, 
                            f1_score, confusion_matrix, classification_report, 
                            roc_auc_score, roc_curve)
 
+from validators import PredictionValidator
+from utils import AgeConverter, RiskAssessor, DistilledModel
+
 warnings.filterwarnings('ignore')
 
 # ==================== CONFIGURATION ====================
@@ -51,6 +60,22 @@ class Config:
     BEST_MODEL_FILE = 'cardio_model.pkl'
     SCALER_FILE = 'scaler.pkl'
     FEATURE_NAMES_FILE = 'feature_names.pkl'
+    MODEL_METADATA_FILE = 'model_metadata.json'
+    STUDENT_MODEL_FILE = 'student_model.pkl'
+    
+    # Force a specific candidate to be saved instead of the best by accuracy
+    # (e.g. CARDIO_MODEL="Histogram Gradient Boosting")
+    SELECTED_MODEL = os.getenv('CARDIO_MODEL')
+    
+    # Number of single-row predictions used to measure serving latency
+    LATENCY_SAMPLES = 200
+    
+    # Parallelism for n_jobs-aware models (-1 = all cores). The retraining
+    # service lowers this to its core budget
+    N_JOBS = int(os.getenv('CARDIO_N_JOBS', '-1'))
+    
+    # Optional JSON file the pipeline keeps updated with its current phase
+    PROGRESS_FILE = os.getenv('CARDIO_PROGRESS_FILE')
     
     # Data split ratios
     TEST_SIZE = 0.2
@@ -59,16 +84,26 @@ class Config:
     # Feature scaling method
     SCALING_METHOD = 'standard'  # 'standard' or 'minmax'
     
+    # Cross-validation (0 disables). Fold x model fits run across a process
+    # pool reading the feature matrix from shared memory
+    CV_FOLDS = int(os.getenv('CARDIO_CV_FOLDS', '0'))
+    CV_WORKERS = int(os.getenv('CARDIO_CV_WORKERS', str(os.cpu_count() or 1)))
+    CV_COMPARE_SERIAL = os.getenv('CARDIO_CV_COMPARE_SERIAL', 'false').lower() == 'true'
+    
+    # Memory-lean preprocessing: downcast columns to the smallest safe dtypes,
+    # scale in place into float32 and skip defensive copies
+    MEMORY_LEAN = os.getenv('CARDIO_MEMORY_LEAN', 'false').lower() == 'true'
+    
     # Model parameters
     MODELS_CONFIG = {
         'LogisticRegression': {
             'max_iter': 1000,
             'random_state': RANDOM_STATE,
-            'n_jobs': -1
+            'n_jobs': N_JOBS
         },
         'KNeighborsClassifier': {
             'n_neighbors': 5,
-            'n_jobs': -1
+            'n_jobs': N_JOBS
         },
         'SVC': {
             'kernel': 'rbf',
@@ -82,10 +117,29 @@ class Config:
         'RandomForestClassifier': {
             'n_estimators': 100,
             'random_state': RANDOM_STATE,
-            'n_jobs': -1,
+            'n_jobs': N_JOBS,
             'max_depth': 20
+        },
+        'HistGradientBoostingClassifier': {
+            'max_iter': 300,
+            'learning_rate': 0.1,
+            'max_depth': 6,
+            'max_leaf_nodes': 31,
+            'early_stopping': True,
+            'validation_fraction': 0.1,
+            'n_iter_no_change': 10,
+            'random_state': RANDOM_STATE
         }
     }
+    
+    # Distillation (student mimics the served model's predict_proba)
+    DISTILLATION_CONFIG = {
+        'max_depth': 8,
+        'min_samples_leaf': 40,
+        'random_state': RANDOM_STATE
+    }
+    SYNTHETIC_SAMPLES = 50000
+    STUDENT_CONFIDENCE_MARGIN = 5.0  # percentage points around risk thresholds
 
 # ==================== UTILITY FUNCTIONS ====================
 
@@ -114,6 +168,22 @@ def log(message, level='INFO'):
     """Log with timestamp"""
     logger.log(message, level)
 
+def report_progress(phase, step, total_steps):
+    """Write the current phase to Config.PROGRESS_FILE (for the retraining service)"""
+    if not Config.PROGRESS_FILE:
+        return
+    progress = {
+        'phase': phase,
+        'step': step,
+        'total_steps': total_steps,
+        'percent': round(step / total_steps * 100, 1),
+        'updated_at': datetime.now().isoformat()
+    }
+    tmp_file = f"{Config.PROGRESS_FILE}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(progress, f)
+    os.replace(tmp_file, Config.PROGRESS_FILE)
+
 def ensure_directories():
     """Create necessary directories"""
     for directory in [Config.OUTPUT_DIR, Config.LOGS_DIR, Config.PLOTS_DIR]:
@@ -125,18 +195,37 @@ def ensure_directories():
 class DataPreprocessor:
     """Handles all data preprocessing tasks"""
     
-    def __init__(self, filepath):
+    def __init__(self, filepath, lean=None):
         self.filepath = filepath
+        self.lean = Config.MEMORY_LEAN if lean is None else lean
         self.df = None
         self.df_processed = None
         self.feature_names = None
         self.scaler = None
+        self.raw_bytes = 0
         
     def load_data(self):
         """Load CSV data"""
         log(f"[LOAD] Loading data from {self.filepath}...")
         self.df = pd.read_csv(self.filepath, sep=';')
+        self.raw_bytes = int(self.df.memory_usage(index=True).sum())
         log(f"[OK] Data loaded: {self.df.shape[0]} rows, {self.df.shape[1]} columns")
+        
+        if self.lean:
+            self.downcast_dtypes()
+        return self
+    
+    def downcast_dtypes(self):
+        """Downcast every numeric column to the smallest dtype that holds its values"""
+        for col in self.df.columns:
+            if pd.api.types.is_integer_dtype(self.df[col]):
+                self.df[col] = pd.to_numeric(self.df[col], downcast='integer')
+            elif pd.api.types.is_float_dtype(self.df[col]):
+                # float32 keeps ~7 significant digits, plenty for kg/cm readings
+                self.df[col] = pd.to_numeric(self.df[col], downcast='float')
+        
+        lean_bytes = int(self.df.memory_usage(index=True).sum())
+        log(f"[OK] Downcast dtypes: {self.raw_bytes / 1e6:.2f}MB -> {lean_bytes / 1e6:.2f}MB")
         return self
     
     def check_missing_values(self):
@@ -158,7 +247,10 @@ class DataPreprocessor:
         """Remove duplicate rows"""
         log("\n[CHECK] CHECKING DUPLICATES...")
         before = len(self.df)
-        self.df = self.df.drop_duplicates()
+        if self.lean:
+            self.df.drop_duplicates(inplace=True)
+        else:
+            self.df = self.df.drop_duplicates()
         after = len(self.df)
         removed = before - after
         
@@ -208,29 +300,42 @@ class DataPreprocessor:
         log("\n[SCALE] PERFORMING FEATURE SCALING...")
         method = method or Config.SCALING_METHOD
         
-        # Separate features and target
-        X = self.df.drop('cardio', axis=1)
-        y = self.df['cardio']
-        
         # Store feature names
-        self.feature_names = X.columns.tolist()
+        self.feature_names = [col for col in self.df.columns if col != 'cardio']
         
         if method == 'standard':
-            self.scaler = StandardScaler()
+            self.scaler = StandardScaler(copy=not self.lean)
             log("Using StandardScaler (mean=0, std=1)")
         else:
-            self.scaler = MinMaxScaler()
+            self.scaler = MinMaxScaler(copy=not self.lean)
             log("Using MinMaxScaler (0 to 1 range)")
         
-        X_scaled = self.scaler.fit_transform(X)
-        self.df_processed = pd.DataFrame(X_scaled, columns=X.columns)
-        self.df_processed['cardio'] = y.values
+        if self.lean:
+            # One float32 matrix, scaled in place and wrapped without copying
+            X = self.df[self.feature_names].to_numpy(dtype=np.float32)
+            self.scaler.fit(X)
+            self.scaler.transform(X)
+            # Only this transform may work in place: the distiller and the pickled
+            # scaler served by the app must leave their inputs alone
+            self.scaler.copy = True
+            self.df_processed = pd.DataFrame(X, columns=self.feature_names, copy=False)
+            self.df_processed['cardio'] = self.df['cardio'].to_numpy()
+        else:
+            # Separate features and target
+            X = self.df.drop('cardio', axis=1)
+            y = self.df['cardio']
+            
+            X_scaled = self.scaler.fit_transform(X)
+            self.df_processed = pd.DataFrame(X_scaled, columns=X.columns)
+            self.df_processed['cardio'] = y.values
         
         log(f"[OK] Scaled {len(self.feature_names)} features")
         return self
     
     def get_processed_data(self):
-        """Return processed data"""
+        """Return processed data (shared, not copied, in memory-lean mode)"""
+        if self.lean:
+            return self.df_processed
         return self.df_processed.copy()
     
     def get_info(self):
@@ -253,6 +358,9 @@ class DataVisualizer:
     
     def __init__(self, df):
         self.df = df
+        # Derived series kept alongside the frame so the caller's df is not mutated
+        self.age_years = df['age'] / 365
+        self.disease_mask = (df['cardio'] == 1).to_numpy()
         sns.set_style("whitegrid")
         plt.rcParams['figure.figsize'] = (15, 12)
     
@@ -262,15 +370,14 @@ class DataVisualizer:
         fig, axes = plt.subplots(1, 2, figsize=(14, 5))
         
         # Overall age distribution
-        self.df['age_years'] = self.df['age'] / 365
-        axes[0].hist(self.df['age_years'], bins=30, color='skyblue', edgecolor='black')
+        axes[0].hist(self.age_years, bins=30, color='skyblue', edgecolor='black')
         axes[0].set_title('Age Distribution of All Patients', fontsize=14, fontweight='bold')
         axes[0].set_xlabel('Age (years)')
         axes[0].set_ylabel('Number of Patients')
         
         # Age distribution by disease status
-        disease = self.df[self.df['cardio'] == 1]['age_years']
-        healthy = self.df[self.df['cardio'] == 0]['age_years']
+        disease = self.age_years[self.disease_mask]
+        healthy = self.age_years[~self.disease_mask]
         axes[1].hist([healthy, disease], label=['Healthy', 'Disease'], 
                     color=['green', 'red'], alpha=0.7, bins=30)
         axes[1].set_title('Age Distribution by Disease Status', fontsize=14, fontweight='bold')
@@ -319,8 +426,8 @@ class DataVisualizer:
         features = ['ap_hi', 'ap_lo', 'cholesterol', 'gluc', 'age_years', 'weight']
         
         for idx, feature in enumerate(features):
-            data = [self.df[self.df['cardio']==0][feature], 
-                   self.df[self.df['cardio']==1][feature]]
+            values = self.age_years if feature == 'age_years' else self.df[feature]
+            data = [values[~self.disease_mask], values[self.disease_mask]]
             axes[idx].boxplot(data, labels=['Healthy', 'Disease'])
             axes[idx].set_title(f'{feature.upper()} Distribution', fontsize=12, fontweight='bold')
             axes[idx].set_ylabel('Value')
@@ -357,6 +464,46 @@ class DataVisualizer:
 
 # ==================== PHASE 3: MODEL TRAINING & COMPARISON ====================
 
+# Per-process views onto the shared CV data, set up once by _cv_worker_init
+_cv_shared = {}
+
+def _cv_worker_init(specs):
+    """Attach a worker to the shared CV arrays (no data is copied)"""
+    for key, (name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        _cv_shared[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        _cv_shared[key + '_shm'] = shm  # keep the mapping alive
+
+def _cv_fit_fold(task):
+    """Fit one model on one fold and score it on the held-out part"""
+    model_name, model_class, params, fold = task
+    X, y, folds = _cv_shared['X'], _cv_shared['y'], _cv_shared['folds']
+    
+    # Each task is already one process; nested n_jobs=-1 would oversubscribe
+    params = {k: (1 if k == 'n_jobs' else v) for k, v in params.items()}
+    train_mask = folds != fold
+    
+    start = time.perf_counter()
+    model = model_class(**params)
+    model.fit(X[train_mask], y[train_mask])
+    fit_time = time.perf_counter() - start
+    
+    X_val, y_val = X[~train_mask], y[~train_mask]
+    y_pred = model.predict(X_val)
+    try:
+        scores = model.predict_proba(X_val)[:, 1]
+    except Exception:
+        scores = model.decision_function(X_val)
+    
+    return model_name, fold, {
+        'accuracy': accuracy_score(y_val, y_pred),
+        'precision': precision_score(y_val, y_pred),
+        'recall': recall_score(y_val, y_pred),
+        'f1_score': f1_score(y_val, y_pred),
+        'roc_auc': roc_auc_score(y_val, scores),
+        'fit_time_s': fit_time
+    }
+
 class ModelTrainer:
     """Train and evaluate multiple models"""
     
@@ -367,6 +514,7 @@ class ModelTrainer:
         self.X_test = None
         self.y_train = None
         self.y_test = None
+        self.cv_results = None
     
     def prepare_data(self, df):
         """Split data into train/test"""
@@ -387,7 +535,13 @@ class ModelTrainer:
         
         try:
             model = model_class(**kwargs)
+            fit_start = time.perf_counter()
             model.fit(self.X_train, self.y_train)
+            fit_time = time.perf_counter() - fit_start
+            
+            # Early-stopped boosters report how many iterations they kept
+            if getattr(model, 'n_iter_', None) is not None and kwargs.get('early_stopping'):
+                log(f"  Early stopping kept {model.n_iter_} of {kwargs.get('max_iter')} iterations")
             
             # Make predictions
             y_pred_train = model.predict(self.X_train)
@@ -411,6 +565,8 @@ class ModelTrainer:
                 except:
                     roc_auc = 0
             
+            predict_latency_ms = self.measure_latency(model)
+            
             # Store results
             self.results[model_name] = {
                 'train_accuracy': train_acc,
@@ -419,6 +575,8 @@ class ModelTrainer:
                 'recall': recall,
                 'f1_score': f1,
                 'roc_auc': roc_auc,
+                'fit_time_s': fit_time,
+                'predict_latency_ms': predict_latency_ms,
                 'model': model
             }
             
@@ -429,29 +587,120 @@ class ModelTrainer:
             log(f"  Test Accuracy: {test_acc:.4f}")
             log(f"  Precision: {precision:.4f}")
             log(f"  Recall: {recall:.4f}")
+            log(f"  Fit Time: {fit_time:.2f}s")
+            log(f"  Single-row Latency: {predict_latency_ms:.3f}ms")
             
         except Exception as e:
             log(f"[ERROR] Error training {model_name}: {str(e)}", 'ERROR')
     
-    def train_all_models(self):
-        """Train all 5 models"""
-        log("\n" + "="*60)
-        log("[PHASE 4] TRAINING 5 DIFFERENT MODELS")
-        log("="*60)
+    def measure_latency(self, model, samples=None):
+        """Average single-row predict_proba latency (ms), as seen by /api/predict"""
+        samples = samples or Config.LATENCY_SAMPLES
+        rows = np.asarray(self.X_test)[:samples]
         
-        model_configs = [
+        start = time.perf_counter()
+        for i in range(len(rows)):
+            model.predict_proba(rows[i:i + 1])
+        return (time.perf_counter() - start) / max(len(rows), 1) * 1000
+    
+    @staticmethod
+    def get_model_configs():
+        """Candidate models as (display name, class, params)"""
+        return [
             ('Logistic Regression', LogisticRegression, Config.MODELS_CONFIG['LogisticRegression']),
             ('K-Nearest Neighbors', KNeighborsClassifier, Config.MODELS_CONFIG['KNeighborsClassifier']),
             ('Support Vector Machine', SVC, Config.MODELS_CONFIG['SVC']),
             ('Decision Tree', DecisionTreeClassifier, Config.MODELS_CONFIG['DecisionTreeClassifier']),
-            ('Random Forest', RandomForestClassifier, Config.MODELS_CONFIG['RandomForestClassifier'])
+            ('Random Forest', RandomForestClassifier, Config.MODELS_CONFIG['RandomForestClassifier']),
+            ('Histogram Gradient Boosting', HistGradientBoostingClassifier, Config.MODELS_CONFIG['HistGradientBoostingClassifier'])
         ]
+    
+    def train_all_models(self):
+        """Train all candidate models"""
+        model_configs = self.get_model_configs()
+        
+        log("\n" + "="*60)
+        log(f"[PHASE 4] TRAINING {len(model_configs)} DIFFERENT MODELS")
+        log("="*60)
         
         for model_name, model_class, config in model_configs:
             self.train_model(model_name, model_class, **config)
         
         return self
     
+    def cross_validate_models(self, df, n_folds=None, n_workers=None, compare_serial=None):
+        """
+        K-fold CV of every candidate. Fold indices are generated once and the
+        feature matrix, labels and fold ids are placed in shared memory, so the
+        fold x model fits in the process pool never receive a copy of the data.
+        """
+        n_folds = n_folds or Config.CV_FOLDS
+        n_workers = n_workers or Config.CV_WORKERS
+        compare_serial = Config.CV_COMPARE_SERIAL if compare_serial is None else compare_serial
+        
+        log("\n" + "="*60)
+        log(f"[CV] {n_folds}-FOLD CROSS-VALIDATION ({n_workers} workers)")
+        log("="*60)
+        
+        X = np.ascontiguousarray(df.drop('cardio', axis=1).to_numpy())
+        y = np.ascontiguousarray(df['cardio'].to_numpy())
+        folds = np.empty(len(y), dtype=np.int8)
+        splitter = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=Config.RANDOM_STATE)
+        for fold, (_, val_idx) in enumerate(splitter.split(X, y)):
+            folds[val_idx] = fold
+        
+        # Copy each array into a shared segment once
+        segments, specs = [], {}
+        try:
+            for key, array in (('X', X), ('y', y), ('folds', folds)):
+                shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+                segments.append(shm)
+                specs[key] = (shm.name, array.shape, array.dtype.str)
+            del X, y
+            
+            tasks = [(name, cls, params, fold)
+                     for name, cls, params in self.get_model_configs()
+                     for fold in range(n_folds)]
+            
+            start = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=n_workers, initializer=_cv_worker_init,
+                                     initargs=(specs,)) as pool:
+                fold_results = list(pool.map(_cv_fit_fold, tasks))
+            parallel_time = time.perf_counter() - start
+            log(f"[OK] {len(tasks)} fits finished in {parallel_time:.1f}s (parallel)")
+            
+            serial_time = None
+            if compare_serial:
+                _cv_worker_init(specs)
+                start = time.perf_counter()
+                for task in tasks:
+                    _cv_fit_fold(task)
+                serial_time = time.perf_counter() - start
+                _cv_shared.clear()
+                log(f"[OK] Serial CV took {serial_time:.1f}s "
+                    f"-> {serial_time - parallel_time:.1f}s saved ({serial_time / parallel_time:.1f}x)")
+        finally:
+            _cv_shared.clear()
+            for shm in segments:
+                shm.close()
+                shm.unlink()
+        
+        # Mean and std per model and metric
+        rows = []
+        for model_name, fold, metrics in fold_results:
+            rows.append(dict(model=model_name, fold=fold, **metrics))
+        per_fold = pd.DataFrame(rows)
+        self.cv_results = per_fold.drop(columns='fold').groupby('model', sort=False).agg(['mean', 'std'])
+        
+        log("\n[CV] MEAN ± STD ACROSS FOLDS:")
+        for model_name, row in self.cv_results.iterrows():
+            log(f"  {model_name}: accuracy {row[('accuracy', 'mean')]:.4f} ± {row[('accuracy', 'std')]:.4f}, "
+                f"F1 {row[('f1_score', 'mean')]:.4f} ± {row[('f1_score', 'std')]:.4f}, "
+                f"ROC-AUC {row[('roc_auc', 'mean')]:.4f} ± {row[('roc_auc', 'std')]:.4f}")
+        
+        return {'parallel_time_s': parallel_time, 'serial_time_s': serial_time}
+    
     def compare_models(self):
         """Compare all models"""
         log("\n" + "="*60)
@@ -465,8 +714,22 @@ class ModelTrainer:
         log("\n[COMPARE] MODEL PERFORMANCE COMPARISON:")
         log("\n" + str(comparison_df))
         
-        # Find best model by accuracy
-        best_model_name = comparison_df['test_accuracy'].idxmax()
+        # Find best model by accuracy (unless a candidate is forced); mean CV
+        # accuracy is preferred over the single hold-out split when available
+        if Config.SELECTED_MODEL in comparison_df.index:
+            best_model_name = Config.SELECTED_MODEL
+            log(f"\n[SELECT] Using configured model: {best_model_name}")
+        else:
+            if Config.SELECTED_MODEL:
+                log(f"⚠ Configured model '{Config.SELECTED_MODEL}' not trained, selecting by accuracy", 'WARNING')
+            cv_accuracy = None
+            if self.cv_results is not None:
+                cv_accuracy = self.cv_results[('accuracy', 'mean')].reindex(comparison_df.index).dropna()
+            if cv_accuracy is not None and len(cv_accuracy):
+                best_model_name = cv_accuracy.idxmax()
+                log(f"\n[SELECT] Selected by mean CV accuracy ({cv_accuracy[best_model_name]:.4f})")
+            else:
+                best_model_name = comparison_df['test_accuracy'].idxmax()
         best_accuracy = comparison_df.loc[best_model_name, 'test_accuracy']
         
         log("\n[WINNER] BEST MODEL SELECTED:")
@@ -474,6 +737,8 @@ class ModelTrainer:
         log(f"  Test Accuracy: {best_accuracy:.4f}")
         log(f"  F1-Score: {comparison_df.loc[best_model_name, 'f1_score']:.4f}")
         log(f"  ROC-AUC: {comparison_df.loc[best_model_name, 'roc_auc']:.4f}")
+        log(f"  Fit Time: {comparison_df.loc[best_model_name, 'fit_time_s']:.2f}s")
+        log(f"  Single-row Latency: {comparison_df.loc[best_model_name, 'predict_latency_ms']:.3f}ms")
         
         return best_model_name, comparison_df
     
@@ -519,6 +784,14 @@ class ModelTrainer:
 class ModelSaver:
     """Save and load models"""
     
+    @staticmethod
+    def atomic_pickle(obj, filepath):
+        """Write to a temp file and rename, so a running server never reads a partial file"""
+        tmp_file = f"{filepath}.tmp"
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(obj, f)
+        os.replace(tmp_file, filepath)
+    
     @staticmethod
     def save_model(model, model_name, scaler, feature_names):
         """Save trained model and scaler"""
@@ -526,24 +799,183 @@ class ModelSaver:
         
         try:
             # Save model
-            with open(Config.BEST_MODEL_FILE, 'wb') as f:
-                pickle.dump(model, f)
+            ModelSaver.atomic_pickle(model, Config.BEST_MODEL_FILE)
             log(f"[OK] Model saved: {Config.BEST_MODEL_FILE}")
             
             # Save scaler
-            with open(Config.SCALER_FILE, 'wb') as f:
-                pickle.dump(scaler, f)
+            ModelSaver.atomic_pickle(scaler, Config.SCALER_FILE)
             log(f"[OK] Scaler saved: {Config.SCALER_FILE}")
             
             # Save feature names
-            with open(Config.FEATURE_NAMES_FILE, 'wb') as f:
-                pickle.dump(feature_names, f)
+            ModelSaver.atomic_pickle(feature_names, Config.FEATURE_NAMES_FILE)
             log(f"[OK] Feature names saved: {Config.FEATURE_NAMES_FILE}")
             
             log(f"\n[SUCCESS] Best model ({model_name}) ready for deployment!")
             
         except Exception as e:
             log(f"[ERROR] Error saving model: {str(e)}", 'ERROR')
+    
+    @staticmethod
+    def save_student(student_tree):
+        """Save distilled student tree (plain dict, no sklearn needed to load)"""
+        try:
+            ModelSaver.atomic_pickle(student_tree, Config.STUDENT_MODEL_FILE)
+            log(f"[OK] Student model saved: {Config.STUDENT_MODEL_FILE}")
+        except Exception as e:
+            log(f"[ERROR] Error saving student model: {str(e)}", 'ERROR')
+    
+    @staticmethod
+    def save_metadata(model, model_name, metrics=None):
+        """
+        Save training metadata. Written last: serving workers watch this file
+        and reload all artifacts when it changes
+        """
+        metadata = {
+            'model_name': model_name,
+            'model_type': type(model).__name__,
+            'trained_at': datetime.now().isoformat(),
+            'metrics': {k: round(float(v), 4) for k, v in (metrics or {}).items() if k != 'model'}
+        }
+        tmp_file = f"{Config.MODEL_METADATA_FILE}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(metadata, f, indent=2)
+        os.replace(tmp_file, Config.MODEL_METADATA_FILE)
+        log(f"[OK] Metadata saved: {Config.MODEL_METADATA_FILE}")
+
+# ==================== PHASE 7: MODEL DISTILLATION ====================
+
+class ModelDistiller:
+    """Distill the served (teacher) model into a shallow student tree"""
+    
+    def __init__(self, teacher, scaler, feature_names):
+        self.teacher = teacher
+        self.scaler = scaler
+        self.feature_names = feature_names
+        self.student = None
+        self.student_tree = None
+        self.metrics = {}
+    
+    def generate_synthetic_samples(self, raw_df, n_samples=None):
+        """
+        Sample raw feature rows across the validator's input ranges.
+        Columns the validator doesn't cover are bootstrapped from the data.
+        """
+        n_samples = n_samples or Config.SYNTHETIC_SAMPLES
+        rng = np.random.default_rng(Config.RANDOM_STATE)
+        v = PredictionValidator
+        
+        ranges = {
+            'age': (AgeConverter.years_to_days(v.AGE_RANGE[0]), AgeConverter.years_to_days(v.AGE_RANGE[1])),
+            'height': v.HEIGHT_RANGE,
+            'weight': v.WEIGHT_RANGE,
+            'ap_hi': v.BP_RANGE,
+            'ap_lo': v.BP_RANGE
+        }
+        options = {
+            'gender': v.GENDER_OPTIONS,
+            'cholesterol': v.CHOLESTEROL_OPTIONS,
+            'gluc': v.GLUCOSE_OPTIONS,
+            'smoke': v.BOOL_OPTIONS,
+            'alco': v.BOOL_OPTIONS,
+            'active': v.BOOL_OPTIONS
+        }
+        
+        synthetic = np.empty((n_samples, len(self.feature_names)))
+        for idx, name in enumerate(self.feature_names):
+            if name in ranges:
+                low, high = ranges[name]
+                synthetic[:, idx] = rng.uniform(low, high, n_samples).round()
+            elif name in options:
+                synthetic[:, idx] = rng.choice(options[name], n_samples)
+            else:
+                synthetic[:, idx] = rng.choice(raw_df[name].to_numpy(), n_samples)
+        
+        # The validator requires diastolic < systolic
+        if 'ap_hi' in self.feature_names and 'ap_lo' in self.feature_names:
+            hi = self.feature_names.index('ap_hi')
+            lo = self.feature_names.index('ap_lo')
+            pair = np.sort(synthetic[:, [lo, hi]], axis=1)
+            synthetic[:, lo], synthetic[:, hi] = pair[:, 0], pair[:, 1]
+        
+        log(f"[OK] Generated {n_samples} synthetic samples from validator ranges")
+        return self.scaler.transform(pd.DataFrame(synthetic, columns=self.feature_names))
+    
+    def distill(self, X_train, raw_df):
+        """Fit the student on the teacher's probabilities (training + synthetic data)"""
+        log("\n[DISTILL] TRAINING STUDENT MODEL...")
+        X = np.vstack([np.asarray(X_train), self.generate_synthetic_samples(raw_df)])
+        soft_labels = self.teacher.predict_proba(X)[:, 1]
+        
+        self.student = DecisionTreeRegressor(**Config.DISTILLATION_CONFIG)
+        start = time.perf_counter()
+        self.student.fit(X, soft_labels)
+        log(f"[OK] Student fitted on {len(X)} rows in {time.perf_counter() - start:.2f}s "
+            f"({self.student.tree_.node_count} nodes, depth {self.student.get_depth()})")
+        
+        self.student_tree = self.export_tree()
+        return self
+    
+    def export_tree(self):
+        """Export the student as plain lists with thresholds mapped back to raw feature space"""
+        tree = self.student.tree_
+        is_split = tree.children_left != -1
+        
+        # Scalers are per-column affine maps, so inverse-transforming a row filled
+        # with the threshold gives the raw threshold for every column at once
+        raw_thresholds = np.zeros(tree.node_count)
+        if is_split.any():
+            filled = np.repeat(tree.threshold[is_split][:, None], len(self.feature_names), axis=1)
+            raw = self.scaler.inverse_transform(filled)
+            raw_thresholds[is_split] = raw[np.arange(len(raw)), tree.feature[is_split]]
+        
+        return {
+            'children_left': tree.children_left.tolist(),
+            'children_right': tree.children_right.tolist(),
+            'feature': tree.feature.tolist(),
+            'threshold': raw_thresholds.tolist(),
+            'value': np.clip(tree.value[:, 0, 0], 0, 1).tolist(),
+            'feature_names': list(self.feature_names),
+            'teacher_type': type(self.teacher).__name__
+        }
+    
+    def evaluate(self, X_test, y_test):
+        """Agreement and ROC-AUC of the student against the teacher and the labels"""
+        log("\n[DISTILL] EVALUATING STUDENT AGAINST TEACHER...")
+        X_test = np.asarray(X_test)
+        teacher_proba = self.teacher.predict_proba(X_test)[:, 1]
+        
+        # Score through the exported raw-space tree, exactly as app.py will
+        student_model = DistilledModel(self.student_tree)
+        raw_rows = self.scaler.inverse_transform(X_test).tolist()
+        start = time.perf_counter()
+        student_proba = np.array([student_model.predict_disease_probability(row) for row in raw_rows])
+        latency_us = (time.perf_counter() - start) / max(len(raw_rows), 1) * 1e6
+        
+        teacher_levels = [RiskAssessor.get_risk_level(p)['level'] for p in teacher_proba]
+        student_levels = [RiskAssessor.get_risk_level(p)['level'] for p in student_proba]
+        near_threshold = [RiskAssessor.is_near_threshold(p, Config.STUDENT_CONFIDENCE_MARGIN) for p in student_proba]
+        
+        self.metrics = {
+            'class_agreement': float(np.mean((student_proba >= 0.5) == (teacher_proba >= 0.5))),
+            'risk_level_agreement': float(np.mean(np.array(teacher_levels) == np.array(student_levels))),
+            'roc_auc_vs_teacher': float(roc_auc_score(teacher_proba >= 0.5, student_proba)),
+            'roc_auc_vs_labels': float(roc_auc_score(y_test, student_proba)),
+            'teacher_roc_auc_vs_labels': float(roc_auc_score(y_test, teacher_proba)),
+            'mean_abs_error': float(np.mean(np.abs(student_proba - teacher_proba))),
+            'fallback_rate': float(np.mean(near_threshold)),
+            'latency_us': latency_us
+        }
+        self.student_tree['metrics'] = self.metrics
+        
+        log(f"  Class Agreement: {self.metrics['class_agreement']:.4f}")
+        log(f"  Risk Level Agreement: {self.metrics['risk_level_agreement']:.4f}")
+        log(f"  ROC-AUC vs Teacher: {self.metrics['roc_auc_vs_teacher']:.4f}")
+        log(f"  ROC-AUC vs Labels: {self.metrics['roc_auc_vs_labels']:.4f} "
+            f"(teacher {self.metrics['teacher_roc_auc_vs_labels']:.4f})")
+        log(f"  Mean |p_student - p_teacher|: {self.metrics['mean_abs_error']:.4f}")
+        log(f"  Teacher fallback rate (±{Config.STUDENT_CONFIDENCE_MARGIN}pp): {self.metrics['fallback_rate']:.2%}")
+        log(f"  Student latency: {latency_us:.2f}µs per prediction")
+        return self.metrics
 
 # ==================== MAIN PIPELINE ====================
 
@@ -556,12 +988,14 @@ def run_complete_pipeline():
     
     # Setup
     ensure_directories()
+    report_progress('preprocessing', 0, 7)
     
     # ============ PHASE 1: DATA PREPROCESSING ============
     log("\n" + "="*70)
     log("[PHASE 1] DATA PREPROCESSING")
     log("="*70)
     
+    tracemalloc.start()
     preprocessor = DataPreprocessor(Config.DATA_FILE)
     (preprocessor
      .load_data()
@@ -573,8 +1007,15 @@ def run_complete_pipeline():
     preprocessor.get_info()
     
     df_processed = preprocessor.get_processed_data()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    log(f"\n[MEMORY] Preprocessing ({'lean' if preprocessor.lean else 'standard'} mode):")
+    log(f"  Raw data: {preprocessor.raw_bytes / 1e6:.2f}MB")
+    log(f"  Peak allocated: {peak_bytes / 1e6:.2f}MB ({peak_bytes / max(preprocessor.raw_bytes, 1):.1f}x raw)")
     
     # ============ PHASE 2: VISUALIZATION & INSIGHTS ============
+    report_progress('visualization', 1, 7)
     log("\n" + "="*70)
     log("[PHASE 2] VISUALIZATION & INSIGHTS")
     log("="*70)
@@ -586,6 +1027,7 @@ def run_complete_pipeline():
     corr_matrix = visualizer.create_correlation_heatmap()
     
     # ============ PHASE 3: FEATURE SELECTION ============
+    report_progress('feature_selection', 2, 7)
     log("\n" + "="*70)
     log("[PHASE 3] FEATURE SELECTION FROM CORRELATION")
     log("="*70)
@@ -598,7 +1040,12 @@ def run_complete_pipeline():
     # ============ PHASE 4 & 5: MODEL TRAINING & COMPARISON ============
     trainer = ModelTrainer()
     trainer.prepare_data(df_processed)
+    if Config.CV_FOLDS > 1:
+        report_progress('cross_validation', 3, 7)
+        trainer.cross_validate_models(df_processed)
+    report_progress('training', 4, 7)
     trainer.train_all_models()
+    report_progress('comparison', 5, 7)
     best_model_name, comparison_df = trainer.compare_models()
     trainer.plot_comparison()
     
@@ -606,6 +1053,21 @@ def run_complete_pipeline():
     best_model = trainer.results[best_model_name]['model']
     ModelSaver.save_model(best_model, best_model_name, preprocessor.scaler, preprocessor.feature_names)
     
+    # ============ PHASE 7: DISTILLATION ============
+    report_progress('distillation', 6, 7)
+    log("\n" + "="*70)
+    log("[PHASE 7] DISTILLING STUDENT MODEL")
+    log("="*70)
+    
+    distiller = ModelDistiller(best_model, preprocessor.scaler, preprocessor.feature_names)
+    distiller.distill(trainer.X_train, preprocessor.df)
+    distiller.evaluate(trainer.X_test, trainer.y_test)
+    ModelSaver.save_student(distiller.student_tree)
+    
+    # Publish: serving workers reload once the metadata file changes
+    ModelSaver.save_metadata(best_model, best_model_name, metrics=trainer.results[best_model_name])
+    report_progress('completed', 7, 7)
+    
     # ============ SUMMARY ============
     log("\n" + "="*70)
     log("[SUCCESS] PIPELINE COMPLETED SUCCESSFULLY!")
@@ -617,7 +1079,7 @@ def run_complete_pipeline():
     log(f"  Test Accuracy: {comparison_df.loc[best_model_name, 'test_accuracy']:.4f}")
     log(f"  Training completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     log(f"\n[FILES] Outputs:")
-    log(f"  Models: {Config.BEST_MODEL_FILE}, {Config.SCALER_FILE}")
+    log(f"  Models: {Config.BEST_MODEL_FILE}, {Config.SCALER_FILE}, {Config.STUDENT_MODEL_FILE}")
     log(f"  Plots: {Config.PLOTS_DIR}/ (5 visualization files)")
     log(f"  Logs: {Config.LOGS_DIR}/training_*.log")
     
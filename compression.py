@@ -0,0 +1,193 @@
+"""
+Response Compression Middleware
+WSGI layer that gzip/brotli-encodes responses according to Accept-Encoding,
+buffering small known-length bodies and streaming chunked ones
+"""
+
+import zlib
+
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'text/html', 'text/css', 'text/javascript', 'text/plain', 'text/csv',
+    'text/event-stream', 'image/svg+xml'
+}
+
+# ==================== ENCODERS ====================
+
+class GzipEncoder:
+    """Incremental gzip stream"""
+    
+    def __init__(self, level):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    
+    def compress(self, data):
+        return self._obj.compress(data)
+    
+    def flush(self):
+        """Emit everything buffered so far without ending the stream"""
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+    
+    def finish(self):
+        return self._obj.flush()
+
+class BrotliEncoder:
+    """Incremental brotli stream"""
+    
+    def __init__(self, quality):
+        self._obj = brotli.Compressor(quality=quality)
+    
+    def compress(self, data):
+        return self._obj.process(data)
+    
+    def flush(self):
+        return self._obj.flush()
+    
+    def finish(self):
+        return self._obj.finish()
+
+def available_encodings(preferred):
+    """Server-side encodings in preference order, minus those not installed"""
+    if isinstance(preferred, str):
+        preferred = [e.strip() for e in preferred.split(',')]
+    return [e for e in preferred if e == 'gzip' or (e == 'br' and brotli is not None)]
+
+def compress_body(data, encoding, gzip_level=6, brotli_quality=4):
+    """One-shot compression of a complete body"""
+    encoder = BrotliEncoder(brotli_quality) if encoding == 'br' else GzipEncoder(gzip_level)
+    return encoder.compress(data) + encoder.finish()
+
+# ==================== MIDDLEWARE ====================
+
+class CompressionMiddleware:
+    """
+    Compress eligible responses
+    
+    Bodies with a Content-Length are compressed whole once they reach
+    `min_size`. Bodies without one (generators, SSE) are compressed chunk by
+    chunk with a sync flush, so each chunk still reaches the client promptly.
+    """
+    
+    def __init__(self, wsgi_app, encodings='gzip', min_size=1024, gzip_level=6, brotli_quality=4,
+                 stream=True):
+        self.wsgi_app = wsgi_app
+        self.encodings = available_encodings(encodings)
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.stream = stream
+    
+    def negotiate(self, accept_encoding):
+        """Best encoding both sides support, or None"""
+        if not accept_encoding or not self.encodings:
+            return None
+        return parse_accept_header(accept_encoding).best_match(self.encodings)
+    
+    def _encoder(self, encoding):
+        if encoding == 'br':
+            return BrotliEncoder(self.brotli_quality)
+        return GzipEncoder(self.gzip_level)
+    
+    def __call__(self, environ, start_response):
+        encoding = self.negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return self.wsgi_app(environ, start_response)
+        
+        # We tag compressed ETags with the encoding; undo that for the app's own checks
+        suffix = f'-{encoding}"'
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        revalidating = bool(if_none_match) and suffix in if_none_match
+        if revalidating:
+            environ['HTTP_IF_NONE_MATCH'] = if_none_match.replace(suffix, '"')
+        
+        captured = {'written': []}
+        
+        def capture(status, headers, exc_info=None):
+            captured['status'], captured['headers'], captured['exc_info'] = status, headers, exc_info
+            return captured['written'].append
+        
+        body = self.wsgi_app(environ, capture)
+        iterator = None
+        pending = captured['written']
+        if 'status' not in captured:
+            # Lazy apps only call start_response once iteration begins
+            iterator = iter(body)
+            first = next(iterator, None)
+            if first is not None:
+                pending.append(first)
+        
+        status, headers = captured['status'], captured['headers']
+        header_map = {name.lower(): value for name, value in headers}
+        mimetype = header_map.get('content-type', '').split(';')[0].strip()
+        etag = header_map.get('etag')
+        eligible = (
+            status.startswith('200')
+            and mimetype in COMPRESSIBLE_MIMETYPES
+            and 'content-encoding' not in header_map
+            and environ.get('REQUEST_METHOD') != 'HEAD'
+        )
+        
+        if status.startswith('304') and revalidating and etag and etag.endswith('"'):
+            headers = [(n, v) for n, v in headers if n.lower() != 'etag']
+            headers.append(('ETag', etag[:-1] + suffix))
+        
+        if eligible:
+            vary = header_map.get('vary')
+            if not vary or 'accept-encoding' not in vary.lower():
+                headers = [(n, v) for n, v in headers if n.lower() != 'vary']
+                headers.append(('Vary', f'{vary}, Accept-Encoding' if vary else 'Accept-Encoding'))
+        
+        content_length = header_map.get('content-length')
+        if not eligible or (content_length is not None and int(content_length) < self.min_size) \
+                or (content_length is None and not self.stream):
+            start_response(status, headers, captured['exc_info'])
+            if iterator is None and not pending:
+                return body
+            return self._chain(pending, iterator or iter(body), body)
+        
+        headers = [(n, v) for n, v in headers if n.lower() not in ('content-length', 'etag')]
+        headers.append(('Content-Encoding', encoding))
+        if etag:
+            headers.append(('ETag', etag[:-1] + suffix if etag.endswith('"') else etag))
+        iterator = iterator or iter(body)
+        
+        if content_length is not None:
+            try:
+                data = b''.join(pending) + b''.join(iterator)
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+            compressed = compress_body(data, encoding, self.gzip_level, self.brotli_quality)
+            headers.append(('Content-Length', str(len(compressed))))
+            start_response(status, headers, captured['exc_info'])
+            return [compressed]
+        
+        start_response(status, headers, captured['exc_info'])
+        return self._stream(self._chain(pending, iterator, body), self._encoder(encoding))
+    
+    @staticmethod
+    def _chain(pending, iterator, body):
+        try:
+            for chunk in pending:
+                yield chunk
+            for chunk in iterator:
+                yield chunk
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+    
+    @staticmethod
+    def _stream(chunks, encoder):
+        try:
+            for chunk in chunks:
+                if chunk:
+                    yield encoder.compress(chunk) + encoder.flush()
+            yield encoder.finish()
+        finally:
+            chunks.close()
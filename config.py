@@ -15,22 +15,93 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///cardio_predictions.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Persistent prediction store (SQLite file from SQLALCHEMY_DATABASE_URI, WAL mode).
+    # Inserts are queued and committed in batches by a background writer
+    PREDICTION_DB_ENABLED = os.getenv('PREDICTION_DB_ENABLED', 'true').lower() == 'true'
+    PREDICTION_DB_BATCH_SIZE = 500
+    PREDICTION_DB_FLUSH_INTERVAL = 0.2  # seconds a batch waits for more rows
+    PREDICTION_DB_QUEUE_SIZE = 10000
+    PREDICTION_DB_COMMIT_RETRIES = 3  # a failed batch is retried this often before its rows are lost
+    PREDICTION_DB_RETRY_BACKOFF = 0.1  # seconds before the first retry, doubled for each one after
+    PREDICTION_DB_RESTORE = True  # reload history and stats from the database at startup
+    # Warm restarts: a background thread keeps a compacted snapshot (stats + newest history)
+    # of the database; startup loads it and replays only the predictions written after it
+    SNAPSHOT_ENABLED = os.getenv('SNAPSHOT_ENABLED', 'true').lower() == 'true'
+    SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH')  # default: <database file>-snapshot
+    SNAPSHOT_INTERVAL_SECONDS = float(os.getenv('SNAPSHOT_INTERVAL_SECONDS', '60'))
+    
+    # Shared state for multi-worker servers (gunicorn -w N): counters and aggregates in a
+    # memory-mapped file, history read from the prediction database, so every worker
+    # answers the same. Requires the prediction database
+    SHARED_STATE_ENABLED = os.getenv('SHARED_STATE', 'false').lower() == 'true'
+    SHARED_STATE_PATH = os.getenv('SHARED_STATE_PATH')  # default: <database file>-stats
+    
     # CORS settings
     CORS_ORIGINS = ["http://localhost:*", "http://127.0.0.1:*"]
     
     # API settings
     API_VERSION = "2.0.0"
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max request size
-    JSON_ACCEPT_ENCODING = 'gzip'
+    JSON_ACCEPT_ENCODING = 'br,gzip'  # offered in this order; br only if the brotli package is installed
+    
+    # Response compression (see compression.py)
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = 1024  # bytes; smaller bodies are sent as-is
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '4'))
+    COMPRESSION_STREAMING = True  # also compress chunked responses (SSE, exports), flushing per chunk
     
-    # Prediction settings
-    MAX_PREDICTIONS_IN_MEMORY = 10000
-    PREDICTION_RETENTION_HOURS = 24
+    # Prediction settings (history store evicts oldest-first beyond either limit)
+    MAX_PREDICTIONS_IN_MEMORY = int(os.getenv('MAX_PREDICTIONS_IN_MEMORY', '10000'))
+    PREDICTION_RETENTION_HOURS = float(os.getenv('PREDICTION_RETENTION_HOURS', '24'))
+    HISTORY_BACKEND = os.getenv('HISTORY_BACKEND', 'columnar')  # 'columnar' (compact) or 'dict'
+    HISTORY_CHANGE_LOG_SIZE = int(os.getenv('HISTORY_CHANGE_LOG_SIZE', '10000'))  # stores/evictions kept for ?since= delta sync
+    EXPORT_CHUNK_SIZE = 1000  # records read and serialized per step of /api/prediction-export
+    EXPORT_FLUSH_TIMEOUT = 2.0  # seconds an export waits for queued predictions to reach the database
+    SEARCH_INDEX_ENABLED = os.getenv('SEARCH_INDEX_ENABLED', 'true').lower() == 'true'  # /api/prediction-search
     
     # Model settings
     MODEL_FILE = 'cardio_model.pkl'
     SCALER_FILE = 'scaler.pkl'
     FEATURES_FILE = 'feature_names.pkl'
+    MODEL_METADATA_FILE = 'model_metadata.json'
+    
+    # Distilled student model (fast path, teacher used near risk thresholds)
+    STUDENT_MODEL_FILE = 'student_model.pkl'
+    STUDENT_FAST_PATH = os.getenv('STUDENT_FAST_PATH', 'true').lower() == 'true'
+    STUDENT_CONFIDENCE_MARGIN = 5.0  # percentage points
+    
+    # Serving workers poll the metadata file (written last by the pipeline)
+    MODEL_RELOAD_CHECK_SECONDS = 5
+    
+    # Background retraining (0 = only on POST /api/retrain)
+    RETRAIN_SCRIPT = 'complete_ml_pipeline.py'
+    RETRAIN_INTERVAL_HOURS = float(os.getenv('RETRAIN_INTERVAL_HOURS', '0'))
+    RETRAIN_CORE_BUDGET = int(os.getenv('RETRAIN_CORE_BUDGET', '1'))
+    RETRAIN_NICE = 19
+    RETRAIN_PROGRESS_FILE = 'logs/retrain_progress.json'
+    RETRAIN_LOCK_FILE = 'logs/retrain.lock'
+    RETRAIN_LOG_FILE = 'logs/retrain.log'
+    
+    # Reference dataset (analytics snapshot is rebuilt only when it changes)
+    DATASET_FILE = 'cardio_train (1).csv'
+    DATASET_CHECK_SECONDS = 1.0
+    
+    # Rolling prediction metrics: buckets kept per resolution (5 min, 3 h, 7 days)
+    METRICS_WINDOW_SLOTS = {'second': 300, 'minute': 180, 'hour': 168}
+    
+    # Live statistics stream (SSE). Each open stream holds a request thread while
+    # it waits, so run gunicorn with `-k gevent` or `-k gthread --threads N`
+    STREAM_MAX_RATE_HZ = 2.0
+    STREAM_HEARTBEAT_SECONDS = 15
+    STREAM_BACKLOG_FRAMES = 64
+    STREAM_MAX_SUBSCRIBERS = 200
+    STREAM_MAX_PREDICTIONS_PER_FRAME = 50
+    
+    # Cache-Control for ETag-versioned read endpoints (clients revalidate with If-None-Match)
+    CACHE_CONTROL_ANALYTICS = 'public, max-age=60'
+    CACHE_CONTROL_MODEL_INFO = 'public, max-age=5'
+    CACHE_CONTROL_PREDICTIONS = 'private, no-cache'
     
     # Logging settings
     LOG_LEVEL = 'INFO'
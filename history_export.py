@@ -0,0 +1,170 @@
+"""
+Prediction History Export
+Streams the history as CSV, NDJSON or Parquet: records are read from the
+store one chunk at a time and serialized as they go, so memory use does not
+depend on how much history there is
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+
+try:
+    import pyarrow as pa  # optional: pip install pyarrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+from prediction_db import COLUMNS
+
+# Every field of a history record, in PredictionRecord.to_dict() order
+EXPORT_FIELDS = ('id', 'prediction', 'has_disease') + tuple(name for name, _ in COLUMNS[2:])
+FIELD_TYPES = dict({name: kind.split()[0] for name, kind in COLUMNS}, has_disease='BOOLEAN')
+
+# ==================== READING ====================
+
+def id_bound(value, upper=False):
+    """
+    Prediction-ID bound for an ISO timestamp (IDs start with creation milliseconds)
+    
+    Lower bounds are exclusive cursors, so they sit just below the first ID
+    of that millisecond; upper bounds cover the whole millisecond.
+    """
+    try:
+        ms = int(datetime.fromisoformat(value).timestamp() * 1000)
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid timestamp: {value!r} (expected ISO 8601)')
+    return f'{ms:012x}ffffffff' if upper else f'{max(ms - 1, 0):012x}ffffffff'
+
+def iter_history(store, chunk_size=1000, after=None, last=None, fields=None):
+    """
+    History records oldest first, as lists of at most `chunk_size`
+    
+    Walks the store with `after=` cursors, so each chunk is one short
+    O(log n + chunk) read under the store lock rather than one long one.
+    Records added while the export runs are included; evicted ones are not,
+    so this covers only the in-memory window (HISTORY_MAX_SIZE records).
+    With the prediction database enabled, use iter_database instead.
+    
+    Args:
+        after: only records with a greater ID (see id_bound)
+        last: only records with an ID up to this one
+        fields: only these record keys, trimmed by the store (None = all)
+    """
+    if fields is not None and last is not None and 'id' not in fields:
+        fields = list(fields) + ['id']  # to cut the final chunk at `last`
+    cursor = after or '0' * 20  # below every real ID
+    while True:
+        page = store.page(chunk_size, after=cursor, fields=fields)
+        records = page['records'][::-1]
+        complete = not page['has_more']
+        if last is not None and records and page['newest_id'] > last:
+            records = [record for record in records if record['id'] <= last]
+            complete = True
+        if records:
+            yield records
+        if complete or not records:
+            return
+        cursor = page['newest_id']
+
+def iter_database(database, chunk_size=1000, after=None, last=None, fields=None):
+    """
+    Every stored record oldest first, as lists of at most `chunk_size`
+    
+    Like iter_history, but reads the prediction database with an ID keyset
+    cursor, so the export is not limited to the in-memory history window.
+    """
+    cursor = after or '0' * 20
+    while True:
+        records = database.page_after(cursor, chunk_size, last, fields)
+        if records:
+            yield records
+        if len(records) < chunk_size:
+            return
+        cursor = records[-1]['id']
+
+# ==================== FORMATS ====================
+
+def select_fields(fields, available=EXPORT_FIELDS):
+    """Validated field list from a comma-separated string (None = all)"""
+    if not fields:
+        return list(available)
+    selected = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in selected if name not in available]
+    if unknown or not selected:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown) or '(none)'}. "
+                         f"Available: {', '.join(available)}")
+    return selected
+
+def ndjson_stream(chunks, fields):
+    for records in chunks:
+        yield ''.join(
+            json.dumps({name: record.get(name) for name in fields}, separators=(',', ':')) + '\n'
+            for record in records
+        ).encode()
+
+def csv_stream(chunks, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for records in chunks:
+        writer.writerows([record.get(name) for name in fields] for record in records)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain"""
+    
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+def parquet_schema(fields):
+    types = {'INTEGER': pa.int64(), 'REAL': pa.float64(), 'TEXT': pa.string(), 'BOOLEAN': pa.bool_()}
+    return pa.schema([(name, types[FIELD_TYPES[name]]) for name in fields])
+
+def parquet_stream(chunks, fields):
+    """One Parquet row group per chunk, flushed to the client as it is written"""
+    schema = parquet_schema(fields)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for records in chunks:
+            columns = {name: [record.get(name) for record in records] for name in fields}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+# format -> (mimetype, file extension, stream function)
+FORMATS = {
+    'csv': ('text/csv', 'csv', csv_stream),
+    'ndjson': ('application/x-ndjson', 'ndjson', ndjson_stream),
+    'parquet': ('application/vnd.apache.parquet', 'parquet', parquet_stream)
+}
+
+def available_formats():
+    return [name for name in FORMATS if name != 'parquet' or pq is not None]
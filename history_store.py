@@ -0,0 +1,858 @@
+"""
+Prediction History Store
+Bounded in-memory history: at most MAX_PREDICTIONS_IN_MEMORY records, none
+older than PREDICTION_RETENTION_HOURS, evicted oldest-first in O(1), with a
+time-ordered index for cursor pagination
+"""
+
+import base64
+import binascii
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from itertools import islice, repeat
+
+import numpy as np
+
+# ==================== PREDICTION IDS ====================
+
+class SortableIdGenerator:
+    """
+    Monotonic, time-sortable prediction IDs
+    
+    20 hex chars: 48-bit milliseconds, 16-bit sequence within the millisecond
+    and a 16-bit per-process tag, so IDs from different workers do not
+    collide and string order is creation order.
+    """
+    
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.node = int.from_bytes(os.urandom(2), 'big')
+        self._last_ms = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+    
+    def _next(self):
+        ms = int(self.clock() * 1000)
+        if ms <= self._last_ms:
+            # Same millisecond, or the clock stepped back: keep counting up
+            ms = self._last_ms
+            self._seq += 1
+            if self._seq > 0xFFFF:
+                ms += 1
+                self._seq = 0
+        else:
+            self._seq = 0
+        self._last_ms = ms
+        return f'{ms:012x}{self._seq:04x}{self.node:04x}'
+    
+    def next_id(self):
+        with self._lock:
+            return self._next()
+    
+    def next_ids(self, count):
+        """`count` consecutive IDs under one lock acquisition"""
+        with self._lock:
+            return [self._next() for _ in range(count)]
+
+def encode_cursor(prediction_id):
+    """Opaque pagination cursor for a prediction ID"""
+    return base64.urlsafe_b64encode(prediction_id.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Prediction ID from a cursor; ValueError if it was not issued by us"""
+    try:
+        prediction_id = base64.b64decode(cursor + '=' * (-len(cursor) % 4), altchars=b'-_', validate=True).decode()
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError('Invalid cursor')
+    if not prediction_id:
+        raise ValueError('Invalid cursor')
+    return prediction_id
+
+# ==================== PROJECTION ====================
+
+# Keys of a history record, in PredictionRecord.to_dict() order
+RECORD_FIELDS = (
+    'id', 'prediction', 'has_disease', 'disease_probability', 'healthy_probability',
+    'risk_percentage', 'risk_level', 'color', 'age_days', 'age_years', 'gender',
+    'height', 'weight', 'bp_systolic', 'bp_diastolic', 'cholesterol', 'gluc',
+    'smoke', 'alco', 'active', 'patient_name', 'father_name', 'blood_group',
+    'phone_number', 'alt_phone_number', 'doctor_name', 'timestamp', 'status'
+)
+
+def project(records, fields=None, columnar=False):
+    """
+    Record dicts reshaped for a response
+    
+    `fields` keeps only those keys, in that order (None = all of them);
+    `columnar` returns {field: [value per record]} instead of a list of dicts.
+    """
+    if columnar:
+        return {name: [record.get(name) for record in records] for name in fields or RECORD_FIELDS}
+    if fields is None:
+        return records
+    return [{name: record.get(name) for name in fields} for record in records]
+
+# ==================== HISTORY STORE ====================
+
+class PredictionHistoryStore:
+    """
+    Insertion-ordered prediction history with size and age limits
+    
+    IDs are sortable, so `_order` is a sorted list of live IDs starting at
+    `_head`: evicting the oldest record just advances `_head` (the dead prefix
+    is trimmed now and then), and a cursor is located with a binary search.
+    
+    Every record stored, replaced or evicted takes the next sequence number
+    and goes into a bounded change log, so `changes()` can tell a client what
+    happened since its last sync without resending the whole history.
+    """
+    
+    backend = 'dict'
+    
+    def __init__(self, max_size=10000, retention_hours=24, clock=time.time, index=None, change_log_size=10000):
+        self.max_size = max_size
+        self.retention_seconds = retention_hours * 3600 if retention_hours else None
+        self.clock = clock
+        self._records = {}  # prediction_id -> (stored_at, record dict)
+        self._order = []  # prediction IDs, ascending; live from _head onwards
+        self._head = 0
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.evicted_by_size = 0
+        self.evicted_by_age = 0
+        self.index = index  # optional PredictionSearchIndex, kept in step with the records
+        self._sequence = 0  # last change number handed out
+        self._changes = deque(maxlen=change_log_size)  # (sequence, prediction ID), oldest first
+        self._cleared_at = 0  # sequence of the last clear; older cursors cannot be answered
+        self._log_id = os.urandom(4).hex()  # tells this store's sync cursors from a restarted one's
+    
+    def _log_change(self, prediction_id):
+        """Record that this ID was stored, replaced or evicted (caller holds the lock)"""
+        self._sequence += 1
+        self._changes.append((self._sequence, prediction_id))
+    
+    def _reset_changes(self):
+        """Forget the change log after a clear: every older cursor needs a reload"""
+        self._sequence += 1
+        self._changes.clear()
+        self._cleared_at = self._sequence
+    
+    def _sync_cursor(self, sequence):
+        return f'{self._log_id}.{sequence}'
+    
+    def _sync_position(self, cursor):
+        """Sequence number of a sync cursor issued by this store, else None"""
+        log_id, _, sequence = (cursor or '').partition('.')
+        if log_id != self._log_id or not sequence.isdigit():
+            return None
+        return int(sequence)
+    
+    def _evict_oldest(self):
+        """Drop the front record (caller holds the lock)"""
+        prediction_id = self._order[self._head]
+        self._log_change(prediction_id)
+        del self._records[prediction_id]
+        if self.index is not None:
+            self.index.remove(prediction_id)
+        self._head += 1
+        if self._head > 1024 and self._head * 2 > len(self._order):
+            del self._order[:self._head]
+            self._head = 0
+    
+    def _expire(self, now):
+        """Drop expired records from the front (caller holds the lock)"""
+        if self.retention_seconds is None:
+            return
+        cutoff = now - self.retention_seconds
+        expired = 0
+        while self._head < len(self._order):
+            stored_at, _ = self._records[self._order[self._head]]
+            if stored_at >= cutoff:
+                break
+            self._evict_oldest()
+            expired += 1
+        if expired:
+            self.evicted_by_age += expired
+            self._generation += 1
+    
+    def _insert(self, prediction_id, record, now):
+        """Store one record (caller holds the lock and has expired old ones)"""
+        self._log_change(prediction_id)
+        if prediction_id in self._records:
+            self._records[prediction_id] = (self._records[prediction_id][0], record)
+        else:
+            self._records[prediction_id] = (now, record)
+            if self._head == len(self._order) or prediction_id > self._order[-1]:
+                self._order.append(prediction_id)
+            else:
+                insort(self._order, prediction_id, lo=self._head)  # IDs from elsewhere
+        if self.index is not None:
+            self.index.add(prediction_id, record)
+        while len(self._records) > self.max_size:
+            self._evict_oldest()
+            self.evicted_by_size += 1
+    
+    def add(self, prediction_id, record):
+        """Store one record, evicting the oldest ones beyond the limits"""
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            self._insert(prediction_id, record, now)
+            self._generation += 1
+    
+    def add_batch(self, columns):
+        """
+        Store records given as parallel column arrays (one per record field, oldest first)
+        
+        One lock acquisition for the whole batch (batch predictions, snapshot
+        restore); returns how many records were stored.
+        """
+        names = list(columns)
+        values = [column.tolist() if hasattr(column, 'tolist') else column for column in columns.values()]
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            count = 0
+            for row in zip(*values):
+                record = dict(zip(names, row))
+                record['has_disease'] = bool(record['prediction'])
+                self._insert(record['id'], record, now)
+                count += 1
+            self._generation += 1
+        return count
+    
+    def get(self, prediction_id):
+        """Record dict or None if unknown or evicted"""
+        with self._lock:
+            self._expire(self.clock())
+            entry = self._records.get(prediction_id)
+        return entry[1] if entry is not None else None
+    
+    def __contains__(self, prediction_id):
+        return self.get(prediction_id) is not None
+    
+    def _count(self):
+        return len(self._records)
+    
+    def __len__(self):
+        with self._lock:
+            self._expire(self.clock())
+            return self._count()
+    
+    def values(self):
+        """All retained records, oldest first (a copy, safe to iterate)"""
+        with self._lock:
+            self._expire(self.clock())
+            return [self._records[pid][1] for pid in self._order[self._head:]]
+    
+    def recent(self, n):
+        """Newest n records, oldest first"""
+        with self._lock:
+            self._expire(self.clock())
+            start = max(self._head, len(self._order) - n)
+            return [self._records[pid][1] for pid in self._order[start:]]
+    
+    def page(self, limit, offset=0, before=None, after=None, fields=None, columnar=False):
+        """
+        One page of history, newest first, in O(limit + log n)
+        
+        Args:
+            limit: records per page
+            offset: skip this many of the newest records (ignored with cursors)
+            before: only records older than this prediction ID (scrolling back)
+            after: only records newer than this prediction ID (catching up)
+            fields: only these record keys (None = all)
+            columnar: records as {field: [values]} rather than a list of dicts
+        
+        Returns:
+            dict: {records, total, has_more, newest_id, oldest_id, sync_cursor}
+            (pass sync_cursor to changes() to follow the history from here)
+        """
+        with self._lock:
+            self._expire(self.clock())
+            lo, hi = self._head, len(self._order)
+            if after is not None:
+                # Oldest `limit` records newer than the cursor, so no record is skipped
+                start = bisect_right(self._order, after, lo, hi)
+                end = min(start + limit, hi)
+                has_more = end < hi
+            else:
+                end = bisect_left(self._order, before, lo, hi) if before is not None else hi - offset
+                end = max(end, lo)
+                start = max(end - limit, lo)
+                has_more = start > lo
+            ids = self._order[start:end]
+            records = self._get_many(reversed(ids), fields, columnar)
+            total = len(self._records)
+            sync_cursor = self._sync_cursor(self._sequence)
+        
+        return {
+            'records': records,
+            'total': total,
+            'has_more': has_more,
+            'newest_id': ids[-1] if ids else None,
+            'oldest_id': ids[0] if ids else None,
+            'sync_cursor': sync_cursor
+        }
+    
+    def _get_many(self, prediction_ids, fields=None, columnar=False):
+        """Records for IDs known to be live, projected (caller holds the lock)"""
+        return project([self._records[pid][1] for pid in prediction_ids], fields, columnar)
+    
+    def _is_live(self, prediction_id):
+        return prediction_id in self._records
+    
+    def changes(self, since, limit=1000, fields=None, columnar=False):
+        """
+        What changed after a sync cursor, in O(changes) rather than O(history)
+        
+        Args:
+            since: sync_cursor from page() or a previous changes() call
+            limit: at most this many changes per call (has_more says there are more)
+            fields, columnar: response shape, as for page()
+        
+        Returns:
+            dict: {records, removed, cursor, has_more, reset}. records are the
+            current versions of records stored or replaced since the cursor
+            (oldest change first), removed the IDs evicted since. reset means
+            the cursor cannot be answered (another server run, older than the
+            change log or a clear): reload with page() and continue from the
+            returned cursor.
+        """
+        with self._lock:
+            self._expire(self.clock())
+            current = self._sequence
+            position = self._sync_position(since)
+            floor = max(self._cleared_at, current - len(self._changes))
+            if position is None or not floor <= position <= current:
+                return {'records': project([], fields, columnar), 'removed': [], 'cursor': self._sync_cursor(current),
+                        'has_more': False, 'reset': True}
+            
+            # Sequence numbers are consecutive, so the unseen changes are the log's tail
+            pending = list(islice(reversed(self._changes), current - position))[::-1][:limit]
+            end = pending[-1][0] if pending else position
+            latest = dict.fromkeys(prediction_id for _, prediction_id in reversed(pending))
+            ordered = list(latest)[::-1]  # by each ID's last change
+            live = [prediction_id for prediction_id in ordered if self._is_live(prediction_id)]
+            removed = [prediction_id for prediction_id in ordered if not self._is_live(prediction_id)]
+            records = self._get_many(live, fields, columnar)
+        
+        return {
+            'records': records,
+            'removed': removed,
+            'cursor': self._sync_cursor(end),
+            'has_more': end < current,
+            'reset': False
+        }
+    
+    def search(self, criteria, limit, offset=0, fields=None, columnar=False):
+        """
+        Records matching every criterion, newest first, via the search index
+        
+        Args:
+            criteria: normalized criteria from search_index.parse_criteria
+            limit: records per page
+            offset: skip this many of the newest matches
+            fields, columnar: response shape, as for page()
+        
+        Returns:
+            dict: {records, total}
+        """
+        if self.index is None:
+            raise RuntimeError('History store was created without a search index')
+        with self._lock:
+            self._expire(self.clock())
+            ids, total = self.index.search(criteria, limit, offset)
+            records = self._get_many(ids, fields, columnar)
+        return {'records': records, 'total': total}
+    
+    def clear(self):
+        """Remove every record; returns how many were removed"""
+        with self._lock:
+            count = len(self._records)
+            self._records.clear()
+            self._order = []
+            self._head = 0
+            if self.index is not None:
+                self.index.clear()
+            self._reset_changes()
+            self._generation += 1
+        return count
+    
+    @property
+    def generation(self):
+        """Changes on every insert, eviction or clear"""
+        with self._lock:
+            self._expire(self.clock())
+            return self._generation
+    
+    def get_stats(self):
+        """Current size, limits and eviction counters"""
+        with self._lock:
+            self._expire(self.clock())
+            size = self._count()
+        return {
+            'backend': self.backend,
+            'size': size,
+            'max_size': self.max_size,
+            'retention_hours': self.retention_seconds / 3600 if self.retention_seconds else None,
+            'evicted_by_size': self.evicted_by_size,
+            'evicted_by_age': self.evicted_by_age,
+            'evicted_total': self.evicted_by_size + self.evicted_by_age,
+            'search_index': self.index.get_stats() if self.index is not None else None
+        }
+
+# ==================== COLUMNAR BACKEND ====================
+
+class StringPool:
+    """Interned strings with reference counts, so evicted values are released"""
+    
+    def __init__(self):
+        self.codes = {}  # string -> code
+        self.strings = [None]  # code -> string; code 0 is None
+        self.refs = [0]
+        self._free = []
+    
+    def acquire(self, value):
+        if value is None:
+            return 0
+        code = self.codes.get(value)
+        if code is None:
+            if self._free:
+                code = self._free.pop()
+                self.strings[code] = value
+                self.refs[code] = 0
+            else:
+                code = len(self.strings)
+                self.strings.append(value)
+                self.refs.append(0)
+            self.codes[value] = code
+        self.refs[code] += 1
+        return code
+    
+    def acquire_many(self, values):
+        """Codes for a list of values, one reference per occurrence"""
+        codes = {}
+        for value, count in Counter(values).items():
+            code = codes[value] = self.acquire(value)
+            if code:
+                self.refs[code] += count - 1
+        return [codes[value] for value in values]
+    
+    def available(self, values, max_code):
+        """Whether codes up to `max_code` suffice for these values on top of the ones held"""
+        new = {value for value in values if value is not None and value not in self.codes}
+        return len(new) <= len(self._free) + max_code + 1 - len(self.strings)
+    
+    def release(self, code):
+        if code == 0:
+            return
+        self.refs[code] -= 1
+        if self.refs[code] == 0:
+            del self.codes[self.strings[code]]
+            self.strings[code] = None
+            self._free.append(code)
+    
+    def __len__(self):
+        return len(self.codes)
+
+EPOCH = datetime(1970, 1, 1)
+
+def timestamp_to_micros(timestamp):
+    """Naive ISO timestamp -> integer microseconds (exact round trip)"""
+    return (datetime.fromisoformat(timestamp) - EPOCH) // timedelta(microseconds=1)
+
+def micros_to_timestamp(micros):
+    return (EPOCH + timedelta(microseconds=int(micros))).isoformat()
+
+class ColumnarHistoryStore(PredictionHistoryStore):
+    """
+    Same interface as PredictionHistoryStore, stored as a ring of NumPy columns
+    
+    Numeric fields live in typed arrays, repeated strings (risk level, doctor,
+    blood group...) as codes into reference-counted pools, free-form patient
+    details in object arrays. Dicts are only built for the records returned.
+    Prediction IDs must come from SortableIdGenerator and arrive in order;
+    records are ordered by (time key, node) like the ID strings, so workers
+    that share a millisecond and sequence still each keep theirs.
+    """
+    
+    backend = 'columnar'
+    
+    NUMERIC_COLUMNS = {
+        'prediction': np.int8,
+        'disease_probability': np.float64,
+        'healthy_probability': np.float64,
+        'age_days': np.int32,
+        'age_years': np.int16,
+        'gender': np.int8,
+        'cholesterol': np.int8,
+        'gluc': np.int8,
+        'smoke': np.int8,
+        'alco': np.int8,
+        'active': np.int8
+    }
+    # Measurements are nearly always whole numbers: int16, with the odd
+    # fractional value kept in a small side table keyed by (column, slot)
+    MEASURED_COLUMNS = ('height', 'weight', 'bp_systolic', 'bp_diastolic')
+    FRACTIONAL = np.iinfo(np.int16).min
+    # Interned strings; the code width bounds the number of distinct live values
+    # (blood group is free text, so it gets room for one per record)
+    POOLED_COLUMNS = {
+        'risk_level': np.uint8,
+        'color': np.uint8,
+        'blood_group': np.uint16,
+        'status': np.uint8,
+        'doctor_name': np.uint32
+    }
+    OBJECT_COLUMNS = ('patient_name', 'father_name', 'phone_number', 'alt_phone_number')
+    
+    def __init__(self, max_size=10000, retention_hours=24, clock=time.time, index=None, change_log_size=10000):
+        super().__init__(max_size, retention_hours, clock, index, change_log_size)
+        capacity = max_size
+        self._keys = np.zeros(capacity, dtype=np.uint64)  # ms << 16 | seq, ascending
+        self._nodes = np.zeros(capacity, dtype=np.uint16)  # ascending within equal keys
+        self._timestamps = np.zeros(capacity, dtype=np.int64)  # microseconds
+        self._risk = np.zeros(capacity, dtype=np.uint16)  # risk percentage in hundredths (RiskAssessor rounds to 2 places)
+        self._numeric = {name: np.zeros(capacity, dtype=dtype) for name, dtype in self.NUMERIC_COLUMNS.items()}
+        self._measured = {name: np.zeros(capacity, dtype=np.int16) for name in self.MEASURED_COLUMNS}
+        self._fractional = {}  # (column, slot) -> float
+        self._pooled = {name: np.zeros(capacity, dtype=dtype) for name, dtype in self.POOLED_COLUMNS.items()}
+        self._pools = {name: StringPool() for name in self.POOLED_COLUMNS}
+        self._objects = {name: np.full(capacity, None, dtype=object) for name in self.OBJECT_COLUMNS}
+        self._start = 0  # physical slot of the oldest record
+        self._size = 0
+        self.rejected_out_of_order = 0  # batch records not newer than the ones before them
+    
+    @staticmethod
+    def _split_id(prediction_id):
+        if len(prediction_id) != 20:
+            raise ValueError(f'Not a sortable prediction ID: {prediction_id}')
+        return int(prediction_id[:16], 16), int(prediction_id[16:], 16)
+    
+    def _count(self):
+        return self._size
+    
+    def _physical(self, logical):
+        return (self._start + logical) % self.max_size
+    
+    def _search(self, key, side):
+        """Logical position of `key` in the ring (both segments are sorted)"""
+        if self._size == 0:
+            return 0
+        end = self._start + self._size
+        if end <= self.max_size:
+            return int(np.searchsorted(self._keys[self._start:end], key, side))
+        first = self._keys[self._start:]
+        boundary = int(first[-1])
+        if key < boundary or (side == 'left' and key == boundary):
+            return int(np.searchsorted(first, key, side))
+        return len(first) + int(np.searchsorted(self._keys[:end - self.max_size], key, side))
+    
+    def _locate(self, key, node, side):
+        """Logical position of (key, node) in the ring: _search, with equal keys ordered by node"""
+        pos = self._search(np.uint64(key), 'left')
+        while pos < self._size:
+            slot = self._physical(pos)
+            if int(self._keys[slot]) != key:
+                break
+            slot_node = int(self._nodes[slot])
+            if slot_node > node or (side == 'left' and slot_node == node):
+                break
+            pos += 1
+        return pos
+    
+    def _find(self, prediction_id):
+        """Physical slot holding this ID, or None"""
+        try:
+            key, node = self._split_id(prediction_id)
+        except ValueError:
+            return None
+        pos = self._locate(key, node, 'left')
+        if pos >= self._size:
+            return None
+        slot = self._physical(pos)
+        if int(self._keys[slot]) != key or int(self._nodes[slot]) != node:
+            return None
+        return slot
+    
+    def _newest(self):
+        """(key, node) of the newest record (caller checks the ring is not empty)"""
+        slot = self._physical(self._size - 1)
+        return int(self._keys[slot]), int(self._nodes[slot])
+    
+    def _slot_id(self, slot):
+        return f'{int(self._keys[slot]):016x}{int(self._nodes[slot]):04x}'
+    
+    def _release(self, slot):
+        if self.index is not None:
+            self.index.remove(self._slot_id(slot))
+        for name, pool in self._pools.items():
+            pool.release(int(self._pooled[name][slot]))
+        if self._fractional:
+            for name in self.MEASURED_COLUMNS:
+                self._fractional.pop((name, slot), None)
+        for column in self._objects.values():
+            column[slot] = None
+    
+    def _evict_oldest(self):
+        self._log_change(self._slot_id(self._start))
+        self._release(self._start)
+        self._start = (self._start + 1) % self.max_size
+        self._size -= 1
+    
+    def _expire(self, now):
+        if self.retention_seconds is None or self._size == 0:
+            return
+        # The millisecond creation time is the high part of the ID key
+        cutoff_key = int((now - self.retention_seconds) * 1000) << 16
+        expired = self._search(np.uint64(max(cutoff_key, 0)), 'left')
+        for _ in range(expired):
+            self._evict_oldest()
+        if expired:
+            self.evicted_by_age += expired
+            self._generation += 1
+    
+    def _check_pools(self, values):
+        """ValueError if the new strings in `values` ({column: values}) would not fit their code width"""
+        for name, column in self._pooled.items():
+            if not self._pools[name].available(values[name], int(np.iinfo(column.dtype).max)):
+                raise ValueError(f'Too many distinct {name} values for the columnar history')
+    
+    def _write(self, slot, key, node, record):
+        self._keys[slot] = key
+        self._nodes[slot] = node
+        self._timestamps[slot] = timestamp_to_micros(record['timestamp'])
+        self._risk[slot] = round(record['risk_percentage'] * 100)
+        for name, column in self._numeric.items():
+            column[slot] = record[name]
+        for name, column in self._measured.items():
+            value = record[name]
+            if float(value).is_integer() and self.FRACTIONAL < value <= np.iinfo(np.int16).max:
+                column[slot] = value
+            else:
+                column[slot] = self.FRACTIONAL
+                self._fractional[(name, slot)] = value
+        for name, column in self._pooled.items():
+            column[slot] = self._pools[name].acquire(record.get(name))
+        for name, column in self._objects.items():
+            column[slot] = record.get(name)
+    
+    def add(self, prediction_id, record):
+        """Store one record, evicting the oldest ones beyond the limits"""
+        key, node = self._split_id(prediction_id)
+        with self._lock:
+            # Before anything is evicted or released, so a rejected record changes nothing
+            self._check_pools({name: (record.get(name),) for name in self._pooled})
+            self._expire(self.clock())
+            existing = self._find(prediction_id)
+            if existing is not None:
+                self._release(existing)
+                self._write(existing, key, node, record)
+            else:
+                if self._size and (key, node) <= self._newest():
+                    raise ValueError('Prediction IDs must be added in increasing order')
+                if self._size == self.max_size:
+                    self._evict_oldest()
+                    self.evicted_by_size += 1
+                self._write(self._physical(self._size), key, node, record)
+                self._size += 1
+            if self.index is not None:
+                self.index.add(prediction_id, record)
+            self._log_change(prediction_id)
+            self._generation += 1
+    
+    def add_batch(self, columns):
+        """
+        Vectorized add_batch: the column arrays are written into the ring as they are
+        
+        No record dicts are built (except for the search index). IDs that are not
+        sortable or not newer than the ones before them are skipped (counted in
+        rejected_out_of_order). Raises ValueError, with nothing changed, if the
+        strings do not fit the pooled columns.
+        """
+        ids = [value if isinstance(value, str) and len(value) == 20 else None for value in
+               (columns['id'].tolist() if hasattr(columns['id'], 'tolist') else columns['id'])]
+        sortable = np.array([value is not None for value in ids], dtype=bool)
+        keys = np.array([int(value[:16], 16) for value in ids if value is not None], dtype=np.uint64)
+        nodes = np.array([int(value[16:], 16) for value in ids if value is not None], dtype=np.uint16)
+        columns = {name: np.asarray(column)[sortable] for name, column in columns.items()}
+        
+        with self._lock:
+            self._expire(self.clock())
+            # (key, node) must be strictly increasing, as in add(): rank the pairs in ID order
+            pairs = np.empty(len(keys), dtype=[('key', np.uint64), ('node', np.uint16)])
+            pairs['key'], pairs['node'] = keys, nodes
+            ranks = np.unique(pairs, return_inverse=True)[1].reshape(-1)
+            increasing = np.ones(len(keys), dtype=bool)
+            increasing[1:] = ranks[1:] > np.maximum.accumulate(ranks)[:-1]
+            if self._size:
+                newest_key, newest_node = self._newest()
+                increasing &= (keys > np.uint64(newest_key)) | ((keys == np.uint64(newest_key)) & (nodes > newest_node))
+            self.rejected_out_of_order += len(keys) - int(np.count_nonzero(increasing))
+            keep = np.flatnonzero(increasing)[-self.max_size:]
+            self.evicted_by_size += int(np.count_nonzero(increasing)) - len(keep)
+            keys, nodes = keys[keep], nodes[keep]
+            columns = {name: column[keep] for name, column in columns.items()}
+            n = len(keys)
+            if n == 0:
+                return 0
+            
+            # Everything that can fail, before the ring is touched
+            timestamps = np.array(columns['timestamp'].tolist(), dtype='datetime64[us]').astype(np.int64)
+            strings = {name: columns[name].tolist() for name in self._pooled}
+            self._check_pools(strings)
+            
+            for _ in range(self._size + n - self.max_size):
+                self._evict_oldest()
+                self.evicted_by_size += 1
+            slots = (self._start + self._size + np.arange(n)) % self.max_size
+            self._keys[slots] = keys
+            self._nodes[slots] = nodes
+            self._timestamps[slots] = timestamps
+            self._risk[slots] = np.round(columns['risk_percentage'].astype(np.float64) * 100)
+            for name, column in self._numeric.items():
+                column[slots] = columns[name]
+            for name, column in self._measured.items():
+                values = columns[name].astype(np.float64)
+                whole = (values == np.floor(values)) & (values > self.FRACTIONAL) & (values <= np.iinfo(np.int16).max)
+                column[slots] = np.where(whole, values, self.FRACTIONAL)
+                for position in np.flatnonzero(~whole).tolist():
+                    self._fractional[(name, int(slots[position]))] = values[position].item()
+            for name, column in self._pooled.items():
+                column[slots] = self._pools[name].acquire_many(strings[name])
+            for name, column in self._objects.items():
+                column[slots] = columns[name].tolist()
+            self._size += n
+            for prediction_id in columns['id'].tolist():
+                self._log_change(prediction_id)
+            if self.index is not None:
+                names = list(columns)
+                for row in zip(*(column.tolist() for column in columns.values())):
+                    record = dict(zip(names, row))
+                    self.index.add(record['id'], record)
+            self._generation += 1
+        return n
+    
+    def _columns(self, slots, fields=None):
+        """
+        {field: [values]} for these slots, reading only the requested columns
+        
+        Values match PredictionRecord.to_dict(); `fields` defaults to all of
+        them, in to_dict() order.
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        columns = {}
+        for name in fields or RECORD_FIELDS:
+            if name == 'id':
+                values = [f'{key:016x}{node:04x}' for key, node in zip(self._keys[slots].tolist(), self._nodes[slots].tolist())]
+            elif name == 'has_disease':
+                values = [bool(value) for value in self._numeric['prediction'][slots].tolist()]
+            elif name == 'risk_percentage':
+                values = [value / 100 for value in self._risk[slots].tolist()]
+            elif name == 'timestamp':
+                values = [micros_to_timestamp(value) for value in self._timestamps[slots].tolist()]
+            elif name in self._numeric:
+                values = self._numeric[name][slots].tolist()
+            elif name in self._measured:
+                values = self._measured[name][slots].tolist()
+                if self._fractional:
+                    values = [
+                        self._fractional[(name, slot)] if value == self.FRACTIONAL else value
+                        for value, slot in zip(values, slots.tolist())
+                    ]
+            elif name in self._pooled:
+                strings = self._pools[name].strings
+                values = [strings[code] for code in self._pooled[name][slots].tolist()]
+            else:
+                values = self._objects[name][slots].tolist()
+            columns[name] = values
+        return columns
+    
+    def _materialize(self, slots, fields=None):
+        """Build record dicts (same shape as PredictionRecord.to_dict, or just `fields`) for these slots"""
+        columns = self._columns(slots, fields)
+        return list(map(dict, map(zip, repeat(tuple(columns)), zip(*columns.values()))))
+    
+    def _logical_range(self, start, end):
+        return (self._start + np.arange(start, end)) % self.max_size
+    
+    def get(self, prediction_id):
+        with self._lock:
+            self._expire(self.clock())
+            slot = self._find(prediction_id)
+            return self._materialize([slot])[0] if slot is not None else None
+    
+    def values(self):
+        with self._lock:
+            self._expire(self.clock())
+            return self._materialize(self._logical_range(0, self._size))
+    
+    def recent(self, n):
+        with self._lock:
+            self._expire(self.clock())
+            return self._materialize(self._logical_range(max(0, self._size - n), self._size))
+    
+    def page(self, limit, offset=0, before=None, after=None, fields=None, columnar=False):
+        with self._lock:
+            self._expire(self.clock())
+            size = self._size
+            if after is not None:
+                start = self._locate(*self._split_id(after), 'right')
+                end = min(start + limit, size)
+                has_more = end < size
+            else:
+                end = self._locate(*self._split_id(before), 'left') if before is not None else size - offset
+                end = max(end, 0)
+                start = max(end - limit, 0)
+                has_more = start > 0
+            slots = self._logical_range(start, end)[::-1]
+            records = self._columns(slots, fields) if columnar else self._materialize(slots, fields)
+            newest_id = self._slot_id(slots[0]) if len(slots) else None
+            oldest_id = self._slot_id(slots[-1]) if len(slots) else None
+            sync_cursor = self._sync_cursor(self._sequence)
+        
+        return {
+            'records': records,
+            'total': size,
+            'has_more': has_more,
+            'newest_id': newest_id,
+            'oldest_id': oldest_id,
+            'sync_cursor': sync_cursor
+        }
+    
+    def _get_many(self, prediction_ids, fields=None, columnar=False):
+        slots = [self._find(pid) for pid in prediction_ids]
+        return self._columns(slots, fields) if columnar else self._materialize(slots, fields)
+    
+    def _is_live(self, prediction_id):
+        return self._find(prediction_id) is not None
+    
+    def clear(self):
+        with self._lock:
+            if self.index is not None:
+                self.index.clear()
+            count = self._size
+            for _ in range(count):
+                self._evict_oldest()
+            self._start = 0
+            self._reset_changes()
+            self._generation += 1
+        return count
+    
+    def get_stats(self):
+        stats = super().get_stats()
+        stats['interned_strings'] = {name: len(pool) for name, pool in self._pools.items()}
+        stats['rejected_out_of_order'] = self.rejected_out_of_order
+        return stats
+
+def create_history_store(backend='columnar', **kwargs):
+    """History store for Config.HISTORY_BACKEND"""
+    stores = {'dict': PredictionHistoryStore, 'columnar': ColumnarHistoryStore}
+    if backend not in stores:
+        raise ValueError(f"Unknown history backend: {backend} (expected {', '.join(stores)})")
+    return stores[backend](**kwargs)
@@ -0,0 +1,232 @@
+"""
+Live Statistics Stream
+Server-Sent Events broadcaster that coalesces prediction updates into
+rate-limited frames, serialized once and shared by every subscriber
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+# ==================== SSE HELPERS ====================
+
+def format_event(event, data, event_id=None):
+    """Encode one SSE message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+# ==================== BROADCASTER ====================
+
+class StatsBroadcaster:
+    """
+    Fan out prediction deltas to many SSE subscribers
+    
+    Publishers only bump counters; a single flusher thread turns pending
+    changes into at most `max_rate_hz` frames per second. Subscribers block
+    on one shared Condition and replay frames from a short backlog, so a
+    slow client never costs more than one wake-up per frame.
+    """
+    
+    DELTA_FIELDS = ('predictions', 'disease', 'low_risk', 'moderate_risk', 'high_risk')
+    RISK_FIELDS = {'Low Risk': 'low_risk', 'Moderate Risk': 'moderate_risk', 'High Risk': 'high_risk'}
+    
+    def __init__(self, snapshot_fn, max_rate_hz=2.0, heartbeat_seconds=15, backlog=64,
+                 max_subscribers=200, max_predictions_per_frame=50):
+        self.snapshot_fn = snapshot_fn  # returns current totals, must be cheap
+        self.interval = 1.0 / max_rate_hz if max_rate_hz > 0 else 0.0
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_subscribers = max_subscribers
+        self.max_predictions_per_frame = max_predictions_per_frame
+        self.logger = logging.getLogger('cardio_stream')
+        
+        self._cond = threading.Condition()
+        self._frames = deque(maxlen=backlog)  # (seq, encoded frame)
+        self._seq = 0
+        self._reset_pending()
+        self._dirty = threading.Event()
+        self._flusher = None
+        
+        self.subscribers = 0
+        self.peak_subscribers = 0
+        self.rejected = 0
+        self.resyncs = 0
+        self.events_published = 0
+        self.frames_sent = 0
+    
+    def _reset_pending(self):
+        self._pending = {field: 0 for field in self.DELTA_FIELDS}
+        self._pending_predictions = []
+        self._pending_reset = False
+    
+    def _ensure_flusher(self):
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_loop, name='stats-stream', daemon=True)
+            self._flusher.start()
+    
+    # ---------- publishing ----------
+    
+    def publish_prediction(self, summary):
+        """Queue one prediction summary (no patient details) for the next frame"""
+        with self._cond:
+            self._pending['predictions'] += 1
+            if summary.get('has_disease'):
+                self._pending['disease'] += 1
+            risk_field = self.RISK_FIELDS.get(summary.get('risk_level'))
+            if risk_field:
+                self._pending[risk_field] += 1
+            if len(self._pending_predictions) < self.max_predictions_per_frame:
+                self._pending_predictions.append(summary)
+            self.events_published += 1
+            self._ensure_flusher()
+        self._dirty.set()
+    
+    def publish_reset(self):
+        """Tell subscribers the history was cleared"""
+        with self._cond:
+            self._reset_pending()
+            self._pending_reset = True
+            self._ensure_flusher()
+        self._dirty.set()
+    
+    def _flush_loop(self):
+        while True:
+            self._dirty.wait()
+            # Coalescing window: everything published meanwhile joins this frame
+            time.sleep(self.interval)
+            self._dirty.clear()
+            self.flush()
+    
+    def flush(self):
+        """Turn pending changes into one frame and wake every subscriber"""
+        with self._cond:
+            if not self._pending_reset and not self._pending['predictions']:
+                return
+            payload = {
+                'seq': self._seq + 1,
+                'reset': self._pending_reset,
+                'delta': self._pending,
+                'predictions': self._pending_predictions,
+                'totals': self.snapshot_fn()
+            }
+            self._seq += 1
+            self._frames.append((self._seq, format_event('stats', payload, self._seq)))
+            self._reset_pending()
+            self._cond.notify_all()
+    
+    # ---------- subscribing ----------
+    
+    def subscribe(self, last_event_id=None):
+        """
+        Register a subscriber
+        
+        Returns:
+            Subscription (an iterator of encoded SSE frames), or None when at capacity
+        """
+        # The slot is taken here, not on first iteration, so concurrent connects can't overshoot
+        with self._cond:
+            if self.subscribers >= self.max_subscribers:
+                self.rejected += 1
+                return None
+            self.subscribers += 1
+            self.peak_subscribers = max(self.peak_subscribers, self.subscribers)
+        
+        try:
+            cursor = int(last_event_id)
+        except (TypeError, ValueError):
+            cursor = None
+        return Subscription(self, cursor)
+    
+    def _release(self):
+        with self._cond:
+            self.subscribers -= 1
+    
+    def _snapshot_frame(self):
+        with self._cond:
+            seq = self._seq
+        return seq, format_event('snapshot', {'seq': seq, 'totals': self.snapshot_fn()}, seq)
+    
+    def _stream(self, cursor, release):
+        try:
+            yield f'retry: {int(self.heartbeat_seconds * 1000)}\n\n'.encode('utf-8')
+            
+            # Fresh clients (or ones too far behind to replay) start from a snapshot
+            with self._cond:
+                can_replay = cursor is not None and cursor <= self._seq and (
+                    cursor == self._seq or (self._frames and self._frames[0][0] <= cursor + 1))
+            if not can_replay:
+                cursor, frame = self._snapshot_frame()
+                yield frame
+            
+            while True:
+                with self._cond:
+                    if self._seq == cursor:
+                        self._cond.wait(self.heartbeat_seconds)
+                    seq = self._seq
+                    behind = bool(self._frames) and self._frames[0][0] > cursor + 1
+                    frames = [] if behind else [frame for s, frame in self._frames if s > cursor]
+                
+                if seq == cursor:
+                    # Keeps proxies from closing the connection and detects dead clients
+                    yield b': keepalive\n\n'
+                    continue
+                
+                if behind:
+                    self.resyncs += 1
+                    cursor, frame = self._snapshot_frame()
+                    yield frame
+                    continue
+                
+                self.frames_sent += len(frames)
+                cursor = seq
+                yield b''.join(frames)
+        finally:
+            release()
+    
+    def get_stats(self):
+        """Subscriber count and frame counters"""
+        return {
+            'subscribers': self.subscribers,
+            'peak_subscribers': self.peak_subscribers,
+            'max_subscribers': self.max_subscribers,
+            'rejected_subscribers': self.rejected,
+            'events_published': self.events_published,
+            'frames_published': self._seq,
+            'frames_sent': self.frames_sent,
+            'resyncs': self.resyncs,
+            'max_rate_hz': round(1.0 / self.interval, 2) if self.interval else None
+        }
+
+class Subscription:
+    """
+    One subscriber's frame iterator, holding its slot until exhausted or closed
+    
+    A plain generator closed before its first `next()` never runs its
+    `finally`, so the slot is released here as well (once).
+    """
+    
+    def __init__(self, broadcaster, cursor):
+        self._broadcaster = broadcaster
+        self._released = False
+        self._frames = broadcaster._stream(cursor, self._release)
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        return next(self._frames)
+    
+    def _release(self):
+        if not self._released:
+            self._released = True
+            self._broadcaster._release()
+    
+    def close(self):
+        """Called by the WSGI server when the response ends (or the client goes away)"""
+        self._frames.close()
+        self._release()
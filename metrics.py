@@ -0,0 +1,119 @@
+"""
+Rolling Prediction Metrics
+Per-second, per-minute and per-hour ring buffers of prediction counters,
+updated on every prediction in fixed memory regardless of traffic
+"""
+
+import threading
+import time
+
+# ==================== RING BUFFER ====================
+
+class RollingWindow:
+    """
+    Fixed-size ring of time buckets of `resolution` seconds each
+    A slot is reset lazily when the clock wraps around to it again
+    """
+    
+    FIELDS = ('count', 'disease', 'low_risk', 'moderate_risk', 'high_risk', 'latency_ms_sum')
+    
+    def __init__(self, resolution, slots):
+        self.resolution = resolution
+        self.slots = slots
+        self.epochs = [-1] * slots  # which bucket number each slot currently holds
+        self.values = {field: [0] * slots for field in self.FIELDS}
+    
+    def _slot(self, bucket):
+        slot = bucket % self.slots
+        if self.epochs[slot] != bucket:
+            self.epochs[slot] = bucket
+            for column in self.values.values():
+                column[slot] = 0
+        return slot
+    
+    def add(self, timestamp, increments):
+        """Add counters to the bucket holding `timestamp`"""
+        slot = self._slot(int(timestamp // self.resolution))
+        for field, amount in increments.items():
+            self.values[field][slot] += amount
+    
+    def series(self, windows, now):
+        """
+        Last `windows` buckets up to and including the current one, oldest first
+        Buckets with no predictions (or already overwritten) come back as zeros
+        """
+        windows = max(1, min(windows, self.slots))
+        current = int(now // self.resolution)
+        result = []
+        for bucket in range(current - windows + 1, current + 1):
+            slot = bucket % self.slots
+            live = self.epochs[slot] == bucket
+            row = {'start': bucket * self.resolution}
+            for field in self.FIELDS:
+                row[field] = self.values[field][slot] if live else 0
+            result.append(row)
+        return result
+
+# ==================== PREDICTION METRICS ====================
+
+class PredictionMetrics:
+    """Prediction volume, risk mix and latency at several time resolutions"""
+    
+    RESOLUTIONS = {'second': 1, 'minute': 60, 'hour': 3600}
+    RISK_FIELDS = {'Low Risk': 'low_risk', 'Moderate Risk': 'moderate_risk', 'High Risk': 'high_risk'}
+    
+    def __init__(self, slots=None):
+        # resolution name -> number of buckets kept (default: 5 min, 3 h, 7 days)
+        slots = slots or {'second': 300, 'minute': 180, 'hour': 168}
+        self.windows = {
+            name: RollingWindow(self.RESOLUTIONS[name], count)
+            for name, count in slots.items()
+        }
+        self._lock = threading.Lock()
+    
+    def record(self, risk_level, has_disease, latency_ms=0.0, timestamp=None):
+        """Count one prediction in every resolution"""
+        timestamp = time.time() if timestamp is None else timestamp
+        increments = {'count': 1, 'latency_ms_sum': latency_ms}
+        if has_disease:
+            increments['disease'] = 1
+        risk_field = self.RISK_FIELDS.get(risk_level)
+        if risk_field:
+            increments[risk_field] = 1
+        
+        with self._lock:
+            for window in self.windows.values():
+                window.add(timestamp, increments)
+    
+    def get_series(self, resolution='minute', windows=60, now=None):
+        """
+        Last N windows at one resolution, with per-window averages
+        
+        Returns:
+            dict: {resolution, window_seconds, windows, totals}
+        """
+        if resolution not in self.windows:
+            raise ValueError(f"resolution must be one of {', '.join(self.windows)}")
+        window = self.windows[resolution]
+        now = time.time() if now is None else now
+        
+        with self._lock:
+            rows = window.series(windows, now)
+        
+        totals = {field: 0 for field in RollingWindow.FIELDS}
+        for row in rows:
+            for field in RollingWindow.FIELDS:
+                totals[field] += row[field]
+            latency_sum = row.pop('latency_ms_sum')
+            row['avg_latency_ms'] = round(latency_sum / row['count'], 3) if row['count'] else None
+            row['disease_rate'] = round(row['disease'] / row['count'] * 100, 2) if row['count'] else None
+        
+        latency_sum = totals.pop('latency_ms_sum')
+        totals['avg_latency_ms'] = round(latency_sum / totals['count'], 3) if totals['count'] else None
+        return {
+            'resolution': resolution,
+            'window_seconds': window.resolution,
+            'max_windows': window.slots,
+            'windows': rows,
+            'totals': totals
+        }
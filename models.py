@@ -2,6 +2,8 @@
 
 from datetime import datetime
 
+import numpy as np
+
 class PredictionRecord:
     """
     Prediction record model
@@ -75,12 +77,161 @@ class PredictionRecord:
             'status': self.status
         }
 
+class StreamingMetric:
+    """
+    Running min/max/sum/count plus a fixed-bin histogram for one numeric field
+    Constant memory and O(1) updates; two metrics with the same bins can be merged
+    """
+    
+    def __init__(self, low, high, bin_width):
+        self.low = low
+        self.high = high
+        self.bin_width = bin_width
+        self.bins = [0] * int(round((high - low) / bin_width))
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = None
+        self.max = None
+    
+    def _bin_index(self, value):
+        index = int((value - self.low) // self.bin_width)
+        # Out-of-range values land in the edge bins; min/max stay exact
+        return min(max(index, 0), len(self.bins) - 1)
+    
+    def add(self, value):
+        """Record one observation"""
+        if value is None:
+            return
+        value = float(value)
+        self.count += 1
+        self.total += value
+        self.total_sq += value * value
+        self.min = value if self.min is None or value < self.min else self.min
+        self.max = value if self.max is None or value > self.max else self.max
+        self.bins[self._bin_index(value)] += 1
+    
+    def add_many(self, values):
+        """Record a batch of observations at once (None/NaN are skipped)"""
+        values = np.array(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.total_sq += float(np.dot(values, values))
+        low, high = float(values.min()), float(values.max())
+        self.min = low if self.min is None or low < self.min else self.min
+        self.max = high if self.max is None or high > self.max else self.max
+        indices = np.clip((values - self.low) // self.bin_width, 0, len(self.bins) - 1).astype(np.int64)
+        counts = np.bincount(indices, minlength=len(self.bins))
+        self.bins = [a + b for a, b in zip(self.bins, counts.tolist())]
+    
+    def merge(self, other):
+        """Fold another metric with identical bins into this one"""
+        if (other.low, other.high, other.bin_width) != (self.low, self.high, self.bin_width):
+            raise ValueError('Cannot merge metrics with different bins')
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        self.bins = [a + b for a, b in zip(self.bins, other.bins)]
+        return self
+    
+    def copy(self):
+        metric = StreamingMetric.__new__(StreamingMetric)
+        metric.__dict__.update(self.__dict__)
+        metric.bins = list(self.bins)
+        return metric
+    
+    def to_state(self):
+        """Plain-data copy of the running values (JSON-serializable)"""
+        return {'count': self.count, 'total': self.total, 'total_sq': self.total_sq,
+                'min': self.min, 'max': self.max, 'bins': list(self.bins)}
+    
+    def load_state(self, state):
+        """Restore the values saved by to_state()"""
+        if len(state['bins']) != len(self.bins):
+            raise ValueError('Saved metric has different bins')
+        self.count = state['count']
+        self.total = state['total']
+        self.total_sq = state['total_sq']
+        self.min = state['min']
+        self.max = state['max']
+        self.bins = list(state['bins'])
+    
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+    
+    @property
+    def std(self):
+        if self.count < 2:
+            return 0.0 if self.count else None
+        variance = (self.total_sq - self.total * self.total / self.count) / (self.count - 1)
+        return max(variance, 0.0) ** 0.5
+    
+    def quantile(self, q):
+        """
+        Approximate quantile (0-1) by interpolating inside the histogram bin
+        Error is bounded by the bin width
+        """
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for index, bin_count in enumerate(self.bins):
+            if bin_count and cumulative + bin_count >= target:
+                bin_low = self.low + index * self.bin_width
+                value = bin_low + (target - cumulative) / bin_count * self.bin_width
+                return min(max(value, self.min), self.max)
+            cumulative += bin_count
+        return self.max
+    
+    def histogram(self):
+        """Non-empty bins as parallel lists of lower edges and counts"""
+        edges, counts = [], []
+        for index, bin_count in enumerate(self.bins):
+            if bin_count:
+                edges.append(round(self.low + index * self.bin_width, 4))
+                counts.append(bin_count)
+        return {'bin_width': self.bin_width, 'edges': edges, 'counts': counts}
+    
+    def summary(self, percentiles=(25, 50, 75, 90, 95, 99), include_histogram=False):
+        """Min, max, average, std and requested percentiles"""
+        if not self.count:
+            return {'count': 0}
+        result = {
+            'count': self.count,
+            'min': round(self.min, 2),
+            'max': round(self.max, 2),
+            'average': round(self.mean, 2),
+            'std': round(self.std, 2),
+            'percentiles': {f'p{p:g}': round(self.quantile(p / 100), 2) for p in percentiles}
+        }
+        if include_histogram:
+            result['histogram'] = self.histogram()
+        return result
 
 class StatisticsRecord:
     """
     Statistics record for tracking prediction stats
     """
     
+    # field -> (low, high, bin_width) of its streaming histogram
+    METRIC_BINS = {
+        'risk_percentage': (0, 100, 0.5),
+        'age_years': (0, 120, 1),
+        'weight': (0, 300, 0.5),
+        'bp_systolic': (0, 300, 1),
+        'bp_diastolic': (0, 200, 1)
+    }
+    
+    COUNTERS = ('total_predictions', 'total_high_risk', 'total_moderate_risk',
+                'total_low_risk', 'total_disease', 'total_healthy')
+    
     def __init__(self):
         self.total_predictions = 0
         self.total_high_risk = 0
@@ -88,7 +239,9 @@ class StatisticsRecord:
         self.total_low_risk = 0
         self.total_disease = 0
         self.total_healthy = 0
-        self.predictions = []
+        # Aggregates only: the records themselves live in the bounded history store,
+        # so these totals keep counting predictions that have since been evicted
+        self.metrics = {name: StreamingMetric(*bins) for name, bins in self.METRIC_BINS.items()}
     
     def add_prediction(self, prediction_record):
         """Add prediction to statistics"""
@@ -106,7 +259,68 @@ class StatisticsRecord:
         else:
             self.total_healthy += 1
         
-        self.predictions.append(prediction_record)
+        for name, metric in self.metrics.items():
+            metric.add(getattr(prediction_record, name))
+    
+    def add_batch(self, columns):
+        """
+        Add a batch of predictions given as column arrays
+        
+        Needs 'risk_percentage', 'prediction' and the METRIC_BINS fields;
+        counts the same as add_prediction() once per row.
+        """
+        risk = np.asarray(columns['risk_percentage'], dtype=np.float64)
+        high = int(np.count_nonzero(risk >= 60))
+        moderate = int(np.count_nonzero((risk >= 30) & (risk < 60)))
+        disease = int(np.count_nonzero(np.asarray(columns['prediction']) == 1))
+        self.total_predictions += len(risk)
+        self.total_high_risk += high
+        self.total_moderate_risk += moderate
+        self.total_low_risk += len(risk) - high - moderate
+        self.total_disease += disease
+        self.total_healthy += len(risk) - disease
+        for name, metric in self.metrics.items():
+            metric.add_many(columns[name])
+    
+    def reset(self):
+        """Back to an empty record (in place, so every reference sees it)"""
+        self.__init__()
+    
+    def merge(self, other):
+        """Fold the counters and sketches of another record into this one"""
+        self.total_predictions += other.total_predictions
+        self.total_high_risk += other.total_high_risk
+        self.total_moderate_risk += other.total_moderate_risk
+        self.total_low_risk += other.total_low_risk
+        self.total_disease += other.total_disease
+        self.total_healthy += other.total_healthy
+        for name, metric in self.metrics.items():
+            metric.merge(other.metrics[name])
+        return self
+    
+    def copy(self):
+        """Independent copy, e.g. a frozen view for readers"""
+        record = StatisticsRecord.__new__(StatisticsRecord)
+        for name in self.COUNTERS:
+            setattr(record, name, getattr(self, name))
+        record.metrics = {name: metric.copy() for name, metric in self.metrics.items()}
+        return record
+    
+    def to_state(self):
+        """Plain-data copy of the counters and sketches (JSON-serializable)"""
+        state = {name: getattr(self, name) for name in self.COUNTERS}
+        state['metrics'] = {name: metric.to_state() for name, metric in self.metrics.items()}
+        return state
+    
+    @classmethod
+    def from_state(cls, state):
+        """Record rebuilt from to_state() output"""
+        record = cls()
+        for name in cls.COUNTERS:
+            setattr(record, name, state[name])
+        for name, metric in record.metrics.items():
+            metric.load_state(state['metrics'][name])
+        return record
     
     def get_summary(self):
         """Get statistics summary"""
@@ -123,7 +337,13 @@ class StatisticsRecord:
                 'percentage': round((self.total_disease / self.total_predictions * 100), 2) if self.total_predictions > 0 else 0
             }
         }
-
+    
+    def get_metric_summaries(self, percentiles=(25, 50, 75, 90, 95, 99), include_histogram=False):
+        """Per-field min/max/average/percentiles, independent of the number of predictions"""
+        return {
+            name: metric.summary(percentiles, include_histogram)
+            for name, metric in self.metrics.items()
+        }
 
 # SQLAlchemy model template (for future database migration)
 """
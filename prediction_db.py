@@ -0,0 +1,363 @@
+"""
+Persistent Prediction Store
+SQLite (WAL mode) copy of every prediction, written behind the request path:
+/api/predict only enqueues, a background writer commits batches
+"""
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from search_index import normalize_blood_group, normalize_phone, normalize_risk_level, normalize_text
+
+# ==================== SCHEMA ====================
+
+# Same fields as PredictionRecord.to_dict() (has_disease is derived from prediction)
+COLUMNS = (
+    ('id', 'TEXT PRIMARY KEY'),
+    ('prediction', 'INTEGER'),
+    ('disease_probability', 'REAL'),
+    ('healthy_probability', 'REAL'),
+    ('risk_percentage', 'REAL'),
+    ('risk_level', 'TEXT'),
+    ('color', 'TEXT'),
+    ('age_days', 'INTEGER'),
+    ('age_years', 'INTEGER'),
+    ('gender', 'INTEGER'),
+    ('height', 'REAL'),
+    ('weight', 'REAL'),
+    ('bp_systolic', 'REAL'),
+    ('bp_diastolic', 'REAL'),
+    ('cholesterol', 'INTEGER'),
+    ('gluc', 'INTEGER'),
+    ('smoke', 'INTEGER'),
+    ('alco', 'INTEGER'),
+    ('active', 'INTEGER'),
+    ('patient_name', 'TEXT'),
+    ('father_name', 'TEXT'),
+    ('blood_group', 'TEXT'),
+    ('phone_number', 'TEXT'),
+    ('alt_phone_number', 'TEXT'),
+    ('doctor_name', 'TEXT'),
+    ('timestamp', 'TEXT'),
+    ('status', 'TEXT')
+)
+COLUMN_NAMES = tuple(name for name, _ in COLUMNS)
+
+SCHEMA = [
+    f"CREATE TABLE IF NOT EXISTS predictions ({', '.join(f'{name} {kind}' for name, kind in COLUMNS)})",
+    "CREATE INDEX IF NOT EXISTS idx_predictions_timestamp ON predictions (timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_predictions_risk_level ON predictions (risk_level)",
+    "CREATE INDEX IF NOT EXISTS idx_predictions_doctor_name ON predictions (doctor_name)",
+    # 'epoch' counts clears: a snapshot taken before a clear must not be reused after it
+    "CREATE TABLE IF NOT EXISTS prediction_meta (key TEXT PRIMARY KEY, value INTEGER)",
+    "INSERT OR IGNORE INTO prediction_meta (key, value) VALUES ('epoch', 0)"
+]
+
+CLEAR_SQL = [
+    "DELETE FROM predictions",
+    "UPDATE prediction_meta SET value = value + 1 WHERE key = 'epoch'"
+]
+
+INSERT_SQL = (
+    f"INSERT OR REPLACE INTO predictions ({', '.join(COLUMN_NAMES)}) "
+    f"VALUES ({', '.join('?' for _ in COLUMN_NAMES)})"
+)
+
+SQL_FUNCTIONS = {
+    'normalize_text': normalize_text,
+    'normalize_risk_level': normalize_risk_level,
+    'normalize_blood_group': normalize_blood_group,
+    'normalize_phone': normalize_phone
+}
+
+def sqlite_path_from_uri(uri):
+    """'sqlite:///cardio_predictions.db' -> 'cardio_predictions.db' (None if not a file DB)"""
+    if not uri or not uri.startswith('sqlite:///'):
+        return None
+    path = uri[len('sqlite:///'):]
+    return None if path in ('', ':memory:') else path
+
+def columns_to_rows(columns):
+    """Column arrays/lists keyed by field name -> row tuples for INSERT_SQL"""
+    values = (columns[name] for name in COLUMN_NAMES)
+    return list(zip(*(column.tolist() if hasattr(column, 'tolist') else column for column in values)))
+
+def row_to_record(row):
+    """sqlite row tuple -> record dict shaped like PredictionRecord.to_dict()"""
+    record = dict(zip(COLUMN_NAMES, row))
+    record['has_disease'] = bool(record['prediction'])
+    return record
+
+# ==================== STORE ====================
+
+class PredictionDatabase:
+    """
+    Durable prediction store with a write-behind batching writer
+    
+    Requests call `enqueue()` (a queue put, no disk I/O). One writer thread
+    takes whatever has queued up, up to `batch_size` rows, and commits it in a
+    single transaction, so the fsync cost is shared by the whole batch.
+    
+    Puts never block: callers hold the prediction write lock to keep the log
+    in history order, so an insert that finds `queue_size` items waiting is
+    dropped (and counted) instead. A clear is always queued. A batch whose
+    commit fails is retried with exponential backoff; only a batch that fails
+    every attempt is given up, and its rows are counted as `lost`.
+    """
+    
+    def __init__(self, path, batch_size=500, flush_interval=0.2, queue_size=10000, busy_timeout=5.0,
+                 commit_retries=3, retry_backoff=0.1):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.busy_timeout = busy_timeout
+        self.commit_retries = commit_retries
+        self.retry_backoff = retry_backoff
+        self.logger = logging.getLogger('cardio_db')
+        self.queue_size = queue_size
+        self._queue = queue.Queue()
+        self._local = threading.local()
+        
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.errors = 0
+        self.retries = 0
+        self.lost = 0
+        self.last_error = None
+        self.last_flush_ms = None
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+        self.last_batch_size = 0
+        
+        connection = self._connect()
+        connection.execute('PRAGMA journal_mode=WAL')
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.commit()
+        
+        self._writer = threading.Thread(target=self._write_loop, name='prediction-db-writer', daemon=True)
+        self._writer.start()
+    
+    def _connect(self):
+        """Per-thread connection (sqlite3 connections are not shared across threads)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            # WAL + NORMAL: commits survive a process crash, fsync happens at checkpoints
+            connection.execute('PRAGMA synchronous=NORMAL')
+            # The search normalizers, so shared-state search matches what the in-memory index does
+            for name, function in SQL_FUNCTIONS.items():
+                connection.create_function(name, 1, function, deterministic=True)
+            self._local.connection = connection
+        return connection
+    
+    # ---------- writes ----------
+    
+    def enqueue(self, record):
+        """Queue one record for the writer; returns False if the queue was full"""
+        row = tuple(record.get(name) for name in COLUMN_NAMES)
+        return self._put(('insert', row), 1)
+    
+    def enqueue_batch(self, columns):
+        """Queue a whole batch (column arrays) as one item; the writer converts and commits it in one go"""
+        return self._put(('insert_many', columns), len(columns['id']))
+    
+    def enqueue_clear(self):
+        """Delete every stored prediction, in order with the queued inserts"""
+        self._queue.put_nowait(('clear', None))
+        return True
+    
+    def _put(self, item, count):
+        if self._queue.qsize() >= self.queue_size:
+            self.dropped += count
+            self.logger.error(f"Prediction DB queue full, {count} record(s) dropped")
+            return False
+        self._queue.put_nowait(item)
+        return True
+    
+    def insert(self, record):
+        """Commit one record right away (shared-state mode, where every worker must see it)"""
+        with self._connect() as connection:
+            connection.execute(INSERT_SQL, tuple(record.get(name) for name in COLUMN_NAMES))
+    
+    def insert_batch(self, columns):
+        with self._connect() as connection:
+            connection.executemany(INSERT_SQL, columns_to_rows(columns))
+    
+    def delete_all(self):
+        with self._connect() as connection:
+            for statement in CLEAR_SQL:
+                connection.execute(statement)
+    
+    def _write_loop(self):
+        connection = self._connect()
+        while True:
+            try:
+                item = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            
+            # Give concurrent requests a moment to join this transaction
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            self._commit(connection, batch)
+            for _ in batch:
+                self._queue.task_done()
+    
+    def _commit(self, connection, batch):
+        """Commit a batch, retrying with backoff; its rows are counted as lost only if every attempt fails"""
+        count = sum(len(row['id']) if kind == 'insert_many' else kind == 'insert' for kind, row in batch)
+        for attempt in range(self.commit_retries + 1):
+            start = time.perf_counter()
+            try:
+                self._write_batch(connection, batch)
+                break
+            except sqlite3.Error as e:
+                self.errors += 1
+                self.last_error = str(e)
+                if attempt == self.commit_retries:
+                    self.lost += count
+                    self.logger.error(f"Prediction DB batch failed after {attempt + 1} attempts, {count} record(s) lost: {e}")
+                    return
+                self.retries += 1
+                delay = self.retry_backoff * 2 ** attempt
+                self.logger.warning(f"Prediction DB batch failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+        
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.written += count
+        self.batches += 1
+        self.last_batch_size = count  # rows, like avg_batch_size
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self.total_flush_ms += elapsed_ms
+    
+    def _write_batch(self, connection, batch):
+        """One transaction for the whole batch (rolled back as a whole if any statement fails)"""
+        with connection:
+            rows = []
+            for kind, row in batch:
+                if kind == 'clear':
+                    if rows:
+                        connection.executemany(INSERT_SQL, rows)
+                        rows = []
+                    for statement in CLEAR_SQL:
+                        connection.execute(statement)
+                elif kind == 'insert_many':
+                    rows.extend(columns_to_rows(row))
+                else:
+                    rows.append(row)
+            if rows:
+                connection.executemany(INSERT_SQL, rows)
+    
+    def flush(self, timeout=10.0):
+        """Block until everything queued so far is committed"""
+        with self._queue.all_tasks_done:
+            return self._queue.all_tasks_done.wait_for(lambda: self._queue.unfinished_tasks == 0, timeout)
+    
+    # ---------- reads ----------
+    
+    def get(self, prediction_id):
+        """Record by ID, or None"""
+        row = self._connect().execute(
+            f"SELECT {', '.join(COLUMN_NAMES)} FROM predictions WHERE id = ?", (prediction_id,)
+        ).fetchone()
+        return row_to_record(row) if row is not None else None
+    
+    def iter_records(self, since_timestamp=None, batch_size=1000):
+        """All stored records in ID (= time) order, optionally from a timestamp on"""
+        sql = f"SELECT {', '.join(COLUMN_NAMES)} FROM predictions"
+        params = ()
+        if since_timestamp is not None:
+            sql += " WHERE timestamp >= ?"
+            params = (since_timestamp,)
+        cursor = self._connect().execute(sql + " ORDER BY id", params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row_to_record(row)
+    
+    def page_after(self, after, limit, last=None, fields=None):
+        """
+        Up to `limit` records with after < id (<= last), oldest first
+        
+        A keyset read on the primary-key index, so every page costs
+        O(log n + limit) however deep into the table it starts.
+        `fields` trims the columns read ('id' is always included).
+        """
+        if fields is None:
+            names = COLUMN_NAMES
+        else:
+            wanted = set(fields) | {'id'} | ({'prediction'} if 'has_disease' in fields else set())
+            names = tuple(name for name in COLUMN_NAMES if name in wanted)
+        sql = f"SELECT {', '.join(names)} FROM predictions WHERE id > ?"
+        params = (after,)
+        if last is not None:
+            sql += " AND id <= ?"
+            params += (last,)
+        rows = self._connect().execute(sql + " ORDER BY id LIMIT ?", params + (limit,)).fetchall()
+        records = [dict(zip(names, row)) for row in rows]
+        if 'prediction' in names:
+            for record in records:
+                record['has_disease'] = bool(record['prediction'])
+        return records
+    
+    def log_position(self):
+        """(epoch, last rowid) as one consistent read
+        
+        Rows are appended in commit order, so the rowid is a position in the
+        prediction log: everything after a saved position is what is new since.
+        """
+        return self._connect().execute(
+            "SELECT (SELECT value FROM prediction_meta WHERE key = 'epoch'), "
+            "(SELECT IFNULL(MAX(rowid), 0) FROM predictions)"
+        ).fetchone()
+    
+    def read_log(self, after, upto=None, batch_size=5000):
+        """Row tuples (rowid, *COLUMN_NAMES) with after < rowid <= upto, in batches, in commit order"""
+        sql = f"SELECT rowid, {', '.join(COLUMN_NAMES)} FROM predictions WHERE rowid > ?"
+        params = (after,)
+        if upto is not None:
+            sql += " AND rowid <= ?"
+            params += (upto,)
+        cursor = self._connect().execute(sql + " ORDER BY rowid", params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+    
+    def get_stats(self):
+        """Queue depth, write counters and flush latency"""
+        return {
+            'path': self.path,
+            'queue_depth': self._queue.qsize(),
+            'written': self.written,
+            'batches': self.batches,
+            'last_batch_size': self.last_batch_size,
+            'avg_batch_size': round(self.written / self.batches, 1) if self.batches else None,
+            'last_flush_ms': round(self.last_flush_ms, 3) if self.last_flush_ms is not None else None,
+            'avg_flush_ms': round(self.total_flush_ms / self.batches, 3) if self.batches else None,
+            'max_flush_ms': round(self.max_flush_ms, 3),
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'retries': self.retries,
+            'lost': self.lost,
+            'last_error': self.last_error
+        }
@@ -0,0 +1,124 @@
+"""
+Prediction State Container
+One place that owns the prediction history, the aggregate stats and their
+generation counter: writers are serialized, readers get immutable snapshots
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+class StatsSnapshot:
+    """
+    Read-only view of a frozen StatisticsRecord copy
+    
+    Summaries are computed once per view and shared by every reader of that
+    generation; the returned dicts must be treated as read-only too.
+    """
+    
+    def __init__(self, stats, generation):
+        self.stats = stats
+        self.generation = generation
+        self.total_predictions = stats.total_predictions
+        self.metrics = stats.metrics
+        self._summaries = {}
+    
+    def _memoized(self, key, compute):
+        result = self._summaries.get(key)
+        if result is None:
+            result = self._summaries[key] = compute()
+        return result
+    
+    def get_summary(self):
+        return self._memoized('summary', self.stats.get_summary)
+    
+    def get_metric_summaries(self, percentiles=(25, 50, 75, 90, 95, 99), include_histogram=False):
+        return self._memoized(('metrics', tuple(percentiles), include_histogram),
+                              lambda: self.stats.get_metric_summaries(percentiles, include_histogram))
+
+class PredictionState:
+    """
+    History + stats + generation, updated together
+    
+    Writers (predict, batch predict, clear) run inside `write()`, which takes
+    the one writer lock, so a record never lands in the history without the
+    stats (or the other way round) and a clear cannot interleave with an
+    insert. The history store keeps its own short lock for page reads.
+    
+    Readers never take the writer lock. `stats_snapshot()` returns a frozen
+    copy of the stats, cached per generation with its summaries, so most
+    reads are a couple of attribute lookups. A new copy is checked with a
+    sequence counter (odd while a write is in progress) and retried if a
+    writer got in between.
+    """
+    
+    def __init__(self, history, stats, generation, copy_retries=8):
+        self.history = history
+        self.stats = stats
+        self.generation = generation
+        self.copy_retries = copy_retries
+        self._write_lock = threading.Lock()
+        self._sequence = 0  # odd while a writer is inside write()
+        self._cached = None  # StatsSnapshot of the latest generation read
+        
+        self.writes = 0
+        self.snapshot_hits = 0
+        self.snapshot_copies = 0
+        self.snapshot_retries = 0
+        self.locked_copies = 0
+    
+    @contextmanager
+    def write(self):
+        """Exclusive section for changing the history and stats; bumps the generation on exit"""
+        with self._write_lock:
+            self._sequence += 1
+            try:
+                yield self
+            finally:
+                self.generation.bump()
+                self._sequence += 1
+                self.writes += 1
+    
+    def stats_snapshot(self):
+        """
+        Consistent StatsSnapshot as of the current generation
+        
+        The same object is handed to every reader until the next write.
+        """
+        cached = self._cached
+        if cached is not None and cached.generation == self.generation.value:
+            self.snapshot_hits += 1
+            return cached
+        
+        for _ in range(self.copy_retries):
+            sequence = self._sequence
+            if sequence & 1:
+                self.snapshot_retries += 1
+                time.sleep(0)  # let the writer finish
+                continue
+            version = self.generation.value
+            copy = self.stats.copy()
+            if self._sequence == sequence:
+                self.snapshot_copies += 1
+                self._cached = snapshot = StatsSnapshot(copy, version)
+                return snapshot
+            self.snapshot_retries += 1
+        
+        # Writers kept winning: copy under the lock rather than spin
+        with self._write_lock:
+            version = self.generation.value
+            copy = self.stats.copy()
+        self.locked_copies += 1
+        self._cached = snapshot = StatsSnapshot(copy, version)
+        return snapshot
+    
+    def get_stats(self):
+        """Write count and how stats reads were served"""
+        return {
+            'writes': self.writes,
+            'generation': self.generation.value,
+            'snapshot_hits': self.snapshot_hits,
+            'snapshot_copies': self.snapshot_copies,
+            'snapshot_retries': self.snapshot_retries,
+            'locked_copies': self.locked_copies
+        }
@@ -0,0 +1,236 @@
+"""
+Background Retraining Service
+Runs the ML pipeline in a separate low-priority process with a CPU budget,
+so serving workers keep their cores while a new model is trained
+"""
+
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, one service per host
+    fcntl = None
+
+# ==================== PROCESS HELPERS ====================
+
+def read_process_usage(pid):
+    """
+    Read CPU seconds and resident memory of a running process from /proc
+    
+    Returns:
+        dict: {cpu_seconds, rss_mb} or {} where /proc is unavailable
+    """
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        ticks = os.sysconf('SC_CLK_TCK')
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / ticks  # utime + stime
+        
+        rss_mb = None
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss_mb = round(int(line.split()[1]) / 1024, 1)
+                    break
+        return {'cpu_seconds': round(cpu_seconds, 2), 'rss_mb': rss_mb}
+    except (OSError, ValueError, IndexError):
+        return {}
+
+def limited_environment(core_budget):
+    """Environment that caps every thread pool the pipeline may use"""
+    env = os.environ.copy()
+    budget = str(core_budget)
+    env.update({
+        'CARDIO_N_JOBS': budget,
+        'CARDIO_CV_WORKERS': budget,
+        'OMP_NUM_THREADS': budget,
+        'OPENBLAS_NUM_THREADS': budget,
+        'MKL_NUM_THREADS': budget,
+        'MPLBACKEND': 'Agg'
+    })
+    return env
+
+def make_priority_lowerer(niceness, core_budget):
+    """Build a preexec_fn that renices the child and pins it to `core_budget` cores"""
+    def lower_priority():
+        os.nice(niceness)
+        if hasattr(os, 'sched_setaffinity'):
+            cores = sorted(os.sched_getaffinity(0))
+            # Take the highest-numbered cores; gunicorn workers tend to land low
+            os.sched_setaffinity(0, cores[-core_budget:])
+    return lower_priority if os.name == 'posix' else None
+
+# ==================== RETRAINING SERVICE ====================
+
+class RetrainingService:
+    """Schedule or trigger pipeline runs in a niced, CPU-limited child process"""
+    
+    def __init__(self, config, on_complete=None):
+        self.script = config.get('RETRAIN_SCRIPT', 'complete_ml_pipeline.py')
+        self.interval_hours = config.get('RETRAIN_INTERVAL_HOURS', 0)
+        self.core_budget = max(1, config.get('RETRAIN_CORE_BUDGET', 1))
+        self.niceness = config.get('RETRAIN_NICE', 19)
+        self.progress_file = config.get('RETRAIN_PROGRESS_FILE', 'logs/retrain_progress.json')
+        self.lock_file = config.get('RETRAIN_LOCK_FILE', 'logs/retrain.lock')
+        self.log_file = config.get('RETRAIN_LOG_FILE', 'logs/retrain.log')
+        self.on_complete = on_complete
+        self.logger = logging.getLogger('cardio_retrain')
+        
+        self.process = None
+        self.lock_handle = None
+        self.state = 'idle'
+        self.started_at = None
+        self.finished_at = None
+        self.exit_code = None
+        self.last_error = None
+        self.runs = 0
+        self.peak_rss_mb = None
+        self.last_usage = {}
+        self._mutex = threading.Lock()
+        self._wake = threading.Event()
+        self._scheduler = None
+    
+    def start_scheduler(self):
+        """Start the periodic scheduler thread (no-op if no interval configured)"""
+        if self.interval_hours <= 0 or self._scheduler is not None:
+            return
+        self._scheduler = threading.Thread(target=self._schedule_loop, name='retrain-scheduler', daemon=True)
+        self._scheduler.start()
+        self.logger.info(f"Retraining scheduled every {self.interval_hours}h ({self.core_budget} core budget)")
+    
+    def _schedule_loop(self):
+        while True:
+            self._wake.wait(self.interval_hours * 3600)
+            self._wake.clear()
+            self.trigger(reason='schedule')
+    
+    def _acquire_host_lock(self):
+        """Only one retraining per host, whichever gunicorn worker gets here first"""
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self.lock_file) or '.', exist_ok=True)
+        handle = open(self.lock_file, 'w')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self.lock_handle = handle
+        return True
+    
+    def _release_host_lock(self):
+        if self.lock_handle is not None:
+            fcntl.flock(self.lock_handle, fcntl.LOCK_UN)
+            self.lock_handle.close()
+            self.lock_handle = None
+    
+    def trigger(self, reason='manual'):
+        """
+        Start a retraining run in the background
+        
+        Returns:
+            (started, message) tuple
+        """
+        with self._mutex:
+            if self.process is not None:
+                return False, 'Retraining already running in this worker'
+            if not self._acquire_host_lock():
+                return False, 'Retraining already running on this host'
+            
+            try:
+                if os.path.exists(self.progress_file):
+                    os.remove(self.progress_file)
+                env = limited_environment(self.core_budget)
+                env['CARDIO_PROGRESS_FILE'] = self.progress_file
+                
+                os.makedirs(os.path.dirname(self.log_file) or '.', exist_ok=True)
+                log_handle = open(self.log_file, 'a')
+                self.process = subprocess.Popen(
+                    [sys.executable, self.script],
+                    env=env,
+                    stdout=log_handle,
+                    stderr=subprocess.STDOUT,
+                    preexec_fn=make_priority_lowerer(self.niceness, self.core_budget)
+                )
+                log_handle.close()
+            except Exception as e:
+                self._release_host_lock()
+                self.process = None
+                self.last_error = str(e)
+                self.logger.error(f"Failed to start retraining: {e}")
+                return False, f'Failed to start retraining: {e}'
+            
+            self.state = 'running'
+            self.started_at = datetime.now().isoformat()
+            self.finished_at = None
+            self.exit_code = None
+            self.last_error = None
+            self.peak_rss_mb = None
+            self.runs += 1
+        
+        threading.Thread(target=self._monitor, name='retrain-monitor', daemon=True).start()
+        self.logger.info(f"Retraining started (pid {self.process.pid}, reason: {reason})")
+        return True, 'Retraining started'
+    
+    def _monitor(self):
+        """Sample the child's resource usage until it exits, then publish the model"""
+        process = self.process
+        while process.poll() is None:
+            usage = read_process_usage(process.pid)
+            if usage:
+                self.last_usage = usage
+                if usage.get('rss_mb') is not None:
+                    self.peak_rss_mb = max(self.peak_rss_mb or 0, usage['rss_mb'])
+            time.sleep(1)
+        
+        with self._mutex:
+            self.exit_code = process.returncode
+            self.finished_at = datetime.now().isoformat()
+            self.state = 'succeeded' if process.returncode == 0 else 'failed'
+            self.process = None
+            self._release_host_lock()
+        
+        if process.returncode != 0:
+            self.last_error = f'Pipeline exited with code {process.returncode} (see {self.log_file})'
+            self.logger.error(self.last_error)
+            return
+        
+        self.logger.info("Retraining finished, reloading model")
+        if self.on_complete is not None:
+            try:
+                self.on_complete()
+            except Exception as e:
+                self.last_error = f'Model reload failed: {e}'
+                self.logger.error(self.last_error)
+    
+    def read_progress(self):
+        """Latest progress written by the pipeline (phase, step, total)"""
+        try:
+            with open(self.progress_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def get_status(self):
+        """Current state, progress and resource usage of the retraining run"""
+        return {
+            'state': self.state,
+            'pid': self.process.pid if self.process is not None else None,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'exit_code': self.exit_code,
+            'last_error': self.last_error,
+            'runs': self.runs,
+            'progress': self.read_progress(),
+            'resource_usage': dict(self.last_usage, peak_rss_mb=self.peak_rss_mb),
+            'core_budget': self.core_budget,
+            'niceness': self.niceness,
+            'interval_hours': self.interval_hours
+        }
@@ -0,0 +1,335 @@
+"""
+Prediction Search Index
+In-memory secondary indexes over the prediction history: hash indexes for
+exact fields (risk level, blood group, phone) and a trigram index for
+patient and doctor names, kept in step with the history store
+"""
+
+import sys
+from array import array
+from collections import Counter
+
+import numpy as np
+
+# ==================== NORMALIZATION ====================
+
+RISK_ALIASES = {'medium': 'moderate'}
+
+def normalize_text(value):
+    """Case- and whitespace-insensitive form of a name"""
+    return ' '.join(str(value).casefold().split()) if value else ''
+
+def normalize_risk_level(value):
+    """'High Risk', 'high', 'HIGH_RISK' -> 'high'"""
+    text = normalize_text(str(value).replace('_', ' ').replace('-', ' ')) if value else ''
+    if text.endswith(' risk'):
+        text = text[:-len(' risk')]
+    return RISK_ALIASES.get(text, text)
+
+def normalize_blood_group(value):
+    return ''.join(str(value).upper().split()) if value else ''
+
+def normalize_phone(value):
+    """Digits only, last 10, so '+91 98765-43210' and '9876543210' match"""
+    return ''.join(c for c in str(value) if c.isdigit())[-10:] if value else ''
+
+# query parameter -> (record fields, normalizer)
+EXACT_FIELDS = {
+    'risk_level': (('risk_level',), normalize_risk_level),
+    'blood_group': (('blood_group',), normalize_blood_group),
+    'phone': (('phone_number', 'alt_phone_number'), normalize_phone)
+}
+# query parameter -> record field, matched as a substring
+TEXT_FIELDS = {
+    'patient': 'patient_name',
+    'doctor': 'doctor_name'
+}
+SEARCH_FIELDS = tuple(EXACT_FIELDS) + tuple(TEXT_FIELDS)
+MIN_TEXT_QUERY = 2
+
+# Trigram postings hold doc << POSITION_BITS | position, so a longer query is
+# matched by checking its trigrams sit at consecutive positions
+POSITION_BITS = 8
+POSITION_MASK = (1 << POSITION_BITS) - 1
+MAX_INDEXED_CHARS = POSITION_MASK - 5  # longer names are indexed by their start
+
+def trigrams(text):
+    """(position, trigram) of ' text ' (the padding makes word starts searchable)"""
+    padded = f' {text[:MAX_INDEXED_CHARS]} '
+    return [(i, padded[i:i + 3]) for i in range(len(padded) - 2)]
+
+def query_trigrams(query):
+    """
+    (offset, trigram) pairs a match must contain at consecutive positions
+    
+    Two characters are looked up as a word prefix (' ab'), three or more as
+    a substring anywhere in the name.
+    """
+    if len(query) == 2:
+        return [(0, f' {query}')]
+    return [(i, query[i:i + 3]) for i in range(len(query) - 2)]
+
+def parse_criteria(args):
+    """Normalized search criteria from request args; ValueError if unusable"""
+    criteria = {}
+    for name in SEARCH_FIELDS:
+        value = args.get(name)
+        if value is None or not str(value).strip():
+            continue
+        if name in TEXT_FIELDS:
+            value = normalize_text(value)
+            if len(value) < MIN_TEXT_QUERY:
+                raise ValueError(f"'{name}' needs at least {MIN_TEXT_QUERY} characters")
+        else:
+            value = EXACT_FIELDS[name][1](value)
+            if not value:
+                raise ValueError(f"Invalid value for '{name}'")
+        criteria[name] = value
+    if not criteria:
+        raise ValueError(f"Give at least one of: {', '.join(SEARCH_FIELDS)}")
+    return criteria
+
+# ==================== INDEX ====================
+
+class PredictionSearchIndex:
+    """
+    Posting lists of internal document numbers, one per indexed term
+    
+    Document numbers only grow, so every posting list is append-only and
+    sorted: a bare int while a term has one entry (most phone numbers), then
+    an array that NumPy reads without copying. Removal clears the document's
+    alive flag; a posting list is compacted once more than half of it is
+    dead, and the dead prefix of the alive flags (eviction is oldest-first)
+    is trimmed the same way. Not thread-safe on its own: the history store
+    calls it under its lock.
+    """
+    
+    COMPACT_MIN = 64  # posting lists shorter than this are never compacted
+    
+    def __init__(self):
+        self._postings = {name: {} for name in SEARCH_FIELDS}  # field -> term -> entry | array of entries
+        self._dead = {name: {} for name in SEARCH_FIELDS}  # field -> term -> dead entries, if any
+        self._doc_of = {}  # prediction ID -> doc number
+        # Per doc number from _base on: alive flag, and (prediction ID, normalized
+        # values in SEARCH_FIELDS order) or None once removed
+        self._alive = bytearray()
+        self._rows = []
+        self._base = 0
+        self._next_doc = 0
+        self._entries = dict.fromkeys(SEARCH_FIELDS, 0)
+        self._array_postings = 0
+        self._key_bytes = 0
+    
+    @staticmethod
+    def _keys(record):
+        """Normalized values of one record, in SEARCH_FIELDS order (None if absent)"""
+        keys = []
+        for name, (fields, normalize) in EXACT_FIELDS.items():
+            values = tuple({sys.intern(normalize(record.get(field))) for field in fields} - {''})
+            keys.append(values or None)
+        for field in TEXT_FIELDS.values():
+            keys.append(normalize_text(record.get(field)) or None)
+        return tuple(keys)
+    
+    @staticmethod
+    def _entries_of(doc, keys):
+        """(field, term, posting entry) for every term of one document"""
+        for name, value in zip(SEARCH_FIELDS, keys):
+            if value is None:
+                continue
+            if name in TEXT_FIELDS:
+                for position, gram in trigrams(value):
+                    yield name, gram, doc << POSITION_BITS | position
+            else:
+                for term in value:
+                    yield name, term, doc
+    
+    def add(self, prediction_id, record):
+        """Index one record (replacing an earlier version with the same ID)"""
+        self.remove(prediction_id)
+        keys = self._keys(record)
+        doc = self._next_doc
+        self._next_doc += 1
+        self._doc_of[prediction_id] = doc
+        self._alive.append(1)
+        self._rows.append((prediction_id, keys))
+        self._key_bytes += sum(sys.getsizeof(value) for value in keys if value is not None)
+        for name, term, entry in self._entries_of(doc, keys):
+            postings = self._postings[name]
+            posting = postings.get(term)
+            if posting is None:
+                postings[term] = entry
+            elif isinstance(posting, int):
+                # 'I' (4 bytes) for doc numbers, 'q' for doc/position pairs
+                postings[term] = array('q' if name in TEXT_FIELDS else 'I', (posting, entry))
+                self._array_postings += 1
+            else:
+                posting.append(entry)
+            self._entries[name] += 1
+    
+    def remove(self, prediction_id):
+        """Drop a record if indexed (called on eviction)"""
+        doc = self._doc_of.pop(prediction_id, None)
+        if doc is None:
+            return
+        _, keys = self._rows[doc - self._base]
+        self._alive[doc - self._base] = 0
+        self._rows[doc - self._base] = None
+        self._key_bytes -= sum(sys.getsizeof(value) for value in keys if value is not None)
+        # A name can hold a trigram more than once: one step per term, with all its entries
+        occurrences = Counter((name, term) for name, term, _ in self._entries_of(doc, keys))
+        for (name, term), count in occurrences.items():
+            postings, deads = self._postings[name], self._dead[name]
+            posting = postings[term]
+            if isinstance(posting, int):
+                del postings[term]
+                self._entries[name] -= 1
+                continue
+            dead = deads.get(term, 0) + count
+            live = len(posting) - dead
+            if live == 0:
+                del postings[term]
+                deads.pop(term, None)
+                self._entries[name] -= len(posting)
+                self._array_postings -= 1
+            elif dead > live and len(posting) >= self.COMPACT_MIN:
+                entries = self._as_array(name, posting)
+                shift = POSITION_BITS if name in TEXT_FIELDS else 0
+                kept = entries[self._alive_mask(entries >> shift)]
+                dtype = np.int64 if name in TEXT_FIELDS else np.uint32
+                postings[term] = array(posting.typecode, kept.astype(dtype).tobytes())
+                deads.pop(term, None)
+                self._entries[name] -= len(posting) - len(kept)
+            else:
+                deads[term] = dead
+        self._trim_alive()
+    
+    @staticmethod
+    def _as_array(name, posting):
+        """Posting list as an int64 NumPy array"""
+        if isinstance(posting, int):
+            return np.array([posting], dtype=np.int64)
+        if name in TEXT_FIELDS:
+            return np.frombuffer(posting, dtype=np.int64)
+        return np.frombuffer(posting, dtype=np.uint32).astype(np.int64)
+    
+    def _alive_mask(self, docs):
+        """Which of these doc numbers are still indexed"""
+        mask = docs >= self._base
+        flags = np.frombuffer(self._alive, dtype=np.uint8)
+        mask[mask] = flags[docs[mask] - self._base] == 1
+        return mask
+    
+    def _trim_alive(self):
+        """Forget the rows of the oldest, already removed documents"""
+        if len(self._alive) < 4096:
+            return
+        first = self._alive.find(1)
+        first = len(self._alive) if first < 0 else first
+        if first * 2 > len(self._alive):
+            del self._alive[:first]
+            del self._rows[:first]
+            self._base += first
+    
+    def clear(self):
+        for postings in self._postings.values():
+            postings.clear()
+        for deads in self._dead.values():
+            deads.clear()
+        self._doc_of.clear()
+        self._alive = bytearray()
+        self._rows = []
+        self._base = self._next_doc
+        self._entries = dict.fromkeys(SEARCH_FIELDS, 0)
+        self._array_postings = self._key_bytes = 0
+    
+    def __len__(self):
+        return len(self._doc_of)
+    
+    def _text_docs(self, name, query):
+        """Sorted doc numbers whose text contains the query (may include removed docs)"""
+        grams = []
+        for offset, gram in query_trigrams(query):
+            posting = self._postings[name].get(gram)
+            if posting is None:
+                return None
+            grams.append((offset, self._as_array(name, posting)))
+        
+        # Anchor on the rarest trigram, then require every other trigram at
+        # its offset from the same start position
+        anchor, entries = min(grams, key=lambda item: len(item[1]))
+        last = grams[-1][0]
+        positions = entries & POSITION_MASK
+        starts = entries[(positions >= anchor) & (positions - anchor + last <= POSITION_MASK)] - anchor
+        for offset, other in grams:
+            if offset == anchor or not len(starts):
+                continue
+            targets = starts + offset
+            found = np.minimum(np.searchsorted(other, targets), len(other) - 1)
+            starts = starts[other[found] == targets]
+        
+        docs = starts >> POSITION_BITS
+        if len(docs):
+            docs = docs[np.concatenate(([True], docs[1:] != docs[:-1]))]  # a name can match twice
+        return docs
+    
+    def search(self, criteria, limit, offset=0):
+        """
+        Prediction IDs matching every criterion, newest first
+        
+        Args:
+            criteria: {search field: normalized value} (see parse_criteria)
+            limit: IDs to return
+            offset: skip this many of the newest matches
+        
+        Returns:
+            tuple: (list of prediction IDs, total number of matches)
+        """
+        doc_sets = []
+        for name, value in criteria.items():
+            if name in TEXT_FIELDS:
+                docs = self._text_docs(name, value)
+            else:
+                posting = self._postings[name].get(value)
+                docs = self._as_array(name, posting) if posting is not None else None
+            if docs is None or not len(docs):
+                return [], 0
+            doc_sets.append(docs)
+        
+        # Start from the rarest criterion and probe the others by binary search
+        doc_sets.sort(key=len)
+        docs = doc_sets[0]
+        for other in doc_sets[1:]:
+            if not len(docs):
+                break
+            found = np.minimum(np.searchsorted(other, docs), len(other) - 1)
+            docs = docs[other[found] == docs]
+        docs = docs[self._alive_mask(docs)]
+        
+        page = (docs[::-1][offset:offset + limit] - self._base).tolist()
+        return [self._rows[slot][0] for slot in page], len(docs)
+    
+    def get_stats(self):
+        """Sizes and approximate memory of the index structures"""
+        terms = sum(len(postings) for postings in self._postings.values())
+        dead_entries = sum(sum(deads.values()) for deads in self._dead.values())
+        posting_bytes = (
+            sum(sys.getsizeof(postings) for postings in self._postings.values())
+            + sum(count * (8 if name in TEXT_FIELDS else 4) for name, count in self._entries.items())
+            + self._array_postings * sys.getsizeof(array('I'))
+            + (terms - self._array_postings) * 32  # int objects for single-entry terms
+        )
+        table_bytes = (
+            sys.getsizeof(self._doc_of) + sys.getsizeof(self._rows) + len(self._alive)
+            + len(self._doc_of) * (32 + 56 + 40 + 8 * len(SEARCH_FIELDS) + 64)  # doc ints, row tuples, phone strings
+            + self._key_bytes
+        )
+        memory = posting_bytes + table_bytes
+        return {
+            'records': len(self._doc_of),
+            'terms': terms,
+            'posting_entries': sum(self._entries.values()),
+            'dead_entries': dead_entries,
+            'memory_bytes': memory,
+            'bytes_per_record': round(memory / len(self._doc_of), 1) if self._doc_of else None
+        }
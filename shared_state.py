@@ -0,0 +1,572 @@
+"""
+Shared Prediction State
+Lets several gunicorn workers serve one set of predictions: counters and
+aggregates live in a memory-mapped file every worker maps, and the history is
+read from the shared SQLite prediction database
+"""
+
+import fcntl
+import mmap
+import os
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+from history_store import project
+from models import StatisticsRecord
+from prediction_db import COLUMN_NAMES, row_to_record
+from search_index import EXACT_FIELDS, TEXT_FIELDS
+
+MAGIC = 0x43415244  # 'CARD'
+
+# int64 header slots
+HEADER_FIELDS = (
+    'magic', 'layout', 'epoch', 'next_node', 'stats_generation', 'history_generation',
+    'total_predictions', 'total_high_risk', 'total_moderate_risk', 'total_low_risk',
+    'total_disease', 'total_healthy',
+    'window_max_size', 'window_floor', 'window_size', 'window_oldest_ms',
+    'window_evicted_by_size', 'window_evicted_by_age'
+)
+COUNTER_FIELDS = HEADER_FIELDS[6:12]
+# Bounds of the shared history window (SharedHistoryStore), kept up to date by every writer
+WINDOW_FIELDS = HEADER_FIELDS[12:]
+METRIC_FIELDS = ('count', 'total', 'total_sq', 'min', 'max')
+
+# ==================== SHARED SEGMENT ====================
+
+class SharedState:
+    """
+    Prediction counters and streaming metrics in one memory-mapped file
+    
+    The file is mapped MAP_SHARED by every worker, so an update made by one is
+    seen by all without any copying. Writers take an exclusive flock, readers
+    a shared one; a thread lock covers threads of the same worker, which share
+    the file descriptor and therefore the flock.
+    """
+    
+    def __init__(self, path, metric_bins=StatisticsRecord.METRIC_BINS):
+        self.path = path
+        self.metric_bins = dict(metric_bins)
+        self.rebuilt = False
+        self._thread_lock = threading.Lock()
+        
+        # Layout: int64 header, then per metric float64 [count, total, total_sq, min, max, bins...]
+        self._offsets = {}
+        offset = len(HEADER_FIELDS) * 8
+        for name, (low, high, bin_width) in self.metric_bins.items():
+            length = len(METRIC_FIELDS) + int(round((high - low) / bin_width))
+            self._offsets[name] = (offset, length)
+            offset += length * 8
+        self.size = offset
+        self.layout = zlib.crc32(repr((HEADER_FIELDS, sorted(self.metric_bins.items()))).encode())
+        
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        with self._locked(exclusive=True):
+            if os.fstat(self._fd).st_size < self.size:
+                os.ftruncate(self._fd, self.size)
+            self._map = mmap.mmap(self._fd, self.size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        self._header = np.ndarray(len(HEADER_FIELDS), dtype=np.int64, buffer=self._map)
+        self._metrics = {
+            name: np.ndarray(length, dtype=np.float64, buffer=self._map, offset=offset)
+            for name, (offset, length) in self._offsets.items()
+        }
+        self._slot = {name: i for i, name in enumerate(HEADER_FIELDS)}
+    
+    @contextmanager
+    def _locked(self, exclusive=True):
+        with self._thread_lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+    
+    def _get(self, field):
+        return int(self._header[self._slot[field]])
+    
+    def _incr(self, field, amount=1):
+        self._header[self._slot[field]] += amount
+    
+    def _set(self, field, value):
+        self._header[self._slot[field]] = value
+    
+    def _reset(self):
+        """Zero everything and start a new epoch (caller holds the lock)"""
+        self._header[:] = 0
+        self._header[self._slot['magic']] = MAGIC
+        self._header[self._slot['layout']] = self.layout
+        self._header[self._slot['epoch']] = int.from_bytes(uuid.uuid4().bytes[:6], 'big')
+        for values in self._metrics.values():
+            values[:] = 0
+            values[3:5] = np.nan  # min/max unknown
+    
+    def _add(self, record):
+        """Fold one record into the counters (caller holds the lock)"""
+        self._incr('total_predictions')
+        risk = record['risk_percentage']
+        if risk >= 60:
+            self._incr('total_high_risk')
+        elif risk >= 30:
+            self._incr('total_moderate_risk')
+        else:
+            self._incr('total_low_risk')
+        self._incr('total_disease' if record['prediction'] == 1 else 'total_healthy')
+        
+        for name, values in self._metrics.items():
+            value = record.get(name)
+            if value is None:
+                continue
+            value = float(value)
+            low, high, bin_width = self.metric_bins[name]
+            values[0] += 1
+            values[1] += value
+            values[2] += value * value
+            if not value >= values[3]:  # also true while min is NaN
+                values[3] = value
+            if not value <= values[4]:
+                values[4] = value
+            index = min(max(int((value - low) // bin_width), 0), len(values) - len(METRIC_FIELDS) - 1)
+            values[len(METRIC_FIELDS) + index] += 1
+    
+    def attach(self, database):
+        """
+        Make sure the segment matches the database, rebuilding it if not
+        
+        The first worker to start (or any worker after a crash, a layout change
+        or a run without shared state) finds a count that disagrees with the
+        table and replays the table into a fresh segment.
+        """
+        with self._locked(exclusive=True):
+            valid = self._get('magic') == MAGIC and self._get('layout') == self.layout
+            if valid and self._get('total_predictions') == database.count():
+                return False
+            self._reset()
+            for record in database.iter_records():
+                self._add(record)
+            self._incr('stats_generation')
+            self._incr('history_generation')
+            self.rebuilt = True
+            return True
+    
+    def allocate_node(self):
+        """Worker tag for prediction IDs, unique among the workers sharing this segment"""
+        with self._locked(exclusive=True):
+            self._incr('next_node')
+            return self._get('next_node') & 0xFFFF
+    
+    @property
+    def epoch(self):
+        """Random id of the current segment contents (changes on every rebuild)"""
+        return f"{self._get('epoch'):012x}"
+    
+    # ---------- statistics ----------
+    
+    def add_prediction(self, record):
+        with self._locked(exclusive=True):
+            self._add(record)
+    
+    def add_batch(self, columns):
+        """Fold a batch of predictions (StatisticsRecord.add_batch columns) in under one lock"""
+        batch = StatisticsRecord()
+        batch.add_batch(columns)
+        with self._locked(exclusive=True):
+            for field in COUNTER_FIELDS:
+                self._incr(field, getattr(batch, field))
+            for name, values in self._metrics.items():
+                metric = batch.metrics[name]
+                if not metric.count:
+                    continue
+                values[0] += metric.count
+                values[1] += metric.total
+                values[2] += metric.total_sq
+                if not metric.min >= values[3]:  # also true while min is NaN
+                    values[3] = metric.min
+                if not metric.max <= values[4]:
+                    values[4] = metric.max
+                values[len(METRIC_FIELDS):] += np.asarray(metric.bins, dtype=np.float64)
+    
+    def reset_stats(self):
+        """Zero the counters and metrics, keeping the epoch, generations and history window"""
+        with self._locked(exclusive=True):
+            keep = {field: self._get(field) for field in
+                    ('epoch', 'next_node', 'stats_generation', 'history_generation') + WINDOW_FIELDS}
+            self._reset()
+            for field, value in keep.items():
+                self._header[self._slot[field]] = value
+    
+    def snapshot(self):
+        """Consistent copy of the shared counters as a regular StatisticsRecord"""
+        with self._locked(exclusive=False):
+            header = self._header.copy()
+            metrics = {name: values.copy() for name, values in self._metrics.items()}
+        
+        record = StatisticsRecord()
+        for field in COUNTER_FIELDS:
+            setattr(record, field, int(header[self._slot[field]]))
+        for name, values in metrics.items():
+            metric = record.metrics[name]
+            metric.count = int(values[0])
+            metric.total = float(values[1])
+            metric.total_sq = float(values[2])
+            metric.min = None if np.isnan(values[3]) else float(values[3])
+            metric.max = None if np.isnan(values[4]) else float(values[4])
+            metric.bins = values[len(METRIC_FIELDS):].astype(np.int64).tolist()
+        return record
+    
+    # ---------- generations ----------
+    
+    def bump(self, field):
+        with self._locked(exclusive=True):
+            self._incr(field)
+            return self._get(field)
+    
+    def value(self, field):
+        """Current value of one header slot (an aligned int64 load, no lock needed)"""
+        return self._get(field)
+    
+    def values(self, *fields):
+        """Several header slots read together under the shared lock"""
+        with self._locked(exclusive=False):
+            return tuple(self._get(field) for field in fields)
+    
+    @contextmanager
+    def exclusive(self):
+        """Hold the write lock across a multi-step change"""
+        with self._locked(exclusive=True):
+            yield
+    
+    def get_stats(self):
+        return {
+            'path': self.path,
+            'size_bytes': self.size,
+            'epoch': self.epoch,
+            'nodes_allocated': self._get('next_node'),
+            'rebuilt_by_this_worker': self.rebuilt
+        }
+
+class SharedStatisticsRecord:
+    """StatisticsRecord interface over the shared segment"""
+    
+    def __init__(self, state):
+        self.state = state
+    
+    def add_prediction(self, prediction_record):
+        self.state.add_prediction(prediction_record.to_dict())
+    
+    def add_batch(self, columns):
+        self.state.add_batch(columns)
+    
+    @property
+    def total_predictions(self):
+        return self.state.value('total_predictions')
+    
+    def copy(self):
+        return self.state.snapshot()
+    
+    def get_summary(self):
+        return self.state.snapshot().get_summary()
+    
+    def get_metric_summaries(self, percentiles=(25, 50, 75, 90, 95, 99), include_histogram=False):
+        return self.state.snapshot().get_metric_summaries(percentiles, include_histogram)
+    
+    def reset(self):
+        self.state.reset_stats()
+
+class SharedGenerationCounter:
+    """GenerationCounter interface over one header slot of the shared segment"""
+    
+    def __init__(self, state, field):
+        self.state = state
+        self.field = field
+    
+    @property
+    def value(self):
+        return self.state.value(self.field)
+    
+    def bump(self):
+        return self.state.bump(self.field)
+
+# ==================== SHARED HISTORY ====================
+
+def id_millis(prediction_id):
+    """Creation time (ms) of a sortable prediction ID, 0 for older ID formats"""
+    try:
+        return int(prediction_id[:12], 16) if len(prediction_id) == 20 else 0
+    except (TypeError, ValueError):
+        return 0
+
+class SharedHistoryStore:
+    """
+    Prediction history served straight from the shared SQLite database
+    
+    Same interface and limits as PredictionHistoryStore, but the window (the
+    newest `max_size` records inside the retention period) is a rowid range
+    at the end of the table, so every worker sees the same records. Its
+    bounds live in the shared segment and are moved by the writers (and by
+    the first reader to notice records have aged out), so no read has to
+    count the table. Rows outside the window are not deleted: the table
+    stays the archive.
+    """
+    
+    backend = 'shared'
+    EXPIRE_CHUNK = 500
+    
+    def __init__(self, database, state, max_size=10000, retention_hours=24, clock=time.time):
+        self.database = database
+        self.state = state
+        self.max_size = max_size
+        self.retention_seconds = retention_hours * 3600 if retention_hours else None
+        self.clock = clock
+        self._select = f"SELECT {', '.join(COLUMN_NAMES)} FROM predictions"
+    
+    def _execute(self, sql, params=()):
+        return self.database._connect().execute(sql, params)
+    
+    def _cutoff_ms(self):
+        """Oldest creation time (ms) inside the retention period, None when unlimited"""
+        if self.retention_seconds is None:
+            return None
+        return int((self.clock() - self.retention_seconds) * 1000)
+    
+    # ---------- window bounds (writers hold the exclusive lock) ----------
+    
+    def _advance(self, count):
+        """Move the window floor past its `count` oldest rows"""
+        state = self.state
+        row = self._execute(
+            "SELECT rowid, id FROM predictions WHERE rowid >= ? ORDER BY rowid LIMIT 1 OFFSET ?",
+            (state._get('window_floor'), count)
+        ).fetchone()
+        if row is None:
+            # Nothing left: the window starts at the next row inserted
+            last = self._execute("SELECT IFNULL(MAX(rowid), 0) FROM predictions").fetchone()[0]
+            state._set('window_floor', last + 1)
+            state._set('window_size', 0)
+        else:
+            state._set('window_floor', row[0])
+            state._set('window_oldest_ms', id_millis(row[1]))
+            state._incr('window_size', -count)
+    
+    def _grow(self, added):
+        """Take `added` rows just appended to the table into the window"""
+        state = self.state
+        was_empty = state._get('window_size') == 0
+        state._incr('window_size', added)
+        excess = state._get('window_size') - self.max_size
+        if excess > 0:
+            self._advance(excess)
+            state._incr('window_evicted_by_size', excess)
+        elif was_empty:
+            self._advance(0)  # the oldest row is a new one
+    
+    def _expire(self):
+        """Drop rows older than the retention period from the front of the window"""
+        state = self.state
+        cutoff_ms = self._cutoff_ms()
+        while cutoff_ms is not None and state._get('window_size') and state._get('window_oldest_ms') < cutoff_ms:
+            ids = self._execute(
+                "SELECT id FROM predictions WHERE rowid >= ? ORDER BY rowid LIMIT ?",
+                (state._get('window_floor'), self.EXPIRE_CHUNK)
+            ).fetchall()
+            expired = next((i for i, (prediction_id,) in enumerate(ids) if id_millis(prediction_id) >= cutoff_ms), len(ids))
+            self._advance(expired)
+            state._incr('window_evicted_by_age', expired)
+    
+    def _refresh(self):
+        """Bring the bounds up to date, rebuilding them for a new segment or another max_size"""
+        state = self.state
+        if state._get('window_max_size') != self.max_size:
+            # One full count, only when the segment is (re)built
+            for field in WINDOW_FIELDS:
+                state._set(field, 0)
+            self._grow(self.database.count())
+            state._set('window_max_size', self.max_size)
+        self._expire()
+    
+    def _window(self):
+        """(lowest live rowid, live count), read from the shared segment"""
+        state = self.state
+        cutoff_ms = self._cutoff_ms()
+        if state.value('window_max_size') != self.max_size or (
+                cutoff_ms is not None and state.value('window_size') and state.value('window_oldest_ms') < cutoff_ms):
+            with state.exclusive():
+                self._refresh()
+        return state.values('window_floor', 'window_size')
+    
+    # ---------- writes ----------
+    
+    def add(self, prediction_id, record):
+        """Insert one record, visible to every worker once this returns"""
+        with self.state.exclusive():
+            self._refresh()
+            self.database.insert(record)
+            self._grow(1)
+            self.state._incr('history_generation')
+    
+    def add_batch(self, columns):
+        """Insert a batch given as column arrays in one transaction"""
+        with self.state.exclusive():
+            self._refresh()
+            self.database.insert_batch(columns)
+            self._grow(len(columns['id']))
+            self.state._incr('history_generation')
+        return len(columns['id'])
+    
+    # ---------- reads ----------
+    
+    def get(self, prediction_id):
+        floor = self._window()[0]
+        row = self._execute(
+            f"SELECT rowid, {', '.join(COLUMN_NAMES)} FROM predictions WHERE id = ?", (prediction_id,)
+        ).fetchone()
+        return row_to_record(row[1:]) if row is not None and row[0] >= floor else None
+    
+    def __contains__(self, prediction_id):
+        return self.get(prediction_id) is not None
+    
+    def _count(self):
+        return self._window()[1]
+    
+    def __len__(self):
+        return self._count()
+    
+    def values(self):
+        # +id: sort the window's rowid range instead of walking the whole ID index
+        rows = self._execute(self._select + " WHERE rowid >= ? ORDER BY +id", (self._window()[0],)).fetchall()
+        return [row_to_record(row) for row in rows]
+    
+    def recent(self, n):
+        rows = self._execute(
+            self._select + " WHERE +rowid >= ? ORDER BY id DESC LIMIT ?", (self._window()[0], n)
+        ).fetchall()
+        return [row_to_record(row) for row in reversed(rows)]
+    
+    def page(self, limit, offset=0, before=None, after=None, fields=None, columnar=False):
+        """Same contract as PredictionHistoryStore.page, two indexed queries"""
+        # Log position first: replaying changes from before the read is harmless
+        epoch, position = self.database.log_position()
+        floor, total = self._window()
+        # +rowid: walk the ID index in page order rather than the window's rowid range
+        if after is not None:
+            rows = self._execute(
+                self._select + " WHERE id > ? AND +rowid >= ? ORDER BY id LIMIT ?", (after, floor, limit + 1)
+            ).fetchall()
+            has_more = len(rows) > limit
+            rows = list(reversed(rows[:limit]))
+        else:
+            sql = self._select + " WHERE +rowid >= ?"
+            params = [floor]
+            if before is not None:
+                sql += " AND id < ?"
+                params.append(before)
+            rows = self._execute(sql + " ORDER BY id DESC LIMIT ? OFFSET ?", params + [limit + 1, offset]).fetchall()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+        records = [row_to_record(row) for row in rows]
+        return {
+            'records': project(records, fields, columnar),
+            'total': total,
+            'has_more': has_more,
+            'newest_id': records[0]['id'] if records else None,
+            'oldest_id': records[-1]['id'] if records else None,
+            'sync_cursor': f'{epoch}.{position}.{floor}'
+        }
+    
+    def changes(self, since, limit=1000, fields=None, columnar=False):
+        """
+        Same contract as PredictionHistoryStore.changes, from the table itself
+        
+        The cursor is (clear epoch, log position, window floor), all rowids but
+        the epoch: new records are the rows committed after the position that
+        are still in the window, removed ones the rows the floor has moved past.
+        """
+        epoch, current = self.database.log_position()
+        floor = self._window()[0]
+        try:
+            since_epoch, position, since_floor = (int(part) for part in since.split('.'))
+        except (AttributeError, ValueError):
+            since_epoch = position = since_floor = None
+        if since_epoch != epoch or position is None or position > current:
+            return {'records': project([], fields, columnar), 'removed': [], 'cursor': f'{epoch}.{current}.{floor}',
+                    'has_more': False, 'reset': True}
+        
+        rows = self._execute(
+            f"SELECT rowid, {', '.join(COLUMN_NAMES)} FROM predictions "
+            "WHERE rowid > ? AND rowid <= ? AND rowid >= ? ORDER BY rowid LIMIT ?",
+            (position, current, floor, limit + 1)
+        ).fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        end = rows[-1][0] if has_more else current
+        removed = [row[0] for row in self._execute(
+            "SELECT id FROM predictions WHERE rowid >= ? AND rowid < ? ORDER BY id", (since_floor, floor)
+        ).fetchall()] if since_floor < floor else []
+        return {
+            'records': project([row_to_record(row[1:]) for row in rows], fields, columnar),
+            'removed': removed,
+            'cursor': f'{epoch}.{end}.{floor}',
+            'has_more': has_more,
+            'reset': False
+        }
+    
+    def search(self, criteria, limit, offset=0, fields=None, columnar=False):
+        """
+        Same contract as PredictionHistoryStore.search, answered in SQL
+        
+        The in-memory index would only see this worker's inserts, so the
+        window is filtered in the database instead (a scan of at most
+        max_size rows, using the same normalizers as the index).
+        """
+        conditions = ["rowid >= ?"]
+        params = [self._window()[0]]
+        for name, value in criteria.items():
+            if name in TEXT_FIELDS:
+                escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                # Two characters match a word start, like the trigram index
+                pattern = f'% {escaped}%' if len(value) == 2 else f'%{escaped}%'
+                conditions.append(f"(' ' || normalize_text({TEXT_FIELDS[name]})) LIKE ? ESCAPE '\\'")
+                params.append(pattern)
+            else:
+                columns, normalize = EXACT_FIELDS[name]
+                conditions.append('(' + ' OR '.join(f'{normalize.__name__}({column}) = ?' for column in columns) + ')')
+                params.extend([value] * len(columns))
+        where = ' WHERE ' + ' AND '.join(conditions)
+        total = self._execute("SELECT COUNT(*) FROM predictions" + where, params).fetchone()[0]
+        rows = self._execute(self._select + where + " ORDER BY +id DESC LIMIT ? OFFSET ?",
+                             params + [limit, offset]).fetchall()
+        return {'records': project([row_to_record(row) for row in rows], fields, columnar), 'total': total}
+    
+    def clear(self):
+        """Delete every record for all workers; returns how many were in the window"""
+        with self.state.exclusive():
+            self._refresh()
+            count = self.state._get('window_size')
+            self.database.delete_all()
+            self.state._set('window_floor', 0)  # rowids start over in an empty table
+            self.state._set('window_size', 0)
+            self.state._incr('history_generation')
+        return count
+    
+    @property
+    def generation(self):
+        # Expiry moves the window without an insert, so the floor is part of the version
+        floor = self._window()[0]
+        return self.state.value('history_generation'), floor
+    
+    def get_stats(self):
+        _, size = self._window()
+        evicted_by_size, evicted_by_age = self.state.values('window_evicted_by_size', 'window_evicted_by_age')
+        return {
+            'backend': self.backend,
+            'size': size,
+            'max_size': self.max_size,
+            'retention_hours': self.retention_seconds / 3600 if self.retention_seconds else None,
+            'evicted_by_size': evicted_by_size,
+            'evicted_by_age': evicted_by_age,
+            'evicted_total': evicted_by_size + evicted_by_age,
+            'shared_state': self.state.get_stats()
+        }
@@ -0,0 +1,288 @@
+"""
+Prediction Snapshots
+Compacted copy of the aggregate stats and the newest history records as of a
+position in the prediction log, so a restart loads one file and replays only
+the predictions written after it instead of the whole database
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from models import StatisticsRecord
+from prediction_db import COLUMNS, COLUMN_NAMES
+
+SNAPSHOT_VERSION = 1
+
+# Column dtypes in memory and on disk; TEXT columns are object arrays in memory
+# and UTF-8 blobs with offsets on disk (no pickles, so loading runs no code)
+COLUMN_DTYPES = {
+    name: {'INTEGER': np.int64, 'REAL': np.float64}.get(kind.split()[0], object)
+    for name, kind in COLUMNS
+}
+
+# A prediction-log row, with the attributes StatisticsRecord.add_prediction reads
+LogRow = namedtuple('LogRow', ('rowid',) + COLUMN_NAMES)
+
+# ==================== ENCODING ====================
+
+def encode_text(values):
+    """Object array of str/None -> (UTF-8 blob, end offsets, null mask)"""
+    parts = [value.encode() if value is not None else b'' for value in values.tolist()]
+    ends = np.cumsum([len(part) for part in parts], dtype=np.int64)
+    nulls = np.fromiter((value is None for value in values.tolist()), dtype=bool, count=len(values))
+    return np.frombuffer(b''.join(parts), dtype=np.uint8), ends, nulls
+
+def decode_text(blob, ends, nulls):
+    data = blob.tobytes()
+    values = np.empty(len(ends), dtype=object)
+    start = 0
+    for i, (end, null) in enumerate(zip(ends.tolist(), nulls.tolist())):
+        values[i] = None if null else data[start:end].decode()
+        start = end
+    return values
+
+def empty_columns():
+    return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMN_DTYPES.items()}
+
+def rows_to_columns(rows):
+    """LogRow-shaped tuples -> column arrays, sorted by prediction ID"""
+    rows = sorted(rows, key=lambda row: row[1])
+    values = list(zip(*rows))[1:] if rows else [()] * len(COLUMN_NAMES)
+    columns = {}
+    for name, column in zip(COLUMN_NAMES, values):
+        dtype = COLUMN_DTYPES[name]
+        if dtype is object:
+            array = np.empty(len(column), dtype=object)
+            array[:] = column
+        else:
+            array = np.array([np.nan if value is None else value for value in column], dtype=np.float64)
+            array = array if dtype is np.float64 else array.astype(dtype)
+        columns[name] = array
+    return columns
+
+# ==================== SNAPSHOT ====================
+
+class PredictionSnapshot:
+    """
+    Stats plus the newest `history_size` records, as of one log position
+    
+    `advance()` folds in rows read after `position`; `save()` writes the
+    result atomically (temp file + rename), so a reader only ever sees a
+    complete snapshot. `epoch` is the database clear counter it belongs to.
+    """
+    
+    def __init__(self, history_size, epoch=0, position=0, stats=None, columns=None):
+        self.history_size = history_size
+        self.epoch = epoch
+        self.position = position
+        self.stats = stats or StatisticsRecord()
+        self.columns = columns if columns is not None else empty_columns()
+        self.created_at = None
+    
+    def __len__(self):
+        return len(self.columns['id'])
+    
+    def advance(self, rows):
+        """Fold log rows (rowid order, all after `position`) into the stats and history"""
+        if not rows:
+            return
+        for row in map(LogRow._make, rows):
+            self.stats.add_prediction(row)
+        
+        fresh = rows_to_columns(rows[-self.history_size:])
+        ids = self.columns['id']
+        columns = {name: np.concatenate([self.columns[name], fresh[name]]) for name in COLUMN_NAMES}
+        if len(ids) and len(fresh['id']) and fresh['id'][0] < ids[-1]:
+            # Another worker committed an older ID late: restore ID order
+            order = np.argsort(columns['id'], kind='stable')
+            columns = {name: column[order] for name, column in columns.items()}
+        self.columns = {name: column[-self.history_size:] for name, column in columns.items()}
+        self.position = rows[-1][0]
+    
+    def records(self, since_timestamp=None):
+        """Column arrays of the kept records, optionally only from a timestamp on"""
+        if since_timestamp is None:
+            return self.columns
+        keep = self.columns['timestamp'] >= since_timestamp
+        return {name: column[keep] for name, column in self.columns.items()}
+    
+    def save(self, path):
+        arrays = {}
+        for name, column in self.columns.items():
+            if COLUMN_DTYPES[name] is object:
+                arrays[f'{name}.blob'], arrays[f'{name}.ends'], arrays[f'{name}.nulls'] = encode_text(column)
+            else:
+                arrays[name] = column
+        meta = {
+            'version': SNAPSHOT_VERSION,
+            'epoch': self.epoch,
+            'position': self.position,
+            'records': len(self),
+            'created_at': time.time(),
+            'stats': self.stats.to_state()
+        }
+        arrays['meta'] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+        
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'wb') as f:
+            np.savez(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        self.created_at = meta['created_at']
+    
+    @classmethod
+    def load(cls, path, history_size):
+        """Snapshot saved at `path`, or None if there is none (or it is unreadable)"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(data['meta'].tobytes())
+                if meta.get('version') != SNAPSHOT_VERSION:
+                    return None
+                columns = {}
+                for name, dtype in COLUMN_DTYPES.items():
+                    if dtype is object:
+                        columns[name] = decode_text(data[f'{name}.blob'], data[f'{name}.ends'], data[f'{name}.nulls'])
+                    else:
+                        columns[name] = data[name]
+                stats = StatisticsRecord.from_state(meta['stats'])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logging.getLogger('cardio_db').warning(f"Ignoring unreadable snapshot {path}: {e}")
+            return None
+        snapshot = cls(history_size, meta['epoch'], meta['position'], stats,
+                       {name: column[-history_size:] for name, column in columns.items()})
+        snapshot.created_at = meta['created_at']
+        return snapshot
+    
+    @staticmethod
+    def read_meta(path):
+        """Header of the snapshot at `path` (no records are read), or None"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return json.loads(data['meta'].tobytes())
+        except (OSError, ValueError, KeyError):
+            return None
+
+def catch_up(snapshot, database, batch_size=20000):
+    """
+    Bring a snapshot up to the end of the prediction log
+    
+    Returns (snapshot, rows replayed). A snapshot from before a clear is
+    replaced by an empty one; if a clear lands while catching up, the work is
+    thrown away and redone from the new epoch.
+    """
+    for _ in range(3):
+        epoch, upto = database.log_position()
+        if snapshot.epoch != epoch:
+            snapshot = PredictionSnapshot(snapshot.history_size, epoch)
+        replayed = 0
+        for rows in database.read_log(snapshot.position, upto, batch_size):
+            snapshot.advance(rows)
+            replayed += len(rows)
+        if database.log_position()[0] == epoch:
+            return snapshot, replayed
+        snapshot = PredictionSnapshot(snapshot.history_size, -1)
+    raise RuntimeError('Prediction log kept being cleared while catching up')
+
+# ==================== BACKGROUND WRITER ====================
+
+class Snapshotter:
+    """
+    Keeps the snapshot file current from a background thread
+    
+    Every `interval` seconds it reads the log rows written since its last
+    snapshot (its own SQLite connection; WAL readers never block the writer
+    or request threads) and, if there were any, saves a new snapshot. A lock
+    file lets one worker write at a time; the others pick up its snapshot.
+    """
+    
+    def __init__(self, database, path, snapshot, interval=60.0):
+        self.database = database
+        self.path = path
+        self.interval = interval
+        self.logger = logging.getLogger('cardio_db')
+        self._snapshot = snapshot
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        
+        self.snapshots = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_duration_ms = None
+        self.last_replayed = 0
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='prediction-snapshotter', daemon=True)
+        self._thread.start()
+        return self
+    
+    def _run(self):
+        # First pass right away: saves what startup had to replay
+        while True:
+            self.snapshot_now()
+            if self._stop.wait(self.interval):
+                break
+    
+    def snapshot_now(self):
+        """Catch up with the log and save; returns False if there was nothing to do"""
+        with self._lock, open(f'{self.path}.lock', 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False  # another worker is writing one right now
+            start = time.perf_counter()
+            try:
+                snapshot = self._snapshot
+                meta = PredictionSnapshot.read_meta(self.path)
+                if meta and (meta['epoch'], meta['position']) != (snapshot.epoch, snapshot.position):
+                    # Another worker saved since; continue from its file
+                    snapshot = PredictionSnapshot.load(self.path, snapshot.history_size) or snapshot
+                epoch = snapshot.epoch
+                snapshot, replayed = catch_up(snapshot, self.database)
+                self._snapshot = snapshot
+                if not replayed and snapshot.epoch == epoch and meta is not None:
+                    return False
+                snapshot.save(self.path)
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                self.logger.error(f"Prediction snapshot failed: {e}")
+                return False
+        
+        self.snapshots += 1
+        self.last_replayed = replayed
+        self.last_duration_ms = (time.perf_counter() - start) * 1000
+        return True
+    
+    def stop(self, final=True):
+        """Stop the thread; with `final`, commit queued rows and save once more"""
+        self._stop.set()
+        if final:
+            self.database.flush(5.0)
+            self.snapshot_now()
+    
+    def get_stats(self):
+        snapshot = self._snapshot
+        return {
+            'path': self.path,
+            'interval_seconds': self.interval,
+            'position': snapshot.position,
+            'records': len(snapshot),
+            'total_predictions': snapshot.stats.total_predictions,
+            'created_at': snapshot.created_at,
+            'snapshots_written': self.snapshots,
+            'last_replayed': self.last_replayed,
+            'last_duration_ms': round(self.last_duration_ms, 3) if self.last_duration_ms is not None else None,
+            'errors': self.errors,
+            'last_error': self.last_error
+        }
@@ -74,6 +74,37 @@ const API = {
         }
     },
 
+    // ===== Composite Dashboard API =====
+
+    // Section ETags and data from earlier getDashboard() calls
+    dashboardCache: { etags: {}, data: {} },
+
+    // Analytics, model info, health, prediction status/stats/history in one request.
+    // Sections unchanged since the last call are left out by the server and
+    // answered from dashboardCache. Returns { section name: data }
+    async getDashboard(sections = null, historyLimit = 10) {
+        try {
+            const params = new URLSearchParams({ history_limit: historyLimit });
+            if (sections) params.set('sections', sections.join(','));
+            const known = Object.values(this.dashboardCache.etags).map(etag => `"${etag}"`);
+            const response = await fetch(`${this.base}/dashboard?${params}`, {
+                headers: known.length ? { 'If-None-Match': known.join(', ') } : {}
+            });
+            if (response.status !== 304) {
+                const result = await response.json();
+                Object.entries(result.sections).forEach(([name, section]) => {
+                    this.dashboardCache.etags[name] = section.etag;
+                    this.dashboardCache.data[name] = section.data;
+                });
+            }
+            const names = sections || Object.keys(this.dashboardCache.data);
+            return Object.fromEntries(names.map(name => [name, this.dashboardCache.data[name]]));
+        } catch (error) {
+            console.error('Dashboard error:', error);
+            throw error;
+        }
+    },
+
     // ===== Prediction Status Tracking APIs =====
 
     async getPredictionStatus(predictionId) {
@@ -96,9 +127,11 @@ const API = {
         }
     },
 
-    async getPredictionHistory(limit = 100, offset = 0) {
+    // Pass the previous page's next_cursor to keep paging back while new predictions arrive
+    async getPredictionHistory(limit = 100, offset = 0, cursor = null) {
         try {
-            const response = await fetch(`${this.base}/prediction-history?limit=${limit}&offset=${offset}`);
+            const page = cursor ? `before=${encodeURIComponent(cursor)}` : `offset=${offset}`;
+            const response = await fetch(`${this.base}/prediction-history?limit=${limit}&${page}`);
             return await response.json();
         } catch (error) {
             console.error('Error getting prediction history:', error);
@@ -106,6 +139,66 @@ const API = {
         }
     },
 
+    // Records stored and IDs evicted after a sync cursor (a history page's sync_cursor
+    // or the previous call's cursor); reset: true means the pages must be reloaded
+    async getPredictionChanges(cursor, limit = 1000) {
+        try {
+            const response = await fetch(`${this.base}/prediction-history?since=${encodeURIComponent(cursor)}&limit=${limit}`);
+            return await response.json();
+        } catch (error) {
+            console.error('Error getting prediction changes:', error);
+            throw error;
+        }
+    },
+
+    // Local copy of the server history (prediction ID -> record), kept current
+    // with delta requests so a refresh downloads only what changed
+    createHistorySync() {
+        const api = this;
+        return {
+            records: new Map(),
+            cursor: null,
+
+            async reload() {
+                let page = await api.getPredictionHistory(1000);
+                const cursor = page.sync_cursor;
+                this.records.clear();
+                for (;;) {
+                    page.predictions.forEach(pred => this.records.set(pred.id, pred));
+                    if (!page.has_more) break;
+                    page = await api.getPredictionHistory(1000, 0, page.next_cursor);
+                }
+                this.cursor = cursor;
+            },
+
+            // Returns true if anything changed since the last refresh
+            async refresh() {
+                if (this.cursor === null) {
+                    await this.reload();
+                    return true;
+                }
+                let changed = false;
+                for (;;) {
+                    const delta = await api.getPredictionChanges(this.cursor);
+                    if (delta.reset) {
+                        await this.reload();
+                        return true;
+                    }
+                    delta.removed.forEach(id => this.records.delete(id));
+                    delta.predictions.forEach(pred => this.records.set(pred.id, pred));
+                    changed = changed || delta.removed.length > 0 || delta.predictions.length > 0;
+                    this.cursor = delta.cursor;
+                    if (!delta.has_more) return changed;
+                }
+            },
+
+            // Records newest first
+            list() {
+                return [...this.records.values()].sort((a, b) => (a.id < b.id ? 1 : -1));
+            }
+        };
+    },
+
     async getPredictionDetailedStats() {
         try {
             const response = await fetch(`${this.base}/prediction-stats`);
@@ -126,6 +219,27 @@ const API = {
         }
     },
 
+    // Live stat deltas over Server-Sent Events instead of polling.
+    // handlers: { onSnapshot(totals), onUpdate(frame) }; returns the EventSource
+    subscribeLiveStats(handlers = {}) {
+        if (!window.EventSource) {
+            return null;
+        }
+        const source = new EventSource(`${this.base}/stream`);
+        source.addEventListener('snapshot', event => {
+            const data = JSON.parse(event.data);
+            if (handlers.onSnapshot) handlers.onSnapshot(data.totals);
+        });
+        source.addEventListener('stats', event => {
+            const frame = JSON.parse(event.data);
+            if (handlers.onUpdate) handlers.onUpdate(frame);
+        });
+        source.onerror = () => {
+            console.warn('Live stats stream interrupted, browser will reconnect');
+        };
+        return source;
+    },
+
     async clearPredictionHistory() {
         try {
             const response = await fetch(`${this.base}/clear-history`, {
@@ -0,0 +1,46 @@
+"""
+Shared fixtures: the app modules are flat files in the project root
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_store import SortableIdGenerator
+from prediction_db import PredictionDatabase
+from shared_state import SharedHistoryStore, SharedState
+
+def make_record(prediction_id, **fields):
+    """A record shaped like PredictionRecord.to_dict(); keyword args override fields"""
+    record = {
+        'id': prediction_id, 'prediction': 0, 'has_disease': False,
+        'disease_probability': 0.2, 'healthy_probability': 0.8, 'risk_percentage': 20.0,
+        'risk_level': 'Low Risk', 'color': 'green', 'age_days': 18250, 'age_years': 50, 'gender': 1,
+        'height': 170.0, 'weight': 70.0, 'bp_systolic': 120.0, 'bp_diastolic': 80.0,
+        'cholesterol': 1, 'gluc': 1, 'smoke': 0, 'alco': 0, 'active': 1,
+        'patient_name': 'Asha Rao', 'father_name': 'Ravi Rao', 'blood_group': 'O+',
+        'phone_number': '+91 98765 43210', 'alt_phone_number': None, 'doctor_name': 'Dr. Iyer',
+        'timestamp': '2026-01-01T00:00:00', 'status': 'completed'
+    }
+    record.update(fields)
+    return record
+
+@pytest.fixture
+def new_record():
+    """make_record with fresh, increasing prediction IDs"""
+    ids = SortableIdGenerator()
+    return lambda **fields: make_record(ids.next_id(), **fields)
+
+@pytest.fixture
+def database(tmp_path):
+    return PredictionDatabase(str(tmp_path / 'predictions.db'))
+
+@pytest.fixture
+def shared_history(database, tmp_path):
+    """SharedHistoryStore over a fresh database and segment"""
+    state = SharedState(str(tmp_path / 'predictions.db-stats'))
+    state.attach(database)
+    return SharedHistoryStore(database, state, max_size=5, retention_hours=None)
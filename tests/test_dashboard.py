@@ -0,0 +1,57 @@
+"""
+Composite dashboard response: sections spliced from cached JSON text
+"""
+
+import json
+
+from cache import SectionCache
+
+def counting(data):
+    """Builder returning `data`, counting its calls"""
+    def build():
+        build.calls += 1
+        return data
+    build.calls = 0
+    return build
+
+def test_compose_splices_valid_json():
+    cache = SectionCache()
+    builders = {'stats': counting({'total': 3, 'rate': 0.5}), 'health': counting('{"ok":true}'),
+                'raw': counting(b'[1,2]')}
+    etags = {'stats': 'e1', 'health': 'e2', 'raw': 'e3'}
+    
+    text, unchanged = cache.compose(builders, etags)
+    
+    assert json.loads(text) == {
+        'stats': {'etag': 'e1', 'data': {'total': 3, 'rate': 0.5}},
+        'health': {'etag': 'e2', 'data': {'ok': True}},
+        'raw': {'etag': 'e3', 'data': [1, 2]}
+    }
+    assert list(json.loads(text)) == list(builders)
+    assert unchanged == []
+
+def test_compose_leaves_out_known_sections():
+    cache = SectionCache()
+    builders = {'stats': counting({'total': 1}), 'health': counting({'ok': True})}
+    
+    text, unchanged = cache.compose(builders, {'stats': 'e1', 'health': 'e2'}, known={'e2'}.__contains__)
+    
+    assert json.loads(text) == {'stats': {'etag': 'e1', 'data': {'total': 1}}}
+    assert unchanged == ['health']
+    assert builders['health'].calls == 0
+
+def test_sections_rebuild_only_when_their_etag_moves():
+    cache = SectionCache()
+    stats, health = counting({'total': 1}), counting({'ok': True})
+    builders = {'stats': stats, 'health': health}
+    
+    first, _ = cache.compose(builders, {'stats': 'e1', 'health': 'e2'})
+    again, _ = cache.compose(builders, {'stats': 'e1', 'health': 'e2'})
+    cache.compose(builders, {'stats': 'e1b', 'health': 'e2'})
+    
+    assert again == first
+    assert (stats.calls, health.calls) == (2, 1)
+    assert cache.get_stats() == {'sections': ['health', 'stats'], 'hits': 3, 'builds': 3}
+
+def test_empty_compose():
+    assert SectionCache().compose({}, {}) == ('{}', [])
@@ -0,0 +1,53 @@
+"""
+History export: chunked reads of the history store and the prediction database
+"""
+
+from history_export import csv_stream, iter_database, iter_history
+from history_store import ColumnarHistoryStore, PredictionHistoryStore
+
+def filled_store(store_class, new_record, count=7):
+    store = store_class(max_size=100, retention_hours=None)
+    records = [new_record(patient_name=f'Patient {i}') for i in range(count)]
+    for record in records:
+        store.add(record['id'], record)
+    return store, records
+
+def test_chunks_cover_the_history_oldest_first(new_record):
+    for store_class in (PredictionHistoryStore, ColumnarHistoryStore):
+        store, records = filled_store(store_class, new_record)
+        chunks = list(iter_history(store, chunk_size=3))
+        assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+        assert [record for chunk in chunks for record in chunk] == records
+
+def test_fields_are_trimmed_by_the_store(new_record):
+    store, records = filled_store(ColumnarHistoryStore, new_record)
+    
+    chunks = list(iter_history(store, chunk_size=3, fields=['patient_name']))
+    
+    assert [record for chunk in chunks for record in chunk] == [{'patient_name': r['patient_name']} for r in records]
+
+def test_last_bound_without_the_id_field(new_record):
+    store, records = filled_store(PredictionHistoryStore, new_record)
+    
+    chunks = iter_history(store, chunk_size=3, after=records[1]['id'], last=records[4]['id'], fields=['patient_name'])
+    
+    body = b''.join(csv_stream(chunks, ['patient_name'])).decode()
+    assert body.splitlines() == ['patient_name', 'Patient 2', 'Patient 3', 'Patient 4']
+
+def test_database_export_is_not_limited_to_the_memory_window(database, new_record):
+    store = ColumnarHistoryStore(max_size=3, retention_hours=None)
+    records = [new_record(patient_name=f'Patient {i}', prediction=i % 2, has_disease=bool(i % 2)) for i in range(7)]
+    for record in records:
+        store.add(record['id'], record)
+        database.enqueue(record)
+    assert database.flush()
+    
+    assert sum(len(chunk) for chunk in iter_history(store)) == 3
+    chunks = list(iter_database(database, chunk_size=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert [record['id'] for chunk in chunks for record in chunk] == [record['id'] for record in records]
+    
+    chunks = iter_database(database, chunk_size=2, after=records[1]['id'], last=records[4]['id'], fields=['has_disease', 'patient_name'])
+    exported = [record for chunk in chunks for record in chunk]
+    assert [record['patient_name'] for record in exported] == ['Patient 2', 'Patient 3', 'Patient 4']
+    assert [record['has_disease'] for record in exported] == [record['has_disease'] for record in records[2:5]]
@@ -0,0 +1,246 @@
+"""
+History stores: the dict and columnar backends behind /api/prediction-history
+"""
+
+import pytest
+
+from conftest import make_record
+from history_store import RECORD_FIELDS, ColumnarHistoryStore, PredictionHistoryStore, SortableIdGenerator, create_history_store
+
+@pytest.fixture(params=['dict', 'columnar'])
+def backend(request):
+    return request.param
+
+def ids_of(records):
+    return [record['id'] for record in records]
+
+def filled(backend, new_record, count, max_size=100):
+    store = create_history_store(backend, max_size=max_size, retention_hours=None)
+    records = [new_record(patient_name=f'Patient {i}') for i in range(count)]
+    for record in records:
+        store.add(record['id'], record)
+    return store, records
+
+# ==================== LIMITS AND PAGES ====================
+
+def test_sortable_ids_increase_within_a_millisecond():
+    ids = SortableIdGenerator(clock=lambda: 1_700_000_000.0).next_ids(1000)
+    assert ids == sorted(set(ids))
+    assert all(len(prediction_id) == 20 for prediction_id in ids)
+
+def test_size_limit_evicts_oldest(backend, new_record):
+    store, records = filled(backend, new_record, 8, max_size=5)
+    
+    assert ids_of(store.values()) == ids_of(records[3:])
+    assert ids_of(store.recent(2)) == ids_of(records[-2:])
+    assert store.get_stats()['evicted_by_size'] == 3
+    assert records[0]['id'] not in store
+
+def test_age_limit_expires_old_records(backend):
+    now = [1_700_000_000.0]
+    clock = lambda: now[0]
+    ids = SortableIdGenerator(clock=clock)
+    store = create_history_store(backend, max_size=10, retention_hours=1, clock=clock)
+    old = make_record(ids.next_id())
+    store.add(old['id'], old)
+    now[0] += 1800
+    fresh = make_record(ids.next_id())
+    store.add(fresh['id'], fresh)
+    generation = store.generation
+    
+    now[0] += 1801
+    
+    assert ids_of(store.values()) == [fresh['id']]
+    assert store.generation != generation
+    assert store.get_stats()['evicted_by_age'] == 1
+
+def test_cursor_pages_do_not_skip_or_repeat(backend, new_record):
+    store, records = filled(backend, new_record, 10)
+    first = store.page(4)
+    for _ in range(3):  # arriving while the client scrolls back
+        record = new_record()
+        store.add(record['id'], record)
+    second = store.page(4, before=first['oldest_id'])
+    third = store.page(4, before=second['oldest_id'])
+    
+    seen = ids_of(first['records']) + ids_of(second['records']) + ids_of(third['records'])
+    assert seen == ids_of(records[::-1])
+    assert (first['has_more'], third['has_more']) == (True, False)
+    assert first['newest_id'] == records[-1]['id']
+
+def test_after_cursor_returns_the_oldest_newer_records(backend, new_record):
+    store, records = filled(backend, new_record, 10)
+    
+    page = store.page(3, after=records[4]['id'])
+    
+    assert ids_of(page['records']) == ids_of(records[5:8][::-1])
+    assert page['has_more']
+
+def test_offset_pages_and_total(backend, new_record):
+    store, records = filled(backend, new_record, 6)
+    
+    page = store.page(2, offset=2)
+    
+    assert ids_of(page['records']) == [records[3]['id'], records[2]['id']]
+    assert page['total'] == 6
+
+def test_replacing_a_record_keeps_its_place(backend, new_record):
+    store, records = filled(backend, new_record, 3)
+    updated = dict(records[1], status='reviewed')
+    
+    store.add(updated['id'], updated)
+    
+    assert store.values() == [records[0], updated, records[2]]
+
+def test_clear(backend, new_record):
+    store, _ = filled(backend, new_record, 4)
+    
+    assert store.clear() == 4
+    assert len(store) == 0
+    record = new_record()
+    store.add(record['id'], record)
+    assert store.values() == [record]
+
+def test_backends_return_the_same_records(new_record):
+    records = [new_record(weight=70.5, alt_phone_number='123') for _ in range(3)]
+    stores = [PredictionHistoryStore(retention_hours=None), ColumnarHistoryStore(retention_hours=None)]
+    for store in stores:
+        for record in records:
+            store.add(record['id'], record)
+    
+    assert stores[0].values() == stores[1].values() == records
+
+# ==================== PROJECTION AND DELTA SYNC ====================
+
+def test_projection_and_columnar_pages(backend, new_record):
+    store, records = filled(backend, new_record, 3)
+    
+    rows = store.page(2, fields=['patient_name', 'id'])['records']
+    columns = store.page(2, fields=['id', 'patient_name'], columnar=True)['records']
+    
+    assert rows == [{'patient_name': r['patient_name'], 'id': r['id']} for r in records[:0:-1]]
+    assert columns == {'id': ids_of(records[:0:-1]), 'patient_name': ['Patient 2', 'Patient 1']}
+    assert store.page(0, columnar=True)['records'] == {name: [] for name in RECORD_FIELDS}
+
+def test_changes_since_a_page(backend, new_record):
+    store, records = filled(backend, new_record, 5, max_size=5)
+    cursor = store.page(5)['sync_cursor']
+    added = [new_record() for _ in range(2)]
+    for record in added:
+        store.add(record['id'], record)
+    updated = dict(records[4], status='reviewed')
+    store.add(updated['id'], updated)
+    
+    delta = store.changes(cursor)
+    
+    assert not delta['reset'] and not delta['has_more']
+    assert delta['removed'] == ids_of(records[:2])
+    assert delta['records'] == added + [updated]
+    assert store.changes(delta['cursor'])['records'] == []
+
+def test_changes_in_limited_steps(backend, new_record):
+    store, _ = filled(backend, new_record, 1)
+    cursor = store.page(1)['sync_cursor']
+    added = [new_record() for _ in range(5)]
+    for record in added:
+        store.add(record['id'], record)
+    
+    seen = []
+    while True:
+        delta = store.changes(cursor, limit=2, fields=['id'])
+        seen += ids_of(delta['records'])
+        cursor = delta['cursor']
+        if not delta['has_more']:
+            break
+    
+    assert seen == ids_of(added)
+
+def test_changes_ask_for_a_reload(backend, new_record):
+    store, _ = filled(backend, new_record, 3, max_size=100)
+    small = create_history_store(backend, max_size=10, retention_hours=None, change_log_size=2)
+    for record in store.values():
+        small.add(record['id'], record)
+    cursor = store.page(1)['sync_cursor']
+    small_cursor = small.page(1)['sync_cursor']
+    record = new_record()
+    for target in (store, small):
+        target.add(record['id'], record)
+    
+    assert store.changes('garbage')['reset']
+    assert store.changes(small_cursor)['reset']  # another store's (or server run's) cursor
+    assert not store.changes(cursor)['reset']
+    
+    for _ in range(3):
+        extra = new_record()
+        small.add(extra['id'], extra)
+    assert small.changes(small_cursor)['reset']  # fell out of the change log
+    
+    store.clear()
+    assert store.changes(cursor)['reset']
+
+# ==================== COLUMNAR CAPACITY ====================
+
+def test_columnar_rejects_pool_overflow_before_evicting(new_record):
+    store = ColumnarHistoryStore(max_size=255, retention_hours=None)
+    records = [new_record(risk_level=f'level {i}') for i in range(255)]  # every uint8 code in use
+    for record in records:
+        store.add(record['id'], record)
+    
+    overflow = new_record(risk_level='one too many')
+    with pytest.raises(ValueError, match='risk_level'):
+        store.add(overflow['id'], overflow)
+    
+    assert len(store) == 255
+    assert store.get(records[0]['id']) == records[0]
+    assert overflow['id'] not in store
+    
+    reused = new_record(risk_level='level 7')
+    store.add(reused['id'], reused)
+    assert store.get(reused['id']) == reused
+    assert records[0]['id'] not in store
+
+def test_columnar_holds_one_blood_group_per_record(new_record):
+    store = ColumnarHistoryStore(max_size=300, retention_hours=None)
+    records = [new_record(blood_group=f'free text {i}') for i in range(300)]
+    for record in records:
+        store.add(record['id'], record)
+    
+    assert [record['blood_group'] for record in store.values()] == [record['blood_group'] for record in records]
+
+def batch_columns(records):
+    return {name: [record[name] for record in records] for name in records[0]}
+
+def test_columnar_batch_overflow_leaves_ring_intact(new_record):
+    store = ColumnarHistoryStore(max_size=200, retention_hours=None)
+    kept = [new_record(risk_level=f'level {i}') for i in range(200)]
+    store.add_batch(batch_columns(kept))
+    
+    with pytest.raises(ValueError, match='risk_level'):
+        store.add_batch(batch_columns([new_record(risk_level=f'new {i}') for i in range(100)]))
+    
+    assert store.values() == kept
+    assert store.get_stats()['interned_strings']['risk_level'] == 200
+
+def test_columnar_keeps_equal_keys_from_different_nodes():
+    # Two workers, same millisecond and sequence: IDs differ only in the node tag
+    ids = ['0000000001000000' + node for node in ('0001', '0002', '00ff')]
+    batch = [make_record(prediction_id) for prediction_id in ids[:2]]
+    store = ColumnarHistoryStore(max_size=10, retention_hours=None)
+    
+    assert store.add_batch(batch_columns(batch)) == 2
+    store.add(ids[2], make_record(ids[2]))
+    
+    assert [record['id'] for record in store.values()] == ids
+    assert all(store.get(prediction_id)['id'] == prediction_id for prediction_id in ids)
+    assert [record['id'] for record in store.page(10, before=ids[2])['records']] == ids[1::-1]
+    assert [record['id'] for record in store.page(10, after=ids[0])['records']] == ids[:0:-1]
+    older = '0000000001000000' + '0000'
+    with pytest.raises(ValueError):
+        store.add(older, make_record(older))
+
+def test_columnar_counts_out_of_order_batch_records():
+    ids = ['0000000002000000' + '0001', '0000000001000000' + '0001', '0000000003000000' + '0001']
+    store = ColumnarHistoryStore(max_size=10, retention_hours=None)
+    
+    assert store.add_batch(batch_columns([make_record(prediction_id) for prediction_id in ids])) == 2
+    assert store.get_stats()['rejected_out_of_order'] == 1
@@ -0,0 +1,72 @@
+"""
+StatsBroadcaster: frame coalescing, Last-Event-ID replay and the subscriber cap
+"""
+
+import json
+
+from live_stream import StatsBroadcaster
+
+def make_broadcaster(**options):
+    # A slow flusher thread, so frames are cut only by the explicit flush() calls below
+    options.setdefault('max_rate_hz', 0.01)
+    return StatsBroadcaster(lambda: {'total': 0}, **options)
+
+def events(chunk):
+    """Encoded SSE messages -> [(event, id, data)]"""
+    parsed = []
+    for message in chunk.decode('utf-8').strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in message.splitlines() if not line.startswith(('retry', ':')))
+        if fields:
+            parsed.append((fields['event'], int(fields['id']), json.loads(fields['data'])))
+    return parsed
+
+def test_publishes_coalesce_into_one_frame():
+    broadcaster = make_broadcaster()
+    stream = broadcaster.subscribe()
+    next(stream)  # retry hint
+    assert events(next(stream))[0][0] == 'snapshot'
+    
+    for risk_level in ('Low Risk', 'High Risk', 'High Risk'):
+        broadcaster.publish_prediction({'has_disease': risk_level == 'High Risk', 'risk_level': risk_level})
+    broadcaster.flush()
+    
+    [(event, seq, data)] = events(next(stream))
+    assert (event, seq) == ('stats', 1)
+    assert data['delta'] == {'predictions': 3, 'disease': 2, 'low_risk': 1, 'moderate_risk': 0, 'high_risk': 2}
+    assert len(data['predictions']) == 3
+    stream.close()
+
+def test_last_event_id_replays_missed_frames():
+    broadcaster = make_broadcaster(backlog=3)
+    for _ in range(4):
+        broadcaster.publish_prediction({'risk_level': 'Low Risk'})
+        broadcaster.flush()
+    
+    stream = broadcaster.subscribe(last_event_id='2')
+    next(stream)
+    assert [(event, seq) for event, seq, _ in events(next(stream))] == [('stats', 3), ('stats', 4)]
+    stream.close()
+    
+    # Frame 2 has left the backlog: too far behind to replay, start from a snapshot
+    stream = broadcaster.subscribe(last_event_id='0')
+    next(stream)
+    assert [(event, seq) for event, seq, _ in events(next(stream))] == [('snapshot', 4)]
+    stream.close()
+
+def test_subscriber_cap_counts_streams_not_yet_iterated():
+    broadcaster = make_broadcaster(max_subscribers=2)
+    first, second = broadcaster.subscribe(), broadcaster.subscribe()
+    
+    assert broadcaster.subscribe() is None
+    assert broadcaster.get_stats()['rejected_subscribers'] == 1
+    
+    # Closed before the server ever iterated it: the slot still comes back, once
+    first.close()
+    first.close()
+    assert broadcaster.get_stats()['subscribers'] == 1
+    
+    third = broadcaster.subscribe()
+    next(third)
+    third.close()
+    second.close()
+    assert broadcaster.get_stats()['subscribers'] == 0
@@ -0,0 +1,70 @@
+"""
+PredictionDatabase: the write-behind queue
+"""
+
+import sqlite3
+
+import prediction_db
+from conftest import make_record
+from prediction_db import PredictionDatabase
+
+def test_batches_and_clears_commit_in_queue_order(database, new_record):
+    database.enqueue(new_record())
+    database.enqueue_clear()
+    records = [new_record() for _ in range(3)]
+    database.enqueue_batch({name: [record[name] for record in records] for name in records[0]})
+    
+    assert database.flush()
+    assert [record['id'] for record in database.iter_records()] == [record['id'] for record in records]
+    assert database.get_stats()['written'] == 4
+
+def test_full_queue_drops_inserts_without_blocking(tmp_path):
+    database = PredictionDatabase(str(tmp_path / 'full.db'), queue_size=0)
+    
+    assert database.enqueue(make_record('a')) is False
+    assert database.enqueue_batch({'id': ['b', 'c']}) is False
+    assert database.enqueue_clear() is True
+    assert database.flush()
+    assert database.get_stats()['dropped'] == 3
+
+def test_batch_size_stats_count_rows(database, new_record):
+    records = [new_record() for _ in range(3)]
+    database.enqueue_batch({name: [record[name] for record in records] for name in records[0]})
+    
+    assert database.flush()
+    stats = database.get_stats()
+    assert stats['last_batch_size'] == 3
+    assert stats['avg_batch_size'] == 3.0
+
+def failing_rows(monkeypatch, failures):
+    """Make the next `failures` batch conversions raise, as a locked or full database would"""
+    calls = []
+    def columns_to_rows(columns):
+        calls.append(1)
+        if len(calls) <= failures:
+            raise sqlite3.OperationalError('database is locked')
+        return original(columns)
+    original = prediction_db.columns_to_rows
+    monkeypatch.setattr(prediction_db, 'columns_to_rows', columns_to_rows)
+
+def test_failed_commit_is_retried(monkeypatch, tmp_path, new_record):
+    database = PredictionDatabase(str(tmp_path / 'retry.db'), retry_backoff=0.01)
+    failing_rows(monkeypatch, 2)
+    records = [new_record() for _ in range(3)]
+    database.enqueue_batch({name: [record[name] for record in records] for name in records[0]})
+    
+    assert database.flush()
+    assert [record['id'] for record in database.iter_records()] == [record['id'] for record in records]
+    stats = database.get_stats()
+    assert (stats['written'], stats['retries'], stats['lost']) == (3, 2, 0)
+
+def test_batch_is_lost_only_after_every_retry(monkeypatch, tmp_path, new_record):
+    database = PredictionDatabase(str(tmp_path / 'lost.db'), commit_retries=2, retry_backoff=0.01)
+    failing_rows(monkeypatch, 3)
+    records = [new_record() for _ in range(3)]
+    database.enqueue_batch({name: [record[name] for record in records] for name in records[0]})
+    
+    assert database.flush()
+    assert database.count() == 0
+    stats = database.get_stats()
+    assert (stats['written'], stats['retries'], stats['lost'], stats['errors']) == (0, 2, 3, 3)
@@ -0,0 +1,103 @@
+"""
+PredictionSearchIndex: exact-field postings and the trigram name index
+"""
+
+import pytest
+
+from conftest import make_record
+from history_store import ColumnarHistoryStore, SortableIdGenerator
+from search_index import PredictionSearchIndex, normalize_phone, normalize_risk_level, parse_criteria
+
+@pytest.fixture
+def index():
+    index = PredictionSearchIndex()
+    people = [
+        ('Asha Rao', 'Dr. Iyer', 'High Risk', '+91 98765-43210'),
+        ('Ravi Kumar', 'Dr. Menon', 'Low Risk', '9000011111'),
+        ('Ashok Rao', 'Dr. Iyer', 'Moderate Risk', '9000022222'),
+        ('Meera Shah', 'Dr. Das', 'High Risk', '9000033333')
+    ]
+    for i, (patient, doctor, risk, phone) in enumerate(people):
+        index.add(f'id{i}', make_record(f'id{i}', patient_name=patient, doctor_name=doctor,
+                                        risk_level=risk, phone_number=phone))
+    return index
+
+def test_normalizers():
+    assert normalize_risk_level('HIGH_RISK') == normalize_risk_level('high') == 'high'
+    assert normalize_risk_level('Medium') == 'moderate'
+    assert normalize_phone('+91 98765-43210') == '9876543210'
+
+def test_parse_criteria_validates():
+    assert parse_criteria({'risk_level': 'High Risk', 'patient': '  Asha '}) == {'risk_level': 'high', 'patient': 'asha'}
+    with pytest.raises(ValueError):
+        parse_criteria({'patient': 'a'})
+    with pytest.raises(ValueError):
+        parse_criteria({})
+
+def test_exact_fields_newest_first(index):
+    assert index.search({'risk_level': 'high'}, 10) == (['id3', 'id0'], 2)
+    assert index.search({'phone': '9876543210'}, 10) == (['id0'], 1)
+
+def test_text_matches_substrings_and_word_starts(index):
+    assert index.search({'patient': 'rao'}, 10) == (['id2', 'id0'], 2)
+    assert index.search({'patient': 'sho'}, 10) == (['id2'], 1)
+    assert index.search({'patient': 'ra'}, 10) == (['id2', 'id1', 'id0'], 3)  # word starts only
+    assert index.search({'patient': 'xyz'}, 10) == ([], 0)
+
+def test_criteria_combine_and_page(index):
+    assert index.search({'doctor': 'iyer', 'risk_level': 'moderate'}, 10) == (['id2'], 1)
+    assert index.search({'doctor': 'dr'}, 2, offset=1) == (['id2', 'id1'], 4)
+
+def test_remove_and_replace(index):
+    index.remove('id0')
+    index.add('id2', make_record('id2', patient_name='Nisha Verma', risk_level='Low Risk'))
+    
+    assert index.search({'patient': 'rao'}, 10) == ([], 0)
+    assert index.search({'risk_level': 'low'}, 10) == (['id2', 'id1'], 2)
+    assert len(index) == 3
+
+def test_compaction_keeps_live_postings():
+    index = PredictionSearchIndex()
+    for i in range(200):
+        index.add(f'{i:04d}', make_record(f'{i:04d}', risk_level='High Risk'))
+    for i in range(150):
+        index.remove(f'{i:04d}')
+    
+    ids, total = index.search({'risk_level': 'high'}, 100)
+    
+    assert total == 50
+    assert ids == [f'{i:04d}' for i in range(199, 149, -1)]
+    assert len(index._postings['risk_level']['high']) < 200  # compacted at least once
+
+def test_clear(index):
+    index.clear()
+    index.add('new', make_record('new'))
+    assert index.search({'patient': 'asha'}, 10) == (['new'], 1)
+    assert len(index) == 1
+
+def test_repeated_trigrams_are_removed_once_per_document():
+    # 'ananya anand' holds ' an', 'ana' and 'nan'-style trigrams more than once
+    index = PredictionSearchIndex()
+    for i in range(100):
+        index.add(f'a{i:03d}', make_record(f'a{i:03d}', doctor_name='Dr. Ananya Anand'))
+    for i in range(60):
+        index.remove(f'a{i:03d}')  # compacts the ' an' posting part way through
+    
+    assert index.search({'doctor': 'anand'}, 100)[1] == 40
+    for i in range(60, 100):
+        index.remove(f'a{i:03d}')  # drains every posting to zero
+    
+    assert index.search({'doctor': 'an'}, 10) == ([], 0)
+    assert index.get_stats()['terms'] == 0
+    index.add('b', make_record('b', doctor_name='Dr. Anand'))
+    assert index.search({'doctor': 'an'}, 10) == (['b'], 1)
+
+def test_history_eviction_with_repeated_trigrams():
+    store = ColumnarHistoryStore(max_size=50, retention_hours=None, index=PredictionSearchIndex())
+    ids = SortableIdGenerator()
+    for i in range(300):
+        record = make_record(ids.next_id(), doctor_name='Dr. Ananya Anand' if i < 100 else 'Dr. Rao')
+        store.add(record['id'], record)
+    
+    assert store.search({'doctor': 'rao'}, 100)['total'] == 50
+    assert store.search({'doctor': 'anand'}, 100)['total'] == 0
@@ -0,0 +1,126 @@
+"""
+SharedHistoryStore: the history window every gunicorn worker reads from SQLite
+"""
+
+from conftest import make_record
+from history_store import SortableIdGenerator
+from shared_state import SharedHistoryStore, SharedState
+
+def ids_of(records):
+    return [record['id'] for record in records]
+
+def test_window_keeps_newest_max_size(shared_history, new_record):
+    records = [new_record() for _ in range(8)]
+    for record in records[:3]:
+        shared_history.add(record['id'], record)
+    shared_history.add_batch({name: [record[name] for record in records[3:]] for name in records[0]})
+    
+    assert ids_of(shared_history.values()) == ids_of(records[3:])
+    assert records[2]['id'] not in shared_history
+    stats = shared_history.get_stats()
+    assert (stats['size'], stats['evicted_by_size'], stats['evicted_by_age']) == (5, 3, 0)
+
+def test_window_bounds_come_from_the_segment(shared_history, new_record, monkeypatch):
+    for _ in range(7):
+        record = new_record()
+        shared_history.add(record['id'], record)
+    monkeypatch.setattr(shared_history.database, 'count', lambda: 1 / 0)
+    
+    assert len(shared_history) == 5
+    assert shared_history.page(2)['total'] == 5
+
+def test_second_worker_sees_the_same_window(shared_history, new_record, tmp_path):
+    for _ in range(7):
+        record = new_record()
+        shared_history.add(record['id'], record)
+    other = SharedHistoryStore(shared_history.database, SharedState(shared_history.state.path),
+                               max_size=5, retention_hours=None)
+    
+    assert ids_of(other.values()) == ids_of(shared_history.values())
+    assert other.generation == shared_history.generation
+    
+    rebuilt = SharedState(str(tmp_path / 'rebuilt-stats'))
+    rebuilt.attach(shared_history.database)
+    assert ids_of(SharedHistoryStore(shared_history.database, rebuilt, max_size=5, retention_hours=None).values()) == \
+        ids_of(shared_history.values())
+
+def test_records_age_out_of_the_window(database, tmp_path):
+    now = [1_700_000_000.0]
+    clock = lambda: now[0]
+    state = SharedState(str(tmp_path / 'stats'))
+    state.attach(database)
+    store = SharedHistoryStore(database, state, max_size=10, retention_hours=1, clock=clock)
+    ids = SortableIdGenerator(clock=clock)
+    old = [make_record(ids.next_id()) for _ in range(3)]
+    for record in old:
+        store.add(record['id'], record)
+    now[0] += 1800
+    fresh = make_record(ids.next_id())
+    store.add(fresh['id'], fresh)
+    generation = store.generation
+    
+    now[0] += 1801
+    assert ids_of(store.values()) == [fresh['id']]
+    assert store.generation != generation
+    assert store.get_stats()['evicted_by_age'] == 3
+    
+    now[0] += 3600
+    assert len(store) == 0
+    later = make_record(ids.next_id())
+    store.add(later['id'], later)
+    assert ids_of(store.values()) == [later['id']]
+
+def test_changes_report_new_and_evicted_records(shared_history, new_record):
+    first = [new_record() for _ in range(5)]
+    for record in first:
+        shared_history.add(record['id'], record)
+    cursor = shared_history.page(10)['sync_cursor']
+    second = [new_record() for _ in range(2)]
+    for record in second:
+        shared_history.add(record['id'], record)
+    
+    delta = shared_history.changes(cursor)
+    
+    assert not delta['reset']
+    assert ids_of(delta['records']) == ids_of(second)
+    assert delta['removed'] == ids_of(first[:2])
+    assert shared_history.changes(delta['cursor'])['records'] == []
+
+def test_clear_empties_the_window_and_resets_cursors(shared_history, new_record):
+    for _ in range(3):
+        record = new_record()
+        shared_history.add(record['id'], record)
+    cursor = shared_history.page(10)['sync_cursor']
+    
+    assert shared_history.clear() == 3
+    assert len(shared_history) == 0
+    assert shared_history.changes(cursor)['reset']
+    record = new_record()
+    shared_history.add(record['id'], record)
+    assert ids_of(shared_history.values()) == [record['id']]
+
+def test_search_exact_field_keeps_projection(shared_history, new_record):
+    shared_history.add(None, new_record(risk_level='High Risk', patient_name='Meera Shah'))
+    shared_history.add(None, new_record(risk_level='Low Risk'))
+    
+    result = shared_history.search({'risk_level': 'high'}, limit=10, fields=['id', 'patient_name'])
+    
+    assert result['total'] == 1
+    assert list(result['records'][0]) == ['id', 'patient_name']
+    assert result['records'][0]['patient_name'] == 'Meera Shah'
+
+def test_search_phone_matches_either_number(shared_history, new_record):
+    shared_history.add(None, new_record(phone_number='111', alt_phone_number='+91 90000-12345'))
+    shared_history.add(None, new_record(phone_number='222'))
+    
+    result = shared_history.search({'phone': '9000012345'}, limit=10)
+    
+    assert [record['phone_number'] for record in result['records']] == ['111']
+
+def test_search_text_and_columnar(shared_history, new_record):
+    shared_history.add(None, new_record(doctor_name='Dr. Kavya Menon'))
+    shared_history.add(None, new_record(doctor_name='Dr. Arjun Das'))
+    
+    result = shared_history.search({'doctor': 'kavya'}, limit=10, fields=['doctor_name'], columnar=True)
+    
+    assert result['records'] == {'doctor_name': ['Dr. Kavya Menon']}
@@ -0,0 +1,72 @@
+"""
+Prediction snapshots: compacted stats + newest history as of a log position
+"""
+
+from conftest import make_record
+from snapshots import PredictionSnapshot, Snapshotter, catch_up
+
+def insert(database, records):
+    for record in records:
+        database.insert(record)
+
+def test_catch_up_replays_only_the_log_tail(database, new_record):
+    insert(database, [new_record(risk_percentage=70.0, prediction=1) for _ in range(4)])
+    snapshot, replayed = catch_up(PredictionSnapshot(3), database)
+    assert replayed == 4
+    
+    tail = [new_record() for _ in range(2)]
+    insert(database, tail)
+    snapshot, replayed = catch_up(snapshot, database)
+    
+    assert replayed == 2
+    assert snapshot.stats.total_predictions == 6
+    assert snapshot.stats.total_high_risk == 4
+    assert len(snapshot) == 3
+    assert snapshot.columns['id'][-2:].tolist() == [record['id'] for record in tail]
+
+def test_save_and_load_round_trip(database, new_record, tmp_path):
+    records = [new_record(alt_phone_number=None), new_record(alt_phone_number='+91 90000 00000', weight=72.5)]
+    insert(database, records)
+    snapshot, _ = catch_up(PredictionSnapshot(10), database)
+    path = str(tmp_path / 'snapshot')
+    snapshot.save(path)
+    
+    loaded = PredictionSnapshot.load(path, 10)
+    
+    assert (loaded.epoch, loaded.position) == (snapshot.epoch, snapshot.position)
+    assert loaded.stats.total_predictions == 2
+    assert loaded.columns['alt_phone_number'].tolist() == [None, '+91 90000 00000']
+    assert loaded.columns['weight'].tolist() == [70.0, 72.5]
+    assert PredictionSnapshot.load(str(tmp_path / 'missing'), 10) is None
+
+def test_late_older_id_is_put_back_in_order(database):
+    insert(database, [make_record('0000000002000000' + '0001'), make_record('0000000001000000' + '0002')])
+    
+    snapshot, _ = catch_up(PredictionSnapshot(10), database)
+    
+    assert snapshot.columns['id'].tolist() == ['0000000001000000' + '0002', '0000000002000000' + '0001']
+
+def test_snapshot_from_before_a_clear_is_dropped(database, new_record):
+    insert(database, [new_record() for _ in range(3)])
+    snapshot, _ = catch_up(PredictionSnapshot(10), database)
+    database.delete_all()
+    fresh = new_record()
+    insert(database, [fresh])
+    
+    snapshot, replayed = catch_up(snapshot, database)
+    
+    assert replayed == 1
+    assert snapshot.stats.total_predictions == 1
+    assert snapshot.columns['id'].tolist() == [fresh['id']]
+
+def test_snapshotter_saves_only_when_the_log_moved(database, new_record, tmp_path):
+    path = str(tmp_path / 'snapshot')
+    insert(database, [new_record()])
+    snapshotter = Snapshotter(database, path, PredictionSnapshot(10))
+    
+    assert snapshotter.snapshot_now()
+    assert not snapshotter.snapshot_now()
+    insert(database, [new_record()])
+    assert snapshotter.snapshot_now()
+    assert PredictionSnapshot.load(path, 10).stats.total_predictions == 2
+    assert snapshotter.get_stats()['snapshots_written'] == 2
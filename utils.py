@@ -62,6 +62,23 @@ class RiskAssessor:
             'color': RiskAssessor.RISK_COLORS[risk_key],
             'percentage': round(percentage, 2)
         }
+    
+    @staticmethod
+    def is_near_threshold(probability, margin):
+        """
+        Check whether a probability is within `margin` percentage points of a
+        risk threshold or of the 50% disease/no-disease decision boundary
+        
+        Args:
+            probability (float): Probability between 0 and 1
+            margin (float): Distance in percentage points
+        
+        Returns:
+            bool: True if the level or class could flip within the margin
+        """
+        percentage = probability * 100
+        boundaries = (RiskAssessor.RISK_THRESHOLDS['low'], 50, RiskAssessor.RISK_THRESHOLDS['moderate'])
+        return any(abs(percentage - boundary) < margin for boundary in boundaries)
 
 
 class BMICalculator:
@@ -136,6 +153,43 @@ class DataPreprocessor:
         return np.array([features])
 
 
+class DistilledModel:
+    """
+    Shallow regression tree distilled from the served model.
+    
+    Thresholds are stored in raw (unscaled) feature space and the tree is kept
+    as plain Python lists, so a prediction is a handful of comparisons with no
+    scaler or numpy call on the request path.
+    """
+    
+    def __init__(self, tree):
+        self.children_left = tree['children_left']
+        self.children_right = tree['children_right']
+        self.feature = tree['feature']
+        self.threshold = tree['threshold']
+        self.value = tree['value']
+        self.metrics = tree.get('metrics', {})
+    
+    def predict_disease_probability(self, features):
+        """
+        Predict disease probability for one raw feature vector
+        
+        Args:
+            features (list): Raw features in the same order the teacher is fed
+        
+        Returns:
+            float: Probability between 0 and 1
+        """
+        node = 0
+        left = self.children_left
+        while left[node] != -1:
+            if features[self.feature[node]] <= self.threshold[node]:
+                node = left[node]
+            else:
+                node = self.children_right[node]
+        return self.value[node]
+
+
 class ResponseFormatter:
     """Format API responses"""
     